@@ -1,11 +1,23 @@
+import os
+import shutil
+import tempfile
 import pandas as pd
 import numpy as np
 from scipy import stats
 from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.stattools import adfuller
+import indicators
+import stationarity
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
+# Arrays at least this large go to memory-mapped files when a spill directory is given
+SPILL_MIN_BYTES = 1 << 20
 
-def analyze_market_trends(data, price_column='price', date_column='date'):
+# Seasonal period of decompose_series without a decomposer (shorter series use their length)
+DECOMPOSE_PERIOD = 30
+
+
+def analyze_market_trends(data, price_column='price', date_column='date', trend_window=None,
+                          compact=False, decomposition=None, spill_dir=None, decomposer=None):
     """
     Comprehensive market trend analysis including multiple technical indicators
     and statistical tests.
@@ -14,10 +26,31 @@ def analyze_market_trends(data, price_column='price', date_column='date'):
     data (pd.DataFrame): DataFrame with date and price columns
     price_column (str): Name of the column containing price data
     date_column (str): Name of the column containing dates
+    trend_window (int): If given, also return the rolling linear trend over
+        windows of this many observations (see calculate_rolling_trend)
+    compact (bool): Return a TrendResult (scalars plus float32 arrays)
+        instead of the full frame and pandas Series
+    decomposition (bool): Return the seasonal decomposition components
+        (default: True for the full result; the compact one by default keeps
+        only the seasonal amplitude and residual std, and False skips the
+        decomposition altogether). Skipped when the series is too short
+    spill_dir (str): Compact mode only; large arrays are written to
+        memory-mapped files in a new directory under spill_dir (remove it
+        with TrendResult.cleanup)
+    decomposer (IncrementalDecomposition): Keep the decomposition as running
+        state between calls on the same growing series; only new points are
+        processed. With several periods, the first one is returned as
+        'seasonal_decomposition' and all of them as 'seasonal_decompositions'
     
     Returns:
     dict: Dictionary containing various trend indicators and analysis results
+    (TrendResult when compact=True)
     """
+    if compact:
+        return _analyze_compact(data, price_column, date_column, trend_window, decomposition, spill_dir,
+                                decomposer)
+    if decomposition is None:
+        decomposition = True
     # Ensure data is sorted by date
     df = data.sort_values(date_column).copy()
     df[date_column] = pd.to_datetime(df[date_column])
@@ -32,11 +65,12 @@ def analyze_market_trends(data, price_column='price', date_column='date'):
     }
     
     # Calculate moving averages
-    df['MA20'] = df[price_column].rolling(window=20).mean()
-    df['MA50'] = df[price_column].rolling(window=50).mean()
+    prices = df[price_column].values
+    df['MA20'] = indicators.rolling_mean(prices, 20)
+    df['MA50'] = indicators.rolling_mean(prices, 50)
     
     # Calculate momentum indicators
-    df['ROC'] = df[price_column].pct_change(periods=20) * 100  # Rate of Change
+    df['ROC'] = indicators.roc(prices, 20)  # Rate of Change
     df['RSI'] = calculate_rsi(df[price_column])
     
     # Perform trend analysis
@@ -45,15 +79,19 @@ def analyze_market_trends(data, price_column='price', date_column='date'):
         'adf_test': perform_stationarity_test(df[price_column]),
         'volatility': calculate_volatility(df[price_column])
     }
+    if trend_window is not None:
+        trend_analysis['rolling_trend'] = calculate_rolling_trend(df[price_column], trend_window)
     
     # Decompose time series
-    if len(df) >= 2:  # Ensure enough data points
-        decomposition = seasonal_decompose(df[price_column], period=min(len(df), 30))
-        trend_analysis['seasonal_decomposition'] = {
-            'trend': decomposition.trend,
-            'seasonal': decomposition.seasonal,
-            'residual': decomposition.resid
+    if decomposition and _can_decompose(len(df), decomposer):
+        by_period = {
+            period: {name: pd.Series(values, index=df.index, name='resid' if name == 'residual' else name)
+                     for name, values in components.items()}
+            for period, components in decompose_series(prices, decomposer).items()
         }
+        trend_analysis['seasonal_decomposition'] = next(iter(by_period.values()))
+        if len(by_period) > 1:
+            trend_analysis['seasonal_decompositions'] = by_period
     
     return {
         'data': df,
@@ -61,15 +99,182 @@ def analyze_market_trends(data, price_column='price', date_column='date'):
         'trend_analysis': trend_analysis
     }
 
+class TrendResult:
+    """
+    Compact analyze_market_trends result: scalar statistics plus float32
+    per-observation arrays (possibly memory-mapped from spill_path).
+    """
+    __slots__ = ('n_obs', 'start', 'end', 'basic_stats', 'linear_trend', 'adf_test', 'latest',
+                 'seasonal_amplitude', 'residual_std', 'dates', 'arrays', 'spill_path')
+    
+    def __init__(self, dates, basic_stats, linear_trend, adf_test):
+        self.n_obs = len(dates)
+        self.start = pd.Timestamp(dates[0]) if len(dates) else None
+        self.end = pd.Timestamp(dates[-1]) if len(dates) else None
+        self.basic_stats = basic_stats
+        self.linear_trend = linear_trend
+        self.adf_test = adf_test
+        self.latest = {}
+        self.seasonal_amplitude = None
+        self.residual_std = None
+        self.dates = dates
+        self.arrays = {}
+        self.spill_path = None
+    
+    def __getitem__(self, name):
+        return self.arrays[name]
+    
+    def __getstate__(self):
+        # Spilled arrays are pickled as their file names, so results cross process boundaries cheaply
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['arrays'] = {name: values.filename if isinstance(values, np.memmap) else values
+                           for name, values in self.arrays.items()}
+        if isinstance(self.dates, np.memmap):
+            state['dates'] = self.dates.filename
+        return state
+    
+    def __setstate__(self, state):
+        def restore(values):
+            return np.load(values, mmap_mode='r') if isinstance(values, str) else values
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.arrays = {name: restore(values) for name, values in state['arrays'].items()}
+        self.dates = restore(state['dates'])
+    
+    def spill(self, spill_dir, min_bytes=None):
+        """
+        Move arrays of at least min_bytes to .npy files and keep read-only
+        memory maps of them. The directory is only created when something
+        is spilled; cleanup() removes it.
+        """
+        min_bytes = SPILL_MIN_BYTES if min_bytes is None else min_bytes
+        for name, values in list(self.arrays.items()) + [('dates', self.dates)]:
+            if values.nbytes < min_bytes or isinstance(values, np.memmap):
+                continue
+            if self.spill_path is None:
+                self.spill_path = tempfile.mkdtemp(prefix='trend_', dir=spill_dir)
+            path = os.path.join(self.spill_path, f'{name}.npy')
+            np.save(path, values)
+            mapped = np.load(path, mmap_mode='r')
+            if name == 'dates':
+                self.dates = mapped
+            else:
+                self.arrays[name] = mapped
+    
+    def cleanup(self):
+        """Read spilled arrays back into memory and delete the spill directory"""
+        if self.spill_path is None:
+            return
+        self.arrays = {name: np.array(values) if isinstance(values, np.memmap) else values
+                       for name, values in self.arrays.items()}
+        if isinstance(self.dates, np.memmap):
+            self.dates = np.array(self.dates)
+        shutil.rmtree(self.spill_path, ignore_errors=True)
+        self.spill_path = None
+    
+    def to_frame(self):
+        """The per-observation arrays as a DataFrame indexed by date"""
+        return pd.DataFrame(dict(self.arrays), index=pd.DatetimeIndex(self.dates))
+    
+    def summary(self):
+        """Scalar summary, see summarize_market_trends"""
+        summary = {
+            'n_obs': self.n_obs,
+            'start': self.start,
+            'end': self.end,
+            **self.basic_stats,
+            'last_price': self.latest['price'],
+            'slope': self.linear_trend['slope'],
+            'r_squared': self.linear_trend['r_squared'],
+            'trend_p_value': self.linear_trend['p_value'],
+            'trend_direction': self.linear_trend['trend_direction'],
+            'adf_statistic': self.adf_test['test_statistic'],
+            'adf_p_value': self.adf_test['p_value'],
+            'is_stationary': self.adf_test['is_stationary'],
+            'last_volatility': self.latest['volatility'],
+            'last_rsi': self.latest['RSI'],
+            'last_roc': self.latest['ROC']
+        }
+        if self.seasonal_amplitude is not None:
+            summary['seasonal_amplitude'] = self.seasonal_amplitude
+            summary['residual_std'] = self.residual_std
+        return summary
+
+def _analyze_compact(data, price_column, date_column, trend_window, decomposition, spill_dir, decomposer=None):
+    """analyze_market_trends without building the augmented frame; see TrendResult"""
+    dates = pd.to_datetime(data[date_column]).to_numpy()
+    order = np.argsort(dates, kind='stable')
+    dates = dates[order]
+    prices = np.asarray(data[price_column], dtype=np.float64)[order]
+    
+    basic_stats = {
+        'mean': np.nanmean(prices) if len(prices) else np.nan,
+        'std': np.nanstd(prices, ddof=1) if np.count_nonzero(~np.isnan(prices)) > 1 else np.nan,
+        'min': np.nanmin(prices) if len(prices) else np.nan,
+        'max': np.nanmax(prices) if len(prices) else np.nan
+    }
+    result = TrendResult(dates, basic_stats, calculate_linear_trend(prices), perform_stationarity_test(prices))
+    
+    # Indicators are computed in float64 and stored as float32 one array at a time;
+    # the latest values are kept at full precision for the summary
+    columns = {
+        'price': lambda: prices,
+        'MA20': lambda: indicators.rolling_mean(prices, 20),
+        'MA50': lambda: indicators.rolling_mean(prices, 50),
+        'ROC': lambda: indicators.roc(prices, 20),
+        'RSI': lambda: indicators.rsi(prices, 14),
+        'volatility': lambda: indicators.rolling_std(prices, 20)
+    }
+    for name, compute in columns.items():
+        values = compute()
+        result.latest[name] = float(values[-1]) if len(values) else np.nan
+        result.arrays[name] = values.astype(np.float32)
+    if trend_window is not None:
+        trend = indicators.rolling_trend(prices, trend_window)
+        for name in ('slope', 'r_squared', 'p_value'):
+            result.arrays[f'trend_{name}'] = trend[name].astype(np.float32)
+    
+    if decomposition is not False and _can_decompose(len(prices), decomposer):
+        by_period = decompose_series(prices, decomposer)
+        primary = next(iter(by_period))
+        components = by_period[primary]
+        result.seasonal_amplitude = float(np.nanmax(components['seasonal']) - np.nanmin(components['seasonal']))
+        result.residual_std = float(np.nanstd(components['residual'], ddof=1))
+        if decomposition:
+            for period, components in by_period.items():
+                suffix = '' if period == primary else f'_{period}'
+                for name, values in components.items():
+                    result.arrays[name + suffix] = values.astype(np.float32)
+    
+    if spill_dir is not None:
+        result.spill(spill_dir)
+    return result
+
+def _can_decompose(n_obs, decomposer=None):
+    """Both decompositions need two full cycles of the (first) period"""
+    period = DECOMPOSE_PERIOD if decomposer is None else decomposer.periods[0]
+    return n_obs >= 2 * period
+
+def decompose_series(prices, decomposer=None):
+    """
+    Additive seasonal decomposition as {period: {'trend', 'seasonal', 'residual'}}.
+    Without a decomposer this is seasonal_decompose with period
+    min(len, DECOMPOSE_PERIOD), which needs twice that many points;
+    with one, its running state is brought up to date with `prices` and every
+    period it tracks with two full cycles of data is returned (the first one
+    first). Check _can_decompose before calling.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if decomposer is None:
+        period = min(len(prices), DECOMPOSE_PERIOD)
+        result = seasonal_decompose(prices, period=period)
+        return {period: {'trend': result.trend, 'seasonal': result.seasonal, 'residual': result.resid}}
+    decomposer.update(prices)
+    return {p: decomposer.components(p) for p in decomposer.periods if len(prices) >= 2 * p}
+
 def calculate_rsi(prices, periods=14):
     """Calculate Relative Strength Index"""
-    delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
-    
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    return indicators.to_pandas(indicators.rsi(prices.values, periods), prices)
 
 def calculate_linear_trend(prices):
     """Calculate linear trend and related statistics"""
@@ -83,15 +288,96 @@ def calculate_linear_trend(prices):
         'trend_direction': 'upward' if slope > 0 else 'downward'
     }
 
-def perform_stationarity_test(prices):
-    """Perform Augmented Dickey-Fuller test for stationarity"""
-    adf_result = adfuller(prices.dropna())
+def calculate_rolling_trend(prices, window=None):
+    """
+    Linear trend over a trailing window of `window` observations (or over all
+    data up to each point when window is None), as a time series of slope,
+    R-squared and p-value. Computed in one O(n) pass, see indicators.rolling_trend.
+    """
+    trend = indicators.rolling_trend(prices.values, window)
+    return pd.DataFrame({name: trend[name] for name in ('slope', 'r_squared', 'p_value')}, index=prices.index)
+
+def perform_stationarity_test(prices, maxlag=None, autolag='AIC'):
+    """
+    Perform Augmented Dickey-Fuller test for stationarity. Results are cached
+    by series content; autolag=None skips the lag search and tests with
+    maxlag lags directly (see stationarity.adf_test).
+    """
+    adf_result = stationarity.adf_test(np.asarray(prices), maxlag=maxlag, autolag=autolag)
     return {
-        'test_statistic': adf_result[0],
-        'p_value': adf_result[1],
-        'is_stationary': adf_result[1] < 0.05
+        'test_statistic': adf_result['test_statistic'],
+        'p_value': adf_result['p_value'],
+        'is_stationary': adf_result['is_stationary']
     }
 
+def calculate_rolling_stationarity(prices, window, lag=1):
+    """ADF statistic and p-value over a trailing window of `window` observations, see stationarity.rolling_adf"""
+    adf = stationarity.rolling_adf(prices.values, window, lag)
+    return pd.DataFrame(adf, index=prices.index)
+
 def calculate_volatility(prices, window=20):
     """Calculate rolling volatility"""
-    return prices.rolling(window=window).std()
\ No newline at end of file
+    return indicators.to_pandas(indicators.rolling_std(prices.values, window), prices)
+
+def summarize_market_trends(data, price_column='price', date_column='date'):
+    """
+    Scalar summary of analyze_market_trends for one series (no per-row data
+    is kept, so it is cheap to collect for thousands of instruments).
+    """
+    return analyze_market_trends(data, price_column, date_column, compact=True).summary()
+
+def _summarize_chunk(chunk, price_column, date_column):
+    """Worker: summarize a list of (symbol, dates, prices) series"""
+    rows = []
+    for symbol, dates, prices in chunk:
+        try:
+            frame = pd.DataFrame({date_column: dates, price_column: prices})
+            rows.append({'symbol': symbol, **summarize_market_trends(frame, price_column, date_column)})
+        except Exception as e:
+            rows.append({'symbol': symbol, 'n_obs': len(prices), 'error': str(e)})
+    return rows
+
+def _iter_series(data, price_column, date_column, symbol_column):
+    if isinstance(data, dict):
+        for symbol, frame in data.items():
+            yield symbol, frame[date_column].to_numpy(), frame[price_column].to_numpy()
+    else:
+        for symbol, frame in data.groupby(symbol_column, sort=False):
+            yield symbol, frame[date_column].to_numpy(), frame[price_column].to_numpy()
+
+def analyze_market_trends_batch(data, price_column='price', date_column='date', symbol_column='symbol',
+                                n_jobs=None, chunksize=50):
+    """
+    Run analyze_market_trends over many series in a process pool.
+    
+    Parameters:
+    data (pd.DataFrame or dict): long-format frame with symbol, date and price
+        columns, or a dict of {symbol: DataFrame with date and price columns}
+    n_jobs (int): worker processes (default: all cores)
+    chunksize (int): series sent to a worker per task
+    
+    Returns:
+    pd.DataFrame: one summary row per symbol (see summarize_market_trends);
+    series that fail get an 'error' entry instead
+    """
+    series = _iter_series(data, price_column, date_column, symbol_column)
+    rows = []
+    n_jobs = n_jobs or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        # Keep a bounded number of chunks in flight instead of slicing every series up front
+        max_in_flight = 2 * n_jobs
+        pending = set()
+        while True:
+            while len(pending) < max_in_flight:
+                chunk = [item for _, item in zip(range(chunksize), series)]
+                if not chunk:
+                    break
+                pending.add(pool.submit(_summarize_chunk, chunk, price_column, date_column))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows.extend(future.result())
+    if not rows:
+        return pd.DataFrame(index=pd.Index([], name='symbol'))
+    return pd.DataFrame(rows).set_index('symbol')
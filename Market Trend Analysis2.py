@@ -1,10 +1,94 @@
+import argparse
+import os
+import sys
 import pandas as pd
 import numpy as np
-from scipy import stats
-from statsmodels.tsa.stattools import adfuller
-import matplotlib.pyplot as plt
-import seaborn as sns  # Ensure seaborn is imported
 from datetime import datetime, timedelta
+import indicators
+import plotting
+import stationarity
+
+# scipy, matplotlib and seaborn are imported where they are used, so a
+# report-only run starts without loading them
+
+class _ColumnBuffer:
+    """Preallocated column arrays that grow by doubling, so appends are amortised O(new rows)"""
+    
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.n = 0
+        self.columns = {}
+    
+    @staticmethod
+    def _empty(dtype, size):
+        if np.issubdtype(dtype, np.datetime64):
+            return np.full(size, np.datetime64('NaT'), dtype='datetime64[ns]')
+        if np.issubdtype(dtype, np.number) or np.issubdtype(dtype, np.bool_):
+            return np.full(size, np.nan)
+        return np.full(size, None, dtype=object)
+    
+    def _reserve(self, n_rows):
+        if n_rows <= self.capacity:
+            return
+        while self.capacity < n_rows:
+            self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = self._empty(column.dtype, self.capacity)
+            grown[:self.n] = column[:self.n]
+            self.columns[name] = grown
+    
+    def append(self, values, n_rows):
+        """values: {column: array of n_rows}; columns missing on either side are filled with NaN/None"""
+        self._reserve(self.n + n_rows)
+        for name, column in values.items():
+            if name not in self.columns:
+                self.columns[name] = self._empty(np.asarray(column).dtype, self.capacity)
+            self.columns[name][self.n:self.n + n_rows] = column
+        self.n += n_rows
+    
+    def set(self, name, start, values):
+        """Overwrite rows start.. of a column (created on first use)"""
+        if name not in self.columns:
+            self.columns[name] = self._empty(np.float64, self.capacity)
+        self.columns[name][start:self.n] = values
+    
+    def view(self, name):
+        return self.columns[name][:self.n]
+    
+    def reorder(self, order):
+        for column in self.columns.values():
+            column[:self.n] = column[:self.n][order]
+
+
+class _RunningStats:
+    """Count, mean, variance (Welford/Chan merge), min and max of the non-NaN values seen so far"""
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        count, mean = len(values), values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+    
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
 
 class MarketTrendAnalyzer:
     """
@@ -12,62 +96,186 @@ class MarketTrendAnalyzer:
     with visual representations of market trends.
     """
     
+    # Rows of history the indicators need before the first row being computed (MA50 is the longest window)
+    INDICATOR_LOOKBACK = 50
+    INDICATOR_COLUMNS = ['MA20', 'MA50', 'ROC', 'RSI', 'Volatility']
+    # The ADF lag found by the AIC search is reused until the series has grown by this fraction
+    ADF_RELAG_FRACTION = 0.1
+    
     def __init__(self, data, price_column='price', date_column='date'):
         """Initialize with market data"""
-        self.df = data.copy()
         self.price_column = price_column
         self.date_column = date_column
-        self.prepare_data()
+        self._reset(len(data))
+        self.prepare_data(data)
+    
+    def _reset(self, n_rows=0):
+        # Rows live in a growable columnar buffer; self.df is materialised from it on demand
+        self._buffer = _ColumnBuffer(capacity=max(1024, 2 * n_rows))
+        self._stats = _RunningStats()
+        self._tz = None
+        # Indicators are computed on first use and memoized against the data version
+        self._version = 0
+        self._indicator_version = None
+        self._indicator_rows = 0
+        self._df = None
+        self._df_key = None
+        self._adf_lag = None
+        self._adf_lag_rows = 0
         
-    def prepare_data(self):
-        """Prepare and clean the data for analysis"""
-        self.df[self.date_column] = pd.to_datetime(self.df[self.date_column])
-        self.df = self.df.sort_values(self.date_column)
-        self.df.set_index(self.date_column, inplace=True)
+    def prepare_data(self, data=None):
+        """
+        Prepare and clean the data for analysis: parse the dates and add the
+        rows in date order. Called without data (the old signature) it has
+        nothing left to do, the rows held are always prepared.
+        """
+        if data is not None:
+            self.append(data)
+    
+    def _columns_from(self, rows):
+        """Parse dates and return (datetime64 index, {column: array}) for a frame or dict of columns"""
+        if isinstance(rows, pd.DataFrame):
+            columns = {name: rows[name].to_numpy() for name in rows.columns}
+        else:
+            columns = {name: np.atleast_1d(value) for name, value in rows.items()}
+        dates = pd.DatetimeIndex(pd.to_datetime(columns.pop(self.date_column)))
+        if dates.tz is not None:
+            self._tz = dates.tz
+            dates = dates.tz_convert('UTC').tz_localize(None)
+        return dates.as_unit('ns').to_numpy(), columns
+    
+    def append(self, rows):
+        """
+        Add rows (a DataFrame or dict of columns with the date and price
+        columns) to the analyzed series. Rows are only re-sorted when their
+        timestamps are out of order; running statistics and indicators are
+        extended for the new rows only.
+        """
+        dates, columns = self._columns_from(rows)
+        n_new, n_old = len(dates), self._buffer.n
+        if n_new == 0:
+            return
+        in_order = bool((dates[1:] >= dates[:-1]).all())
+        if n_old:
+            in_order = in_order and dates[0] >= self._buffer.view('__date__')[-1]
         
+        self._buffer.append({'__date__': dates, **columns}, n_new)
+        self._stats.update(columns[self.price_column])
+        if in_order:
+            self._data_changed(appended_from=n_old)
+        else:
+            self._buffer.reorder(np.argsort(self._buffer.view('__date__'), kind='stable'))
+            self._data_changed()
+    
+    def update(self, tick):
+        """Add a single observation, e.g. {'date': ..., 'price': ...}"""
+        self.append({name: [value] for name, value in tick.items()})
+    
+    def _data_changed(self, appended_from=None):
+        """
+        Bump the data version. appended_from is the first new row when rows
+        were only appended, so indicators for the rows before it stay valid.
+        """
+        self._version += 1
+        if appended_from is None or appended_from < self._indicator_rows:
+            self._indicator_rows = 0
+    
+    @property
+    def df(self):
+        """The data (and computed indicators) as a DataFrame indexed by date"""
+        key = (self._version, self._indicator_version)
+        if self._df_key != key:
+            buffer = self._buffer
+            index = pd.DatetimeIndex(buffer.view('__date__'), name=self.date_column)
+            if self._tz is not None:
+                index = index.tz_localize('UTC').tz_convert(self._tz)
+            names = [name for name in buffer.columns if name != '__date__']
+            if self._indicator_version != self._version:
+                names = [name for name in names if name not in self.INDICATOR_COLUMNS]
+            self._df = pd.DataFrame({name: buffer.view(name) for name in names}, index=index)
+            self._df_key = key
+        return self._df
+    
+    @df.setter
+    def df(self, frame):
+        """
+        Replace the data with a frame indexed by date. Changes made in place to
+        the frame df returns are not picked up; assign the changed frame back.
+        """
+        self._reset(len(frame))
+        self.append(frame.rename_axis(self.date_column).reset_index())
+    
+    def _prices(self):
+        return self._buffer.view(self.price_column).astype(np.float64, copy=False)
+    
+    def _latest(self, name):
+        """Last value of a column (indicators are brought up to date first)"""
+        if name in self.INDICATOR_COLUMNS:
+            self._update_indicators()
+        return self._buffer.view(name)[-1]
+    
+    def _compute_indicators(self, prices):
+        return {
+            # Moving averages
+            'MA20': indicators.rolling_mean(prices, 20),
+            'MA50': indicators.rolling_mean(prices, 50),
+            # Momentum indicators
+            'ROC': indicators.roc(prices, 20),
+            'RSI': self._calculate_rsi(prices=prices),
+            # Volatility
+            'Volatility': indicators.rolling_std(prices, 20)
+        }
+    
+    def _update_indicators(self):
+        if self._indicator_version == self._version:
+            return
+        prices = self._prices()
+        start = self._indicator_rows
+        # Only rows were appended: recompute the tail from just enough history for the longest window
+        lookback = max(start - self.INDICATOR_LOOKBACK, 0)
+        for name, values in self._compute_indicators(prices[lookback:]).items():
+            self._buffer.set(name, start, values[start - lookback:])
+        self._indicator_rows = len(prices)
+        self._indicator_version = self._version
+    
     def calculate_indicators(self):
         """Calculate all technical indicators and statistics"""
-        # Moving averages
-        self.df['MA20'] = self.df[self.price_column].rolling(window=20).mean()
-        self.df['MA50'] = self.df[self.price_column].rolling(window=50).mean()
-        
-        # Momentum indicators
-        self.df['ROC'] = self.df[self.price_column].pct_change(periods=20) * 100
-        self.df['RSI'] = self._calculate_rsi()
-        
-        # Volatility
-        self.df['Volatility'] = self.df[self.price_column].rolling(window=20).std()
-        
+        self._update_indicators()
         return self.df
     
-    def _calculate_rsi(self, periods=14):
+    @property
+    def technical_indicators(self):
+        """Indicator columns, computed on first access and reused until the data changes"""
+        return self.calculate_indicators()[self.INDICATOR_COLUMNS]
+    
+    def _calculate_rsi(self, periods=14, prices=None):
         """Calculate Relative Strength Index"""
-        delta = self.df[self.price_column].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        if prices is None:
+            prices = self._prices()
+        return indicators.rsi(prices, periods)
     
     def analyze_trends(self):
         """Perform comprehensive trend analysis"""
-        self.calculate_indicators()
+        self._update_indicators()
+        prices = self._prices()
         
-        # Basic statistics
+        # Basic statistics, kept as running aggregates over appended rows
         stats_result = {
             'basic_stats': {
-                'mean': self.df[self.price_column].mean(),
-                'std': self.df[self.price_column].std(),
-                'min': self.df[self.price_column].min(),
-                'max': self.df[self.price_column].max(),
-                'current_price': self.df[self.price_column].iloc[-1],
-                'price_change': self.df[self.price_column].pct_change().iloc[-1] * 100
+                'mean': self._stats.mean if self._stats.count else np.nan,
+                'std': self._stats.std,
+                'min': self._stats.min,
+                'max': self._stats.max,
+                'current_price': prices[-1],
+                'price_change': (prices[-1] / prices[-2] - 1) * 100 if len(prices) > 1 else np.nan
             }
         }
         
         # Linear trend analysis
-        x = np.arange(len(self.df))
+        from scipy import stats
+        x = np.arange(len(prices))
         slope, intercept, r_value, p_value, std_err = stats.linregress(
-            x, self.df[self.price_column].values
+            x, prices
         )
         
         stats_result['trend_analysis'] = {
@@ -78,34 +286,62 @@ class MarketTrendAnalyzer:
         }
         
         # Stationarity test
-        adf_result = adfuller(self.df[self.price_column].dropna())
-        stats_result['stationarity'] = {
-            'test_statistic': adf_result[0],
-            'p_value': adf_result[1],
-            'is_stationary': adf_result[1] < 0.05
-        }
+        stats_result['stationarity'] = self._stationarity(prices)
         
         return stats_result
     
-    def plot_all_trends(self, figsize=(15, 20)):
-        """Generate comprehensive visualization of all trends"""
+    def _stationarity(self, prices):
+        """
+        ADF test on the prices. The AIC lag search only runs when the series
+        has grown by more than ADF_RELAG_FRACTION since the last search; in
+        between, the lag it picked is reused through the fixed-lag fast path.
+        """
+        n = len(prices)
+        if self._adf_lag is None or n > self._adf_lag_rows * (1 + self.ADF_RELAG_FRACTION) or n < self._adf_lag_rows:
+            adf_result = stationarity.adf_test(prices)
+            self._adf_lag, self._adf_lag_rows = adf_result['used_lag'], n
+        else:
+            adf_result = stationarity.adf_test(prices, maxlag=self._adf_lag, autolag=None)
+        return {
+            'test_statistic': adf_result['test_statistic'],
+            'p_value': adf_result['p_value'],
+            'is_stationary': adf_result['is_stationary']
+        }
+    
+    def rolling_trend(self, window=None):
+        """
+        Slope, R-squared and p-value of the linear trend over a trailing window
+        (or expanding from the first row when window is None) at every date
+        """
+        trend = indicators.rolling_trend(self._prices(), window)
+        return pd.DataFrame({name: trend[name] for name in ('slope', 'r_squared', 'p_value')},
+                            index=self.df.index)
+    
+    def plot_all_trends(self, figsize=(15, 20), max_points=None):
+        """
+        Generate comprehensive visualization of all trends. max_points
+        downsamples every line to about that many points, keeping each
+        bucket's extremes ('auto': the pixel width of the plots)
+        """
+        import matplotlib.pyplot as plt
         self.calculate_indicators()
+        df = self.df
         
         fig, axes = plt.subplots(4, 1, figsize=figsize)
         fig.suptitle('Market Trend Analysis Dashboard', fontsize=16)
         
         # 1. Price and Moving Averages
         ax1 = axes[0]
-        ax1.plot(self.df.index, self.df[self.price_column], label='Price', color='blue')
-        ax1.plot(self.df.index, self.df['MA20'], label='20-day MA', color='orange')
-        ax1.plot(self.df.index, self.df['MA50'], label='50-day MA', color='red')
+        plotting.plot_line(ax1, df.index, df[self.price_column], max_points, label='Price', color='blue')
+        plotting.plot_line(ax1, df.index, df['MA20'], max_points, label='20-day MA', color='orange')
+        plotting.plot_line(ax1, df.index, df['MA50'], max_points, label='50-day MA', color='red')
         ax1.set_title('Price and Moving Averages')
         ax1.legend()
         ax1.grid(True)
         
         # 2. RSI
         ax2 = axes[1]
-        ax2.plot(self.df.index, self.df['RSI'], color='purple')
+        plotting.plot_line(ax2, df.index, df['RSI'], max_points, color='purple')
         ax2.axhline(y=70, color='r', linestyle='--')
         ax2.axhline(y=30, color='g', linestyle='--')
         ax2.set_title('Relative Strength Index (RSI)')
@@ -113,14 +349,14 @@ class MarketTrendAnalyzer:
         
         # 3. Rate of Change
         ax3 = axes[2]
-        ax3.plot(self.df.index, self.df['ROC'], color='green')
+        plotting.plot_line(ax3, df.index, df['ROC'], max_points, color='green')
         ax3.axhline(y=0, color='black', linestyle='-')
         ax3.set_title('Rate of Change (ROC)')
         ax3.grid(True)
         
         # 4. Volatility
         ax4 = axes[3]
-        ax4.plot(self.df.index, self.df['Volatility'], color='red')
+        plotting.plot_line(ax4, df.index, df['Volatility'], max_points, color='red')
         ax4.set_title('Volatility (20-day Rolling Standard Deviation)')
         ax4.grid(True)
         
@@ -130,6 +366,8 @@ class MarketTrendAnalyzer:
     def generate_report(self):
         """Generate a comprehensive analysis report"""
         analysis = self.analyze_trends()
+        rsi, roc = self._latest('RSI'), self._latest('ROC')
+        ma20, ma50 = self._latest('MA20'), self._latest('MA50')
         
         report = f"""
 Market Trend Analysis Report
@@ -156,15 +394,15 @@ ADF Test P-value: {analysis['stationarity']['p_value']:.4f}
 
 4. Technical Indicators (Latest Values)
 -------------------------
-RSI: {self.df['RSI'].iloc[-1]:.2f}
-ROC (20-day): {self.df['ROC'].iloc[-1]:.2f}%
-20-day MA: ${self.df['MA20'].iloc[-1]:.2f}
-50-day MA: ${self.df['MA50'].iloc[-1]:.2f}
+RSI: {rsi:.2f}
+ROC (20-day): {roc:.2f}%
+20-day MA: ${ma20:.2f}
+50-day MA: ${ma50:.2f}
 
 5. Market Signals
 -------------------------
-RSI Signal: {'Overbought' if self.df['RSI'].iloc[-1] > 70 else 'Oversold' if self.df['RSI'].iloc[-1] < 30 else 'Neutral'}
-MA Signal: {'Bullish' if self.df['MA20'].iloc[-1] > self.df['MA50'].iloc[-1] else 'Bearish'}
+RSI Signal: {'Overbought' if rsi > 70 else 'Oversold' if rsi < 30 else 'Neutral'}
+MA Signal: {'Bullish' if ma20 > ma50 else 'Bearish'}
 """
         return report
 
@@ -192,8 +430,10 @@ def demonstrate_analysis():
     # Print report
     print(analyzer.generate_report())
     
+    import matplotlib.pyplot as plt
     # Use seaborn for styling if available
     try:
+        import seaborn as sns
         sns.set()  # Use seaborn for styling
     except ImportError:
         plt.style.use('ggplot')  # Fallback style
@@ -204,5 +444,80 @@ def demonstrate_analysis():
     plt.show()
     print("Plots displayed.")  # Debugging step
 
+def render_dashboard(data, path, price_column='price', date_column='date', max_points='auto'):
+    """Write the plot_all_trends dashboard for one series to an image file"""
+    analyzer = MarketTrendAnalyzer(data, price_column=price_column, date_column=date_column)
+    plotting.save_figure(analyzer.plot_all_trends(max_points=max_points), path)
+
+def render_dashboards(datasets, output_dir, n_jobs=None, **kwargs):
+    """
+    Render the dashboards of many series ({name: DataFrame}) to
+    <output_dir>/<name>.png in parallel worker processes with the Agg
+    backend; kwargs go to render_dashboard. Returns one dict per chart.
+    """
+    return plotting.render_parallel(render_dashboard, datasets, output_dir, n_jobs=n_jobs, **kwargs)
+
+def _load_analyzer(args):
+    data = pd.read_csv(args.input)
+    return MarketTrendAnalyzer(data, price_column=args.price_column, date_column=args.date_column)
+
+def _cmd_report(args):
+    print(_load_analyzer(args).generate_report())
+
+def _cmd_plot(args):
+    datasets = {os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path) for path in args.inputs}
+    results = render_dashboards(datasets, args.output_dir, n_jobs=args.n_jobs, price_column=args.price_column,
+                                date_column=args.date_column, max_points=args.max_points)
+    for result in results:
+        if 'error' in result:
+            print(f"{result['name']}: error {result['error']}")
+        else:
+            print(f"{result['name']}: {result['path']} ({result['seconds']:.2f}s)")
+
+def _cmd_demo(args):
+    demonstrate_analysis()
+
+def _cmd_check_imports(args):
+    from import_budget import report_import_budget
+    return report_import_budget(os.path.abspath(__file__), args.budget)
+
+def main(argv=None):
+    """
+    Subcommands: report for a CSV of dates and prices, plot for many of
+    them, demo (the default) and check-imports. Each one imports only the libraries it needs.
+    """
+    parser = argparse.ArgumentParser(description='Market trend analysis')
+    commands = parser.add_subparsers(dest='command')
+
+    input_args = argparse.ArgumentParser(add_help=False)
+    input_args.add_argument('input', help='CSV file with a date and a price column')
+    input_args.add_argument('--price-column', default='price')
+    input_args.add_argument('--date-column', default='date')
+
+    report = commands.add_parser('report', parents=[input_args], help='Print the text report')
+    report.set_defaults(func=_cmd_report)
+
+    plot = commands.add_parser('plot', help='Render dashboards to image files, one per CSV, in parallel')
+    plot.add_argument('inputs', nargs='+', help='CSV files with a date and a price column')
+    plot.add_argument('--price-column', default='price')
+    plot.add_argument('--date-column', default='date')
+    plot.add_argument('--output-dir', default='.', help='Writes <output-dir>/<csv name>.png')
+    plot.add_argument('--n-jobs', type=int, help='Worker processes (default: all cores)')
+    plot.add_argument('--max-points', type=lambda v: v if v == 'auto' else int(v), default='auto',
+                      help="Downsample lines to this many points ('auto': the plot's pixel width)")
+    plot.set_defaults(func=_cmd_plot)
+
+    demo = commands.add_parser('demo', help='Report and dashboard for generated sample data (the default)')
+    demo.set_defaults(func=_cmd_demo)
+
+    check = commands.add_parser('check-imports', help='Check the import time of this script against a budget')
+    check.add_argument('--budget', type=float, default=1.0, help='Seconds')
+    check.set_defaults(func=_cmd_check_imports)
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv or ['demo'])
+    status = args.func(args)
+    return status if isinstance(status, int) else 0
+
 if __name__ == "__main__":
-    demonstrate_analysis()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
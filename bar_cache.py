@@ -0,0 +1,224 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Column order of a yf.download frame
+_YF_COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+
+def yfinance_source(ticker, start=None, end=None, interval='5m', period=None):
+    """
+    Default data source: download bars straight from Yahoo Finance, in the
+    yf.download layout ((Price, Ticker) columns, UTC index). Uses
+    yf.Ticker.history, which unlike yf.download keeps no module-level state,
+    so concurrent calls from several threads are safe.
+    """
+    import yfinance as yf
+    if period is not None:
+        history = yf.Ticker(ticker).history(period=period, interval=interval)
+    else:
+        history = yf.Ticker(ticker).history(start=start, end=end, interval=interval)
+    frame = history[[name for name in _YF_COLUMNS if name in history]]
+    if getattr(frame.index, 'tz', None) is not None:
+        frame.index = frame.index.tz_convert('UTC')
+    frame.columns = pd.MultiIndex.from_product([frame.columns, [ticker]], names=['Price', 'Ticker'])
+    return frame
+
+
+def _to_utc(ts):
+    """Naive timestamps are treated as UTC"""
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def _period_to_timedelta(period):
+    """Convert a yfinance style period ('1d', '5d', '1mo', '1y') to a Timedelta"""
+    if period.endswith('mo'):
+        return pd.Timedelta(days=30 * int(period[:-2]))
+    if period.endswith('wk'):
+        return pd.Timedelta(weeks=int(period[:-2]))
+    if period.endswith('y'):
+        return pd.Timedelta(days=365 * int(period[:-1]))
+    if period.endswith('d'):
+        # pd.Timedelta('1d') is deprecated in favour of '1D'
+        return pd.Timedelta(days=int(period[:-1]))
+    return pd.Timedelta(period)
+
+
+class BarCache:
+    """
+    Persistent on-disk bar store in front of a data source.
+
+    Bars are kept as memory-mapped NumPy files partitioned by
+    ticker / interval / UTC date:
+
+        <root>/<ticker>/<interval>/<YYYY-MM-DD>.idx.npy   int64 timestamps (ns, UTC)
+        <root>/<ticker>/<interval>/<YYYY-MM-DD>.npy       float64 values (rows x columns)
+        <root>/<ticker>/<interval>/meta.json              column layout and covered range
+
+    Only the part of a request outside the covered range is fetched from the
+    source; everything else is served from disk. The source is any callable with
+    the yf.download signature ``source(ticker, start=..., end=..., interval=...)``
+    returning an OHLCV DataFrame, so a local fake feed can stand in for Yahoo.
+    """
+
+    def __init__(self, root, source=None, offline=False):
+        self.root = root
+        self.source = source if source is not None else yfinance_source
+        self.offline = offline
+
+    def _dir(self, ticker, interval):
+        return os.path.join(self.root, ticker.replace('/', '_'), interval)
+
+    def _load_meta(self, ticker, interval):
+        path = os.path.join(self._dir(ticker, interval), 'meta.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_meta(self, ticker, interval, meta):
+        path = os.path.join(self._dir(ticker, interval), 'meta.json')
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def _partition_paths(self, ticker, interval, day):
+        base = os.path.join(self._dir(ticker, interval), day)
+        return base + '.idx.npy', base + '.npy'
+
+    def _read_partition(self, ticker, interval, day):
+        idx_path, val_path = self._partition_paths(ticker, interval, day)
+        if not os.path.exists(idx_path):
+            return None, None
+        return np.load(idx_path, mmap_mode='r'), np.load(val_path, mmap_mode='r')
+
+    def _write_partition(self, ticker, interval, day, index, values):
+        idx_path, val_path = self._partition_paths(ticker, interval, day)
+        for path, arr in ((idx_path, index), (val_path, values)):
+            tmp = path + '.tmp.npy'
+            np.save(tmp, arr)
+            os.replace(tmp, path)
+
+    def _store(self, ticker, interval, frame, meta):
+        """Merge a freshly fetched frame into the date partitions"""
+        if frame is None or frame.empty:
+            return meta
+
+        if meta.get('columns') is None:
+            meta['columns'] = [list(c) if isinstance(c, tuple) else c for c in frame.columns]
+            meta['column_names'] = list(frame.columns.names)
+            meta['dtypes'] = [str(dt) for dt in frame.dtypes]
+            meta['index_name'] = frame.index.name
+            meta['tz'] = str(frame.index.tz) if frame.index.tz is not None else None
+        else:
+            columns = [tuple(c) if isinstance(c, list) else c for c in meta['columns']]
+            frame = frame.reindex(columns=columns)
+
+        index = frame.index
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        index = index.tz_convert('UTC').as_unit('ns')
+        ns = index.asi8
+        values = frame.to_numpy(dtype=np.float64)
+        # Integer columns (e.g. Volume) with a missing bar can't be read back as integers
+        for i, dtype in enumerate(meta['dtypes']):
+            if np.dtype(dtype).kind in 'iub' and np.isnan(values[:, i]).any():
+                meta['dtypes'][i] = 'float64'
+        days = index.strftime('%Y-%m-%d')
+
+        for day in pd.unique(days):
+            mask = days == day
+            new_ns, new_values = ns[mask], values[mask]
+            old_ns, old_values = self._read_partition(ticker, interval, day)
+            if old_ns is not None:
+                # New bars win on duplicate timestamps (the last cached bar may have been partial)
+                keep = ~np.isin(old_ns, new_ns)
+                new_ns = np.concatenate([np.asarray(old_ns)[keep], new_ns])
+                new_values = np.concatenate([np.asarray(old_values)[keep], new_values])
+                order = np.argsort(new_ns, kind='stable')
+                new_ns, new_values = new_ns[order], new_values[order]
+            self._write_partition(ticker, interval, day, new_ns, new_values)
+
+        last = int(ns.max())
+        if meta.get('last_bar') is None or last > meta['last_bar']:
+            meta['last_bar'] = last
+        return meta
+
+    def _fetch(self, ticker, interval, start, end, source=None):
+        source = self.source if source is None else source
+        return source(ticker, start=start, end=end, interval=interval)
+
+    def get(self, ticker, start, end, interval='5m', source=None):
+        """
+        Return bars in [start, end), fetching only what is not cached yet
+        (from `source` if given, else the cache's own source)
+        """
+        start, end = _to_utc(start), _to_utc(end)
+        end = min(end, pd.Timestamp.now(tz='UTC'))
+        os.makedirs(self._dir(ticker, interval), exist_ok=True)
+        meta = self._load_meta(ticker, interval) or {}
+
+        if not self.offline:
+            if meta.get('covered') is None:
+                meta = self._store(ticker, interval, self._fetch(ticker, interval, start, end, source), meta)
+                meta['covered'] = [start.value, end.value]
+            else:
+                covered_start, covered_end = meta['covered']
+                if start.value < covered_start:
+                    head = self._fetch(ticker, interval, start, pd.Timestamp(covered_start, tz='UTC'), source)
+                    meta = self._store(ticker, interval, head, meta)
+                    covered_start = start.value
+                if end.value > covered_end:
+                    # Re-fetch from the last cached bar so a partially formed bar gets replaced
+                    tail_start = covered_end
+                    if meta.get('last_bar') is not None:
+                        tail_start = min(tail_start, meta['last_bar'])
+                    tail = self._fetch(ticker, interval, pd.Timestamp(tail_start, tz='UTC'), end, source)
+                    meta = self._store(ticker, interval, tail, meta)
+                    covered_end = end.value
+                meta['covered'] = [covered_start, covered_end]
+            self._save_meta(ticker, interval, meta)
+
+        return self._read(ticker, interval, start, end, meta)
+
+    def get_recent(self, ticker, period='1d', interval='1m', source=None):
+        """Return the most recent `period` of bars, like yf.download(period=...)"""
+        end = pd.Timestamp.now(tz='UTC')
+        return self.get(ticker, end - _period_to_timedelta(period), end, interval, source)
+
+    def _read(self, ticker, interval, start, end, meta):
+        if meta.get('columns') is None:
+            return pd.DataFrame()
+
+        indexes, values = [], []
+        for day in pd.date_range(start.normalize(), end.normalize(), freq='D').strftime('%Y-%m-%d'):
+            ns, vals = self._read_partition(ticker, interval, day)
+            if ns is None:
+                continue
+            lo = np.searchsorted(ns, start.value, side='left')
+            hi = np.searchsorted(ns, end.value, side='left')
+            indexes.append(ns[lo:hi])
+            values.append(vals[lo:hi])
+
+        n_cols = len(meta['columns'])
+        ns = np.concatenate(indexes) if indexes else np.empty(0, dtype=np.int64)
+        vals = np.concatenate(values) if values else np.empty((0, n_cols))
+
+        index = pd.DatetimeIndex(ns.astype('datetime64[ns]'), name=meta['index_name']).tz_localize('UTC')
+        index = index.tz_convert(meta['tz']) if meta['tz'] is not None else index.tz_localize(None)
+        if meta['column_names'] and len(meta['column_names']) > 1:
+            columns = pd.MultiIndex.from_tuples([tuple(c) for c in meta['columns']], names=meta['column_names'])
+        else:
+            columns = pd.Index(meta['columns'], name=meta['column_names'][0] if meta['column_names'] else None)
+
+        frame = pd.DataFrame(vals, index=index, columns=columns)
+        for col, dtype in zip(columns, meta['dtypes']):
+            if dtype != 'float64':
+                frame[col] = frame[col].astype(dtype)
+        return frame
@@ -0,0 +1,332 @@
+"""
+Benchmarks for every pipeline stage of the trading bot and the trend analyzers.
+
+Each stage runs on synthetic random-walk data (the same recipe as
+demonstrate_analysis) of 10k, 1M or 10M bars. Wall time is the best of
+`repeat` runs after an untimed warm-up run; peak memory comes from one
+extra run under tracemalloc. Results are written as JSON and can be
+compared against a stored baseline; the exit status is 1 when any stage
+got slower (or hungrier) than the baseline by more than the threshold.
+
+    python benchmarks.py --sizes 10k 1m --output results.json
+    python benchmarks.py --sizes 10k 1m --baseline results.json --threshold 0.25
+
+Setup work a stage depends on (features, the fitted model, signals) is
+done outside the timed region. train_hmm runs a fixed number of EM
+iterations (HMM_ITER) so its time measures the cost per pass over the
+data rather than how fast a random init happens to converge.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import hmm_trading_bot2 as bot
+import stationarity
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# EM iterations for the train_hmm stage
+HMM_ITER = 10
+
+# A stage regresses when it is this much slower (or uses this much more memory) than the baseline
+DEFAULT_THRESHOLD = 0.25
+
+# Stages faster than this (seconds) are too noisy to flag
+MIN_SECONDS = 0.05
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_scripts = {}
+
+
+def _load_script(filename, name):
+    """Import one of the analyzer scripts (their file names have spaces)"""
+    if name not in _scripts:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(_HERE, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[name] = module
+    return _scripts[name]
+
+
+def parse_size(size):
+    """'10k', '1m', '10m' or a plain number of bars"""
+    size = str(size).lower()
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def random_walk(n, seed=42, loc=100.0, scale=10.0, start=1000.0):
+    """demonstrate_analysis' random walk with drift: cumulative normal steps"""
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(loc=loc, scale=scale, size=n)) + start
+
+
+def synthetic_prices(n, seed=42):
+    """date/price frame for the trend analyzers, one row per minute"""
+    return pd.DataFrame({
+        'date': pd.date_range(start='2000-01-01', periods=n, freq='min'),
+        'price': random_walk(n, seed)
+    })
+
+
+def synthetic_bars(n, seed=42, ticker='ES=F'):
+    """
+    OHLCV frame in the layout get_stock_data returns (UTC minute index,
+    (Price, Ticker) columns). Close is a geometric random walk so prices stay
+    positive at any length.
+    """
+    rng = np.random.default_rng(seed + 1)
+    close = 5000.0 * np.exp(random_walk(n, seed, loc=0.0, scale=5e-4, start=0.0))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(scale=0.5, size=(2, n)))
+    columns = {
+        'Close': close,
+        'High': np.maximum(open_, close) + spread[0],
+        'Low': np.minimum(open_, close) - spread[1],
+        'Open': open_,
+        'Volume': rng.integers(100, 5000, size=n).astype(np.float64)
+    }
+    index = pd.date_range(start='2020-01-01', periods=n, freq='min', tz='UTC', name='Datetime')
+    frame = pd.DataFrame(columns, index=index)
+    frame.columns = pd.MultiIndex.from_product([frame.columns, [ticker]], names=['Price', 'Ticker'])
+    return frame
+
+
+class _Dataset:
+    """Synthetic inputs of one size; intermediate results are built on first use and kept"""
+
+    def __init__(self, n, seed=42):
+        self.n = n
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def bars(self):
+        return self._get('bars', lambda: synthetic_bars(self.n, self.seed))
+
+    @property
+    def features(self):
+        return self._get('features', lambda: bot.add_features(self.bars.copy()))
+
+    @property
+    def model(self):
+        return self._get('model', lambda: bot.train_hmm(self.features, n_iter=HMM_ITER, random_state=0))
+
+    @property
+    def states(self):
+        return self._get('states', lambda: bot.predict_hmm(self.model, self.features))
+
+    @property
+    def signals(self):
+        return self._get('signals', lambda: bot.generate_signals(self.states, self.features))
+
+    @property
+    def prices(self):
+        return self._get('prices', lambda: synthetic_prices(self.n, self.seed))
+
+
+# Each stage does its untimed setup and returns the call to time
+def _add_features(ds):
+    bars = ds.bars.copy()
+    return lambda: bot.add_features(bars)
+
+
+def _train_hmm(ds):
+    features = ds.features
+    return lambda: bot.train_hmm(features, n_iter=HMM_ITER, random_state=0)
+
+
+def _predict_hmm(ds):
+    model, features = ds.model, ds.features
+    return lambda: bot.predict_hmm(model, features)
+
+
+def _generate_signals(ds):
+    states, features = ds.states, ds.features
+    return lambda: bot.generate_signals(states, features)
+
+
+def _backtest(ds):
+    (buy, sell), features = ds.signals, ds.features
+    return lambda: bot.backtest(features, buy, sell, bot.DEFAULT_STRATEGY_CONFIG)
+
+
+def _analyze_market_trends(ds):
+    analysis = _load_script('Market Trend Analysis.py', 'market_trend_analysis')
+    prices = ds.prices
+    stationarity.clear_cache()
+    return lambda: analysis.analyze_market_trends(prices)
+
+
+def _analyze_trends(ds):
+    analysis = _load_script('Market Trend Analysis2.py', 'market_trend_analysis2')
+    analyzer = analysis.MarketTrendAnalyzer(ds.prices)
+    stationarity.clear_cache()
+    return analyzer.analyze_trends
+
+
+def _generate_report(ds):
+    analysis = _load_script('Market Trend Analysis2.py', 'market_trend_analysis2')
+    analyzer = analysis.MarketTrendAnalyzer(ds.prices)
+    stationarity.clear_cache()
+    return analyzer.generate_report
+
+
+STAGES = {
+    'add_features': _add_features,
+    'train_hmm': _train_hmm,
+    'predict_hmm': _predict_hmm,
+    'generate_signals': _generate_signals,
+    'backtest': _backtest,
+    'analyze_market_trends': _analyze_market_trends,
+    'MarketTrendAnalyzer.analyze_trends': _analyze_trends,
+    'MarketTrendAnalyzer.generate_report': _generate_report
+}
+
+
+def measure(setup, repeat=3, memory=True):
+    """
+    Run setup()() once untimed to warm up lazy imports and caches, once
+    more under tracemalloc for the peak allocation if memory is set, then
+    time it `repeat` times with a fresh setup every run.
+    Returns {'seconds' (best), 'runs', 'peak_mb'}.
+    """
+    setup()()
+
+    peak_mb = None
+    if memory:
+        call = setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            call()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+        del call
+
+    runs = []
+    for _ in range(repeat):
+        call = setup()
+        gc.collect()
+        start = time.perf_counter()
+        call()
+        runs.append(time.perf_counter() - start)
+        del call
+    return {'seconds': min(runs), 'runs': runs, 'peak_mb': peak_mb}
+
+
+def run_benchmarks(sizes=('10k',), stages=None, repeat=3, memory=True, seed=42):
+    """Benchmark the selected stages (default: all) at each size and return the JSON-ready result"""
+    stages = list(STAGES) if stages is None else stages
+    for name in stages:
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage: {name} (choose from {', '.join(STAGES)})")
+
+    results = []
+    for size in sizes:
+        ds = _Dataset(parse_size(size), seed)
+        for name in stages:
+            try:
+                result = measure(lambda: STAGES[name](ds), repeat, memory)
+            except (MemoryError, ValueError) as e:
+                # One stage not fitting (e.g. out of memory at 10M bars) shouldn't lose the rest of the run
+                print(f"{name} @ {ds.n:,} bars: failed: {e!r}", file=sys.stderr)
+                results.append({'stage': name, 'n_bars': ds.n, 'error': repr(e)})
+                continue
+            peak = '' if result['peak_mb'] is None else f", peak {result['peak_mb']:,.1f} MB"
+            print(f"{name} @ {ds.n:,} bars: {result['seconds']:.4f}s{peak}", file=sys.stderr)
+            results.append({'stage': name, 'n_bars': ds.n, **result})
+        del ds
+        gc.collect()
+
+    return {
+        'meta': {
+            'created': pd.Timestamp.now(tz='UTC').isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+            'seed': seed,
+            'hmm_iter': HMM_ITER
+        },
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_SECONDS):
+    """
+    Stages of `current` that regressed against `baseline` (both run_benchmarks
+    results): slower, or with a higher peak memory, by more than `threshold`
+    (a fraction). Stages missing from the baseline are not compared.
+    """
+    previous = {(r['stage'], r['n_bars']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous.get((result['stage'], result['n_bars']))
+        if before is None:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None or old <= 0:
+                continue
+            if metric == 'seconds' and max(old, new) < min_seconds:
+                continue
+            change = new / old - 1
+            if change > threshold:
+                regressions.append({'stage': result['stage'], 'n_bars': result['n_bars'], 'metric': metric,
+                                    'baseline': old, 'current': new, 'change': change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the trading bot and trend analyzer pipeline stages')
+    parser.add_argument('--sizes', nargs='+', default=['10k'], help="Dataset sizes: 10k, 1m, 10m or a number of bars")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help='Stages to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage, the best one is reported')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak memory run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON results here (default: stdout)')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown / memory growth as a fraction of the baseline')
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes, args.stages, args.repeat, not args.no_memory, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        failed = [r for r in current['results'] if 'error' in r]
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} @ {r['n_bars']:,} bars: {r['metric']} "
+                  f"{r['baseline']:.4g} -> {r['current']:.4g} (+{r['change']:.0%})", file=sys.stderr)
+        if regressions or failed:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Additive seasonal decomposition of a growing series.
+
+Gives the same trend, seasonal and residual components as
+statsmodels' seasonal_decompose(x, period=p) (additive, centred moving
+average, no trend extrapolation) but keeps the moving-average trend and
+the per-phase sums of the detrended values as running state. Appending
+points only computes the trend values that the new points complete, so
+re-decomposing after every new close costs O(new points * periods)
+plus building the output arrays, instead of a full pass over the history.
+"""
+import numpy as np
+
+
+def _half_width(period):
+    """Points on each side of the centred moving average (its NaN margin)"""
+    return period // 2
+
+
+class IncrementalDecomposition:
+    """
+    Running additive decomposition for one or several seasonal periods.
+
+    All periods share one pass over the appended points. Feed it with
+    append(values) for new points only, or update(series) with the whole
+    series (only the part past what was already seen is processed as long
+    as the earlier values are unchanged).
+    """
+
+    def __init__(self, periods=30, capacity=1024):
+        self.periods = tuple(int(p) for p in np.atleast_1d(periods))
+        if not self.periods or min(self.periods) < 2:
+            raise ValueError("Seasonal periods must be at least 2")
+        self._capacity = capacity
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self._x = np.empty(self._capacity)
+        self._trend = {p: np.full(self._capacity, np.nan) for p in self.periods}
+        self._phase_sums = {p: np.zeros(p) for p in self.periods}
+        self._phase_counts = {p: np.zeros(p) for p in self.periods}
+        # Trend values before this position are final (the first half-width stay NaN)
+        self._done = {p: _half_width(p) for p in self.periods}
+
+    def _reserve(self, n):
+        if n <= len(self._x):
+            return
+        capacity = max(n, 2 * len(self._x))
+        x = np.empty(capacity)
+        x[:self.n] = self._x[:self.n]
+        self._x = x
+        for p, trend in self._trend.items():
+            grown = np.full(capacity, np.nan)
+            grown[:self.n] = trend[:self.n]
+            self._trend[p] = grown
+
+    def append(self, values):
+        """Add new points to the end of the series"""
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if np.isnan(values).any():
+            raise ValueError("Seasonal decomposition does not handle missing values")
+        if len(values) == 0:
+            return self
+        self._reserve(self.n + len(values))
+        self._x[self.n:self.n + len(values)] = values
+        self.n += len(values)
+        x = self._x[:self.n]
+
+        # One prefix sum over the region every period still needs, shifted by its
+        # first value to keep the sums small
+        lo = min(self._done[p] - _half_width(p) for p in self.periods)
+        base = x[lo]
+        prefix = np.concatenate([[0.0], np.cumsum(x[lo:] - base)])
+
+        for p in self.periods:
+            h = _half_width(p)
+            t = np.arange(self._done[p], self.n - h)
+            if len(t) == 0:
+                continue
+            if p % 2:
+                window = prefix[t + h + 1 - lo] - prefix[t - h - lo]
+            else:
+                # Weights 1/2, 1, ..., 1, 1/2 over p + 1 points
+                window = (prefix[t + h - lo] - prefix[t - h + 1 - lo]
+                          + 0.5 * (x[t - h] - base + x[t + h] - base))
+            trend = window / p + base
+            self._trend[p][t] = trend
+            phases = t % p
+            self._phase_sums[p] += np.bincount(phases, weights=x[t] - trend, minlength=p)
+            self._phase_counts[p] += np.bincount(phases, minlength=p)
+            self._done[p] = self.n - h
+        return self
+
+    def update(self, series):
+        """Bring the state up to date with the whole series, recomputing from scratch only if its past changed"""
+        series = np.asarray(series, dtype=np.float64).reshape(-1)
+        if len(series) < self.n or not np.array_equal(series[:self.n], self._x[:self.n]):
+            self.reset()
+        return self.append(series[self.n:])
+
+    def _period(self, period):
+        period = self.periods[0] if period is None else period
+        if period not in self._trend:
+            raise ValueError(f"Period {period} is not tracked (periods: {self.periods})")
+        if self.n < 2 * period:
+            raise ValueError(f"x must have 2 complete cycles requires {2 * period} observations. "
+                             f"x only has {self.n} observation(s)")
+        return period
+
+    def trend(self, period=None):
+        period = self._period(period)
+        return self._trend[period][:self.n].copy()
+
+    def seasonal(self, period=None):
+        period = self._period(period)
+        means = self._phase_sums[period] / self._phase_counts[period]
+        means -= means.mean()
+        return means[np.arange(self.n) % period]
+
+    def components(self, period=None):
+        """{'trend', 'seasonal', 'residual'} arrays for one period (default: the first)"""
+        period = self._period(period)
+        trend = self.trend(period)
+        seasonal = self.seasonal(period)
+        return {'trend': trend, 'seasonal': seasonal, 'residual': self._x[:self.n] - trend - seasonal}
+
+    def all_components(self):
+        """components() for every tracked period, keyed by period"""
+        return {p: self.components(p) for p in self.periods}
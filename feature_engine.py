@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _column(data, name):
+    """1-D float array of a column, whether or not yfinance returned MultiIndex columns"""
+    return np.asarray(data[name], dtype=np.float64).reshape(len(data), -1)[:, 0]
+
+
+def iter_bars(data):
+    """(timestamp, {column: value}) for every row of an OHLCV frame, in the form update() takes"""
+    columns = {name: _column(data, name) for name in OHLCV_COLUMNS if name in data}
+    for i, timestamp in enumerate(data.index):
+        yield timestamp, {name: float(values[i]) for name, values in columns.items()}
+
+
+class _RollingWindow:
+    """
+    Fixed-size ring buffer with a sliding mean and variance (Welford add/remove).
+    Mirrors pandas rolling(window).mean()/.std() with min_periods=window: the
+    result is NaN until the window is full or while it contains a NaN.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.buf = np.full(size, np.nan)
+        self.pos = 0
+        self.seen = 0
+        self.n = 0          # non-NaN values currently in the window
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _add(self, x):
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+
+    def _remove(self, x):
+        if self.n == 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        d = x - self.mean
+        self.mean -= d / self.n
+        self.m2 -= d * (x - self.mean)
+
+    def push(self, x):
+        old = self.buf[self.pos]
+        if self.seen >= self.size and not np.isnan(old):
+            self._remove(old)
+        self.buf[self.pos] = x
+        if not np.isnan(x):
+            self._add(x)
+        self.pos = (self.pos + 1) % self.size
+        self.seen += 1
+        if self.pos == 0:
+            # Re-anchor once per lap so float drift from add/remove cannot accumulate
+            valid = self.buf[~np.isnan(self.buf)]
+            self.n = len(valid)
+            self.mean = valid.mean() if self.n else 0.0
+            self.m2 = ((valid - self.mean) ** 2).sum() if self.n else 0.0
+
+    @property
+    def full(self):
+        return self.seen >= self.size and self.n == self.size
+
+    def get_mean(self):
+        return self.mean if self.full else np.nan
+
+    def get_std(self):
+        if not self.full:
+            return np.nan
+        return np.sqrt(max(self.m2, 0.0) / (self.size - 1))
+
+
+class _Ewm:
+    """pandas ewm(span=span, adjust=False).mean() as running state"""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = np.nan
+
+    def push(self, x):
+        if np.isnan(self.value):
+            self.value = x
+        elif not np.isnan(x):
+            self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class FeatureEngine:
+    """
+    Stateful counterpart of add_features in hmm_trading_bot2.py.
+
+    Each call to update() consumes one OHLCV bar and updates every feature in
+    constant time from running sums, EWM state and ring buffers. Once the
+    rolling windows are warm the values equal the batch path (up to float
+    rounding); like add_features, a feature that comes out NaN or inf is
+    forward-filled from the previous bar. The batch path back-fills the
+    warm-up rows, which a stream cannot do, so those rows stay NaN here.
+
+    Use from_frame() to seed the state from history that was already run
+    through the batch path, then feed only the new bars.
+    """
+
+    def __init__(self, rsi_period=14, bollinger_window=20, num_std_dev=2.0, atr_period=14):
+        self.num_std_dev = num_std_dev
+        self.mean_5 = _RollingWindow(5)
+        self.mean_10 = _RollingWindow(10)
+        self.ema_12 = _Ewm(12)
+        self.ema_26 = _Ewm(26)
+        self.gain = _RollingWindow(rsi_period)
+        self.loss = _RollingWindow(rsi_period)
+        self.bollinger = _RollingWindow(bollinger_window)
+        self.true_range = _RollingWindow(atr_period)
+        self.prev_close = np.nan
+        self.prev_volume = np.nan
+        self.last = {}
+        self.n_bars = 0
+
+    @staticmethod
+    def _pct_change(x, prev):
+        if np.isnan(prev):
+            return np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = x / prev - 1.0
+        return change if np.isfinite(change) else np.nan
+
+    def _ffill(self, name, value):
+        if np.isfinite(value):
+            self.last[name] = value
+            return value
+        return self.last.get(name, np.nan)
+
+    def update(self, bar):
+        """
+        Add one bar (a mapping with High, Low, Close and Volume) and return a
+        dict of the bar plus every feature column add_features produces.
+        """
+        high, low = float(bar['High']), float(bar['Low'])
+        close, volume = float(bar['Close']), float(bar['Volume'])
+
+        close_pct = self._pct_change(close, self.prev_close)
+        volume_pct = self._pct_change(volume, self.prev_volume)
+
+        self.mean_5.push(close)
+        self.mean_10.push(close)
+        macd = self.ema_12.push(close) - self.ema_26.push(close)
+
+        # diff() of the first bar is NaN, which the batch RSI counts as 0 gain / 0 loss
+        delta = 0.0 if np.isnan(self.prev_close) else close - self.prev_close
+        self.gain.push(delta if delta > 0 else 0.0)
+        self.loss.push(-delta if delta < 0 else 0.0)
+        gain, loss = self.gain.get_mean(), self.loss.get_mean()
+        rs = gain / loss if loss != 0 and not np.isnan(loss) else np.nan
+        rs = rs if np.isfinite(rs) else 0.0
+        rsi = 100 - (100 / (1 + rs))
+
+        self.bollinger.push(close)
+        boll_mean, boll_std = self.bollinger.get_mean(), self.bollinger.get_std()
+
+        if np.isnan(self.prev_close):
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.true_range.push(tr)
+
+        self.prev_close, self.prev_volume = close, volume
+        self.n_bars += 1
+
+        features = {
+            'Close_pct_change': close_pct,
+            'Volume_pct_change': volume_pct,
+            'Rolling_mean_5': self.mean_5.get_mean(),
+            'Rolling_mean_10': self.mean_10.get_mean(),
+            'MACD': macd,
+            'RSI': rsi,
+            'Bollinger_Upper': boll_mean + boll_std * self.num_std_dev,
+            'Bollinger_Lower': boll_mean - boll_std * self.num_std_dev,
+        }
+        row = dict(bar)
+        for name, value in features.items():
+            row[name] = self._ffill(name, value)
+        # ATR is recomputed after the fill in the batch path, so it is not forward-filled
+        row['ATR'] = self.true_range.get_mean()
+        return row
+
+    def update_frame(self, bars):
+        """Feed every row of an OHLCV frame and return the feature rows as a DataFrame"""
+        rows = [self.update(bar) for _, bar in iter_bars(bars)]
+        return pd.DataFrame(rows, index=bars.index)
+
+    @classmethod
+    def from_frame(cls, data, **kwargs):
+        """
+        Build an engine whose state continues from the end of `data`, a frame
+        that has already been through add_features (or raw OHLCV history).
+        Only the tail needed by the ring buffers is replayed; the EWM state is
+        taken from the batch ewm over the full history.
+        """
+        engine = cls(**kwargs)
+        close = pd.Series(_column(data, 'Close'))
+        warmup = max(w.size for w in (engine.mean_10, engine.gain, engine.bollinger, engine.true_range)) + 1
+        tail = data.iloc[-warmup:]
+
+        # Replay the tail so the ring buffers, previous close/volume and ffill state line up
+        ema_12, ema_26 = engine.ema_12, engine.ema_26
+        if len(data) > len(tail):
+            head = close.iloc[:len(data) - len(tail)]
+            ema_12.value = head.ewm(span=12, adjust=False).mean().iloc[-1]
+            ema_26.value = head.ewm(span=26, adjust=False).mean().iloc[-1]
+            engine.prev_close = float(head.iloc[-1])
+            engine.prev_volume = float(_column(data, 'Volume')[len(head) - 1])
+        engine.update_frame(tail)
+        return engine
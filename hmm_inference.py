@@ -0,0 +1,238 @@
+from collections import deque
+
+import numpy as np
+
+
+def log_emission(model, X):
+    """
+    Gaussian log densities log p(x_t | state k) for a fitted GaussianHMM.
+
+    X: (T, D) feature rows, or any (..., D) stack such as (symbols, T, D).
+    Returns a (T, K) (or (..., K)) array.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[None, :]
+    shape = X.shape[:-1]
+    X = X.reshape(-1, X.shape[-1])
+    means = model.means_
+    covars = model.covars_  # always (K, D, D), whatever covariance_type was fitted
+    n_features = X.shape[1]
+
+    if model.covariance_type in ('diag', 'spherical'):
+        var = np.diagonal(covars, axis1=1, axis2=2)
+        log_det = np.log(var).sum(axis=1)
+        # One state at a time keeps temporaries at (rows, D) for large batches
+        sq = np.empty((len(X), len(means)))
+        for k in range(len(means)):
+            diff = X - means[k]
+            diff *= diff
+            sq[:, k] = diff @ (1 / var[k])
+    else:
+        chol = np.linalg.cholesky(covars)
+        log_det = 2 * np.log(np.diagonal(chol, axis1=1, axis2=2)).sum(axis=1)
+        sq = np.empty((len(X), len(means)))
+        for k in range(len(means)):
+            z = np.linalg.solve(chol[k], (X - means[k]).T)
+            sq[:, k] = (z ** 2).sum(axis=0)
+
+    log_b = -0.5 * (n_features * np.log(2 * np.pi) + log_det[None, :] + sq)
+    return log_b.reshape(*shape, len(means))
+
+
+def stack_sequences(sequences):
+    """
+    Pad feature matrices of different lengths into one (symbols, T, D) array
+    (NaN after each sequence's end) and return it with the lengths
+    """
+    sequences = [np.atleast_2d(np.asarray(x, dtype=np.float64)) for x in sequences]
+    lengths = np.array([len(x) for x in sequences], dtype=np.int64)
+    X = np.full((len(sequences), lengths.max(initial=0), sequences[0].shape[1] if sequences else 0), np.nan)
+    for i, x in enumerate(sequences):
+        X[i, :len(x)] = x
+    return X, lengths
+
+
+def _batch(X, lengths):
+    """(S, T, D) features and the (S, T) mask of rows inside each sequence"""
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 2:
+        X = X[None]
+    n_symbols, n_steps = X.shape[:2]
+    lengths = np.full(n_symbols, n_steps) if lengths is None else np.asarray(lengths, dtype=np.int64)
+    if len(lengths) != n_symbols or (lengths < 1).any() or (lengths > n_steps).any():
+        raise ValueError("lengths must give 1..T rows for every sequence")
+    valid = np.arange(n_steps)[None, :] < lengths[:, None]
+    return X, lengths, valid
+
+
+def viterbi_batch(model, X, lengths=None):
+    """
+    Viterbi decoding of many sequences with one fitted GaussianHMM, all in
+    one vectorized pass: the recursion loops over time only, every step
+    handles all symbols at once.
+
+    X: (symbols, T, D) features, sequence s occupying its first lengths[s]
+    rows (the rest is ignored, e.g. NaN padding from stack_sequences).
+    Returns (log_prob, states): the (symbols,) log-probability of each best
+    path and the (symbols, T) state matrix, -1 past each sequence's end.
+    Same paths as model.decode / predict_hmm on each sequence separately.
+
+    The per-step cost is shared by all symbols, so this pays off for many
+    symbols over short windows (a whole universe every bar); for a few long
+    histories hmmlearn's compiled per-sequence loop is just as fast.
+    """
+    X, lengths, valid = _batch(X, lengths)
+    n_symbols, n_steps = valid.shape
+    log_b = log_emission(model, np.where(valid[..., None], X, 0.0))
+    with np.errstate(divide='ignore'):
+        log_start = np.log(model.startprob_)
+        log_trans = np.log(model.transmat_)
+    n_states = len(log_start)
+
+    delta = log_start[None, :] + log_b[:, 0]
+    backpointers = np.empty((n_steps, n_symbols, n_states), dtype=np.int64)
+    backpointers[0] = np.arange(n_states)
+    ragged = (lengths < n_steps).any()
+    for t in range(1, n_steps):
+        scores = delta[:, :, None] + log_trans[None, :, :]
+        best = scores.argmax(axis=1)
+        step = scores.max(axis=1) + log_b[:, t]
+        if ragged:
+            # Finished sequences keep their last delta and point back to themselves
+            live = valid[:, t, None]
+            step = np.where(live, step, delta)
+            best = np.where(live, best, np.arange(n_states))
+        delta = step
+        backpointers[t] = best
+
+    states = np.empty((n_symbols, n_steps), dtype=np.int64)
+    states[:, -1] = delta.argmax(axis=1)
+    symbols = np.arange(n_symbols)
+    for t in range(n_steps - 1, 0, -1):
+        states[:, t - 1] = backpointers[t, symbols, states[:, t]]
+    states[~valid] = -1
+    return delta.max(axis=1), states
+
+
+def forward_batch(model, X, lengths=None):
+    """
+    Forward filtering of many sequences at once, the batched counterpart of
+    OnlineRegimeFilter.update_many.
+
+    Returns (log_likelihood, posteriors): the (symbols,) log-likelihood of
+    each sequence and the (symbols, T, K) filtered posteriors
+    p(state_t | x_1..t), NaN past each sequence's end.
+    """
+    X, lengths, valid = _batch(X, lengths)
+    n_symbols, n_steps = valid.shape
+    log_b = log_emission(model, np.where(valid[..., None], X, 0.0))
+    startprob = np.asarray(model.startprob_, dtype=np.float64)
+    transmat = np.asarray(model.transmat_, dtype=np.float64)
+
+    posteriors = np.full((n_symbols, n_steps, len(startprob)), np.nan)
+    log_likelihood = np.zeros(n_symbols)
+    alpha = None
+    for t in range(n_steps):
+        shift = log_b[:, t].max(axis=1)
+        b = np.exp(log_b[:, t] - shift[:, None])
+        prior = np.broadcast_to(startprob, b.shape) if alpha is None else alpha @ transmat
+        step = prior * b
+        norm = step.sum(axis=1)
+        # Rows wildly out of distribution for every state fall back to the prior
+        bad = (norm == 0) | ~np.isfinite(norm)
+        step = np.where(bad[:, None], prior, step)
+        norm = np.where(bad, 1.0, norm)
+        step /= norm[:, None]
+
+        live = valid[:, t]
+        alpha = step if alpha is None else np.where(live[:, None], step, alpha)
+        log_likelihood += np.where(live, np.log(norm) + shift, 0.0)
+        posteriors[live, t] = alpha[live]
+    return log_likelihood, posteriors
+
+
+def predict_batch(model, X, lengths=None, algorithm='viterbi'):
+    """
+    (symbols, T) state matrix for a batch of sequences, -1 past each end.
+    algorithm='viterbi' gives the predict_hmm paths, 'filter' the most
+    likely current state at every bar (OnlineRegimeFilter.state).
+    """
+    if algorithm == 'viterbi':
+        return viterbi_batch(model, X, lengths)[1]
+    if algorithm == 'filter':
+        _, posteriors = forward_batch(model, X, lengths)
+        states = np.nan_to_num(posteriors, nan=-1.0).argmax(axis=2)
+        states[np.isnan(posteriors[..., 0])] = -1
+        return states
+    raise ValueError(f"Unknown decoding algorithm: {algorithm}")
+
+
+class OnlineRegimeFilter:
+    """
+    Forward filtering with a fitted GaussianHMM, one feature row at a time.
+
+    predict_hmm runs Viterbi over the whole history on every call. This keeps
+    the normalised forward-probability vector between calls instead, so each new
+    bar costs O(K^2). With lag > 0 it also keeps the last `lag` steps and
+    produces a fixed-lag smoothed posterior for the bar `lag` steps back,
+    at O(lag * K^2) per bar.
+    """
+
+    def __init__(self, model, lag=0):
+        self.model = model
+        self.lag = lag
+        self.transmat = np.asarray(model.transmat_, dtype=np.float64)
+        self.startprob = np.asarray(model.startprob_, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        """Forget all history, the next row is treated as the first of a sequence"""
+        self.alpha = None
+        self.log_likelihood = 0.0
+        self.n_seen = 0
+        self.smoothed = None
+        self._window = deque(maxlen=self.lag + 1)
+
+    @property
+    def state(self):
+        """Most likely current regime"""
+        return None if self.alpha is None else int(np.argmax(self.alpha))
+
+    def update(self, x):
+        """Consume one feature row and return the filtered posterior p(state_t | x_1..t)"""
+        log_b = log_emission(self.model, x)[0]
+        shift = log_b.max()
+        b = np.exp(log_b - shift)
+
+        prior = self.startprob if self.alpha is None else self.alpha @ self.transmat
+        alpha = prior * b
+        norm = alpha.sum()
+        if norm == 0 or not np.isfinite(norm):
+            # Row is wildly out of distribution for every state: fall back to the prior
+            alpha, norm = prior.copy(), 1.0
+        self.alpha = alpha / norm
+        self.log_likelihood += np.log(norm) + shift
+        self.n_seen += 1
+
+        if self.lag:
+            self._window.append((self.alpha, b))
+            if len(self._window) == self._window.maxlen:
+                self.smoothed = self._smooth()
+        return self.alpha
+
+    def update_many(self, X):
+        """Consume several rows, returning the (T, K) filtered posteriors"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.size == 0:
+            return np.empty((0, len(self.transmat)))
+        return np.vstack([self.update(row) for row in np.atleast_2d(X)])
+
+    def _smooth(self):
+        """p(state_{t-lag} | x_1..t) by a backward pass over the lag window"""
+        beta = np.ones(len(self.transmat))
+        for _, b in reversed(list(self._window)[1:]):
+            beta = self.transmat @ (b * beta)
+            beta /= beta.sum()
+        gamma = self._window[0][0] * beta
+        return gamma / gamma.sum()
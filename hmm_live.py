@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import hmm_trading_bot2 as bot
+from feature_engine import FeatureEngine, iter_bars
+from hmm_inference import OnlineRegimeFilter
+
+logger = logging.getLogger(__name__)
+
+# Rows of feature history the signal rules look at (20-bar volume/ATR averages plus the previous regime)
+SIGNAL_WINDOW = 21
+SIGNAL_COLUMNS = ['Close', 'Volume', 'ATR', 'MACD', 'RSI', 'Bollinger_Lower', 'Bollinger_Upper']
+
+
+class PollingFeed:
+    """
+    Live feed that polls get_realtime_data for every ticker each interval_s
+    seconds and yields the completed bars it has not seen yet. The last bar
+    of a poll is held back until its bar_interval has elapsed, so a bar is
+    only ever emitted once, with its final values. Poll failures go to
+    on_error(ticker, exception) (logged by default) and the ticker is retried
+    on the next poll.
+
+    A feed is any object whose bars() is an async iterator of
+    (ticker, timestamp, bar dict) in arrival order; LiveRunner only relies on that.
+    Feeds may also offer mark_seen(ticker, timestamp), which LiveRunner.warmup
+    calls so the warm-up history is not fed through a second time.
+    """
+
+    def __init__(self, tickers, interval_s=60.0, cache=None, fetch=None, bar_interval='1min', on_error=None):
+        self.tickers = list(tickers)
+        self.interval_s = interval_s
+        self.fetch = fetch or (lambda ticker: bot.get_realtime_data(ticker, cache=cache))
+        self.bar_interval = pd.Timedelta(bar_interval)
+        self.on_error = on_error or (lambda ticker, e: logger.warning("%s: poll failed: %s", ticker, e))
+        self.last_seen = {}
+
+    def mark_seen(self, ticker, timestamp):
+        """Only bars after `timestamp` will be emitted for this ticker"""
+        self.last_seen[ticker] = timestamp
+
+    def _completed(self, frame):
+        """Rows whose bar interval is over; the bar still forming stays for a later poll"""
+        index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+        return frame[index + self.bar_interval <= pd.Timestamp.now(tz='UTC')]
+
+    async def bars(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            # Downloads are I/O bound, so they run side by side in the loop's default thread pool
+            frames = await asyncio.gather(*(loop.run_in_executor(None, self.fetch, ticker)
+                                            for ticker in self.tickers), return_exceptions=True)
+            for ticker, frame in zip(self.tickers, frames):
+                if isinstance(frame, Exception):
+                    self.on_error(ticker, frame)
+                    continue
+                frame = self._completed(frame)
+                last = self.last_seen.get(ticker)
+                if last is not None:
+                    frame = frame[frame.index > last]
+                for timestamp, bar in iter_bars(frame):
+                    self.last_seen[ticker] = timestamp
+                    yield ticker, timestamp, bar
+            await asyncio.sleep(max(self.interval_s - (loop.time() - started), 0))
+
+
+class LatencyStats:
+    """Per-bar end-to-end latencies against a budget; percentiles over the last `keep` bars"""
+
+    def __init__(self, budget_s, keep=10000):
+        self.budget_s = budget_s
+        self.count = 0
+        self.over_budget = 0
+        self.recent = deque(maxlen=keep)
+
+    def record(self, seconds):
+        self.count += 1
+        self.over_budget += seconds > self.budget_s
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = np.array(self.recent) if self.recent else np.array([np.nan])
+        return {
+            'bars': self.count,
+            'over_budget': self.over_budget,
+            'p50_ms': np.percentile(recent, 50) * 1000,
+            'p99_ms': np.percentile(recent, 99) * 1000,
+            'max_ms': recent.max() * 1000
+        }
+
+
+class _SymbolState:
+    """Streaming features, regime filter and the recent rows the signal rules need, for one ticker"""
+
+    def __init__(self, model, engine=None):
+        self.engine = engine or FeatureEngine()
+        self.regime_filter = OnlineRegimeFilter(model)
+        self.rows = deque(maxlen=SIGNAL_WINDOW)
+        self.states = deque(maxlen=SIGNAL_WINDOW)
+
+    def push(self, row, regime):
+        self.rows.append(row)
+        self.states.append(-1 if regime is None else regime)
+
+
+class LiveRunner:
+    """
+    Event-driven counterpart of trade(): every bar from `feed` goes through
+    FeatureEngine.update -> OnlineRegimeFilter.update -> the generate_signals
+    rules, for many tickers on one event loop.
+
+    Bars of one ticker are handled in order by that ticker's consumer task;
+    the per-bar work runs in `executor` (a thread pool by default, since the
+    per-ticker state is updated in place) so a slow symbol never blocks the
+    loop or the other tickers. End-to-end latency, from the feed handing
+    over a bar to its signal being decided, is recorded per ticker against
+    latency_budget_s. The regime is the filtered (causal) estimate rather
+    than the Viterbi path predict_hmm returns over the whole history.
+    """
+
+    def __init__(self, model, feed, risk_level='moderate', latency_budget_s=0.25, executor=None,
+                 on_event=None, queue_size=1000):
+        self.models = model if isinstance(model, dict) else None
+        self.model = None if isinstance(model, dict) else model
+        self.feed = feed
+        self.params = bot.RISK_PARAMS[risk_level]
+        self.latency_budget_s = latency_budget_s
+        self.executor = executor
+        self.on_event = on_event
+        self.queue_size = queue_size
+        self.symbols = {}
+        self.latency = {}
+        self._queues = {}
+        self._consumers = {}
+
+    def _state(self, ticker):
+        if ticker not in self.symbols:
+            model = self.models[ticker] if self.models is not None else self.model
+            self.symbols[ticker] = _SymbolState(model)
+            self.latency[ticker] = LatencyStats(self.latency_budget_s)
+        return self.symbols[ticker]
+
+    def warmup(self, ticker, history):
+        """Seed a ticker's features, regime filter and signal window from an OHLCV history frame"""
+        state = self._state(ticker)
+        state.engine = FeatureEngine.from_frame(history)
+        data = bot.add_features(history.copy())
+        features = bot.feature_matrix(data)
+        columns = {name: np.asarray(data[name], dtype=np.float64).reshape(len(data), -1)[:, 0]
+                   for name in SIGNAL_COLUMNS}
+        for i, x in enumerate(features):
+            if np.isfinite(x).all():
+                state.regime_filter.update(x)
+            if i >= len(data) - SIGNAL_WINDOW:
+                state.push({name: values[i] for name, values in columns.items()}, state.regime_filter.state)
+        mark_seen = getattr(self.feed, 'mark_seen', None)
+        if mark_seen is not None and len(history):
+            mark_seen(ticker, history.index[-1])
+
+    def process_bar(self, ticker, bar):
+        """Features -> regime -> signal for one bar; runs in the executor"""
+        state = self._state(ticker)
+        row = state.engine.update(bar)
+        x = np.array([row[name] for name in bot.FEATURE_COLUMNS])
+        # Warm-up rows have no features yet; the regime stays where it was
+        if np.isfinite(x).all():
+            state.regime_filter.update(x)
+        regime = state.regime_filter.state
+        state.push(row, regime)
+
+        window = {name: np.array([r[name] for r in state.rows], dtype=np.float64) for name in SIGNAL_COLUMNS}
+        buy_pos, sell_pos = bot.generate_signal_sets(np.array(state.states), window, [self.params])[0]
+        last = len(state.rows) - 1
+        signal = 'buy' if last in buy_pos else 'sell' if last in sell_pos else None
+        return regime, signal, row['Close']
+
+    async def _consume(self, ticker, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            timestamp, bar, received = item
+            started = time.perf_counter()
+            regime, signal, close = await loop.run_in_executor(self.executor, self.process_bar, ticker, bar)
+            finished = time.perf_counter()
+            latency = finished - received
+            self.latency[ticker].record(latency)
+            event = {
+                'ticker': ticker,
+                'timestamp': timestamp,
+                'close': close,
+                'regime': regime,
+                'signal': signal,
+                'latency_s': latency,
+                'processing_s': finished - started,    # latency_s minus the time spent queued
+                'over_budget': latency > self.latency_budget_s
+            }
+            if self.on_event is not None:
+                result = self.on_event(event)
+                if asyncio.iscoroutine(result):
+                    await result
+
+    async def _put(self, ticker, item):
+        """
+        Queue an item for a ticker's consumer. Raises whatever stopped the
+        consumer instead of waiting forever on a queue nobody drains.
+        """
+        queue, consumer = self._queues[ticker], self._consumers[ticker]
+        if not consumer.done():
+            if not queue.full():
+                queue.put_nowait(item)
+            else:
+                put = asyncio.ensure_future(queue.put(item))
+                await asyncio.wait({put, consumer}, return_when=asyncio.FIRST_COMPLETED)
+                if not put.done():
+                    put.cancel()
+        if consumer.done():
+            consumer.result()
+            if item is not None:
+                raise RuntimeError(f"{ticker}: consumer stopped before the end of the feed")
+
+    async def run(self, max_bars=None):
+        """
+        Consume the feed until it ends (or max_bars bars were received) and
+        return the latency summary per ticker. An exception raised while
+        processing a bar stops the run and is re-raised here.
+        """
+        own_executor = self.executor is None
+        if own_executor:
+            self.executor = ThreadPoolExecutor()
+        n_bars = 0
+        try:
+            async for ticker, timestamp, bar in self.feed.bars():
+                received = time.perf_counter()
+                if ticker not in self._queues:
+                    self._state(ticker)
+                    self._queues[ticker] = asyncio.Queue(maxsize=self.queue_size)
+                    self._consumers[ticker] = asyncio.create_task(self._consume(ticker, self._queues[ticker]))
+                # A full queue means processing can't keep up; waiting here applies back-pressure to the feed
+                await self._put(ticker, (timestamp, bar, received))
+                n_bars += 1
+                if max_bars is not None and n_bars >= max_bars:
+                    break
+            for ticker in self._queues:
+                await self._put(ticker, None)
+            await asyncio.gather(*self._consumers.values())
+        finally:
+            for task in self._consumers.values():
+                task.cancel()
+            if own_executor:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+        return {ticker: stats.summary() for ticker, stats in self.latency.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live HMM trading loop over 1-minute bars')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--model-path', required=True, help='HMM saved by save_hmm / the train subcommand')
+    parser.add_argument('--cache-dir', help='Directory of the local bar cache')
+    parser.add_argument('--interval', type=float, default=60.0, help='Polling interval in seconds')
+    parser.add_argument('--budget-ms', type=float, default=250.0, help='Per-bar latency budget')
+    parser.add_argument('--risk-level', choices=list(bot.RISK_PARAMS), default='moderate')
+    parser.add_argument('--max-bars', type=int, help='Stop after this many bars')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    model, _ = bot.load_hmm(args.model_path)
+    cache = None
+    if args.cache_dir:
+        from bar_cache import BarCache
+        cache = BarCache(args.cache_dir)
+
+    def report(event):
+        if event['signal'] or event['over_budget']:
+            print(f"{event['ticker']} {event['timestamp']}: {event['signal'] or '-'} "
+                  f"(regime {event['regime']}, {event['latency_s'] * 1000:.1f}ms)")
+
+    runner = LiveRunner(model, PollingFeed(args.tickers, args.interval, cache=cache), args.risk_level,
+                        latency_budget_s=args.budget_ms / 1000, on_event=report)
+    summary = asyncio.run(runner.run(max_bars=args.max_bars))
+    print(pd.DataFrame(summary).T.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import hmm_trading_bot2 as bot
+
+
+def _fetch(ticker, start_date, end_date, timeframe, cache, source):
+    start = time.perf_counter()
+    data = bot.get_stock_data(ticker, start_date, end_date, timeframe, cache=cache, source=source)
+    return data, time.perf_counter() - start
+
+
+def _analyze_symbol(ticker, data, n_components, strategy_config):
+    """Worker: features -> HMM -> regimes -> signals -> backtest for one symbol, timing each stage"""
+    timings = {}
+
+    start = time.perf_counter()
+    data = bot.add_features(data)
+    timings['features_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = bot.train_hmm(data, n_components=n_components)
+    timings['fit_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hidden_states = bot.predict_hmm(model, data)
+    timings['predict_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buy_signals, sell_signals = bot.generate_signals(hidden_states, data, risk_level=strategy_config['risk_level'])
+    timings['signals_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    final_balance, profit, trades = bot.backtest(data, buy_signals, sell_signals, strategy_config)
+    timings['backtest_s'] = time.perf_counter() - start
+
+    last_bar = data.index[-1]
+    signal = 'buy' if last_bar in buy_signals else 'sell' if last_bar in sell_signals else None
+    return {
+        'ticker': ticker,
+        'bars': len(data),
+        'last_bar': last_bar,
+        'regime': int(hidden_states[-1]),
+        'signal': signal,
+        'n_buy_signals': len(buy_signals),
+        'n_sell_signals': len(sell_signals),
+        'n_trades': len(trades) // 2,
+        'final_balance': final_balance,
+        'profit': profit,
+        **timings
+    }
+
+
+def scan_universe(tickers, start_date, end_date, timeframe='5m', n_components=6, strategy_config=None,
+                  cache=None, fetch_workers=16, fit_workers=None, max_in_flight=None, source=None):
+    """
+    Run fetch -> add_features -> train_hmm -> predict_hmm -> generate_signals ->
+    backtest for every ticker and yield one result dict per symbol as soon as it
+    completes (in completion order, not input order).
+
+    Downloads run concurrently in a thread pool of fetch_workers (source, as
+    in get_stock_data, must be safe to call from several threads); everything
+    CPU-bound runs in a process pool of fit_workers. At most max_in_flight
+    symbols (default: twice the process pool) are fetched-but-unfinished at any
+    time, so a slow fitting stage throttles downloads instead of piling frames
+    up in memory. A symbol that fails yields a dict with an 'error' entry.
+    """
+    strategy_config = strategy_config or dict(bot.DEFAULT_STRATEGY_CONFIG)
+    fit_workers = fit_workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * fit_workers
+    pending_tickers = list(tickers)[::-1]
+    stage = {}          # future -> (ticker, stage name, fetch seconds, start time)
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=fit_workers) as fit_pool:
+
+        def submit_fetches():
+            while pending_tickers and len(stage) < max_in_flight:
+                ticker = pending_tickers.pop()
+                future = fetch_pool.submit(_fetch, ticker, start_date, end_date, timeframe, cache, source)
+                stage[future] = (ticker, 'fetch', 0.0, time.perf_counter())
+
+        submit_fetches()
+        while stage:
+            done, _ = wait(stage, return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker, name, fetch_s, started = stage.pop(future)
+                try:
+                    if name == 'fetch':
+                        data, fetch_s = future.result()
+                        if data.empty:
+                            raise ValueError("No data received")
+                        analysis = fit_pool.submit(_analyze_symbol, ticker, data, n_components, strategy_config)
+                        stage[analysis] = (ticker, 'analyze', fetch_s, started)
+                        continue
+                    result = future.result()
+                    result['fetch_s'] = fetch_s
+                    result['total_s'] = time.perf_counter() - started
+                    yield result
+                except Exception as e:
+                    yield {'ticker': ticker, 'error': str(e), 'total_s': time.perf_counter() - started}
+            submit_fetches()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan a universe of symbols with the HMM trading bot')
+    parser.add_argument('tickers', nargs='*', help='Symbols to scan')
+    parser.add_argument('--tickers-file', help='File with one symbol per line')
+    parser.add_argument('--days', type=int, default=45, help='History length in days')
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--cache-dir', help='Directory of the local bar cache')
+    parser.add_argument('--n-components', type=int, default=6)
+    parser.add_argument('--fetch-workers', type=int, default=16)
+    parser.add_argument('--fit-workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--output', help='Write all results to this CSV file')
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += [line.strip() for line in f if line.strip()]
+
+    cache = None
+    if args.cache_dir:
+        from bar_cache import BarCache
+        cache = BarCache(args.cache_dir)
+    end_date = pd.Timestamp.now()
+    start_date = end_date - pd.Timedelta(days=args.days)
+
+    results = []
+    for result in scan_universe(tickers, start_date, end_date, args.timeframe, args.n_components, cache=cache,
+                                fetch_workers=args.fetch_workers, fit_workers=args.fit_workers):
+        results.append(result)
+        if 'error' in result:
+            print(f"{result['ticker']}: error {result['error']}")
+        else:
+            print(f"{result['ticker']}: regime {result['regime']}, signal {result['signal']}, "
+                  f"profit ${result['profit']:,.2f} ({result['total_s']:.2f}s)")
+    if args.output:
+        pd.DataFrame(results).to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
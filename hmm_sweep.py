@@ -0,0 +1,215 @@
+import argparse
+import itertools
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import hmm_trading_bot2 as bot
+
+logger = logging.getLogger(__name__)
+
+# Columns copied once into shared memory; workers rebuild a frame from them without pickling
+SHARED_COLUMNS = bot.FEATURE_COLUMNS + ['Close', 'Volume', 'ATR']
+
+# Example search space: strategy_config fields, RISK_PARAMS thresholds and n_components
+DEFAULT_SPACE = {
+    'n_components': [4, 6, 8],
+    'risk_level': ['conservative', 'moderate', 'aggressive'],
+    'rsi_oversold': [30, 35, 40, 45],
+    'rsi_overbought': [55, 60, 65, 70],
+    'max_trades_per_day': [5, 20, 1000]
+}
+
+
+class SharedArrays:
+    """
+    A set of named NumPy arrays placed in shared memory by the parent process.
+    `spec` is small and picklable; workers call attach(spec) to get zero-copy views.
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.spec = {}
+        try:
+            for name, arr in arrays.items():
+                arr = np.ascontiguousarray(arr)
+                block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+                self.spec[name] = (block.name, arr.shape, arr.dtype.str)
+        except BaseException:
+            # Blocks outlive the process unless unlinked
+            self.close()
+            raise
+
+    def close(self):
+        for block in self._blocks:
+            try:
+                block.close()
+            finally:
+                block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def attach(spec):
+        """Returns ({name: array view}, blocks); keep `blocks` alive while using the views"""
+        arrays, blocks = {}, []
+        for name, (block_name, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        return arrays, blocks
+
+
+def shared_market_data(data):
+    """Put the columns the sweep needs from an add_features frame into shared memory"""
+    arrays = {name: np.asarray(data[name], dtype=np.float64).reshape(-1) for name in SHARED_COLUMNS}
+    arrays['day'] = data.index.normalize().as_unit('ns').asi8
+    return SharedArrays(arrays)
+
+
+def grid_search(space):
+    """Every combination of the values in `space` ({field: [values]})"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_search(space, n_samples, random_state=None):
+    """n_samples configurations drawn independently from the values in `space`"""
+    rng = np.random.default_rng(random_state)
+    return [{key: values[rng.integers(len(values))] for key, values in space.items()}
+            for _ in range(n_samples)]
+
+
+def split_config(config):
+    """Split a flat sweep configuration into (n_components, strategy_config, risk params)"""
+    strategy_config = dict(bot.DEFAULT_STRATEGY_CONFIG)
+    strategy_config.update({k: v for k, v in config.items() if k in strategy_config})
+    params = dict(bot.RISK_PARAMS[strategy_config['risk_level']])
+    params.update({k: v for k, v in config.items() if k in params})
+    return config.get('n_components', 6), strategy_config, params
+
+
+def _fit_states(spec, n_components, random_state):
+    """Worker: fit one HMM on the shared features and return its hidden states"""
+    arrays, blocks = SharedArrays.attach(spec)
+    try:
+        start = time.perf_counter()
+        model = bot.train_hmm(arrays, n_components=n_components, random_state=random_state)
+        states = bot.predict_hmm(model, arrays)
+        return n_components, states, time.perf_counter() - start
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def _run_chunk(spec, configs):
+    """Worker: generate signals and backtest a chunk of configurations on shared data"""
+    arrays, blocks = SharedArrays.attach(spec)
+    try:
+        data = pd.DataFrame({name: arrays[name] for name in SHARED_COLUMNS}, copy=False)
+        market = bot.signal_arrays(data)
+        split = [split_config(config) for config in configs]
+
+        # Signals for every configuration sharing a model come from one generate_signal_sets pass
+        signals = [None] * len(configs)
+        for n_components in {n for n, _, _ in split}:
+            members = [i for i, (n, _, _) in enumerate(split) if n == n_components]
+            sets = bot.generate_signal_sets(arrays[f'states_{n_components}'], data,
+                                            [split[i][2] for i in members], arrays=market)
+            for position, i in enumerate(members):
+                signals[i] = sets[position]
+
+        results = []
+        for config, (_, strategy_config, _), (buy_pos, sell_pos) in zip(configs, split, signals):
+            result = bot.backtest_arrays(
+                arrays['Close'], arrays['ATR'], buy_pos, sell_pos,
+                arrays['day'], strategy_config
+            )
+            results.append({
+                **config,
+                'final_balance': result['final_balance'],
+                'profit': result['profit'],
+                'n_trades': len(result['buy_pos']),
+                'n_buy_signals': len(buy_pos),
+                'n_sell_signals': len(sell_pos)
+            })
+        return results
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def run_sweep(data, configs, n_jobs=None, chunksize=64, random_state=0, output_path=None):
+    """
+    Backtest every configuration on one add_features frame.
+
+    One HMM is fitted per distinct n_components (in parallel, with a fixed
+    random_state so results are reproducible); its hidden states and the
+    market data are shared with the workers through shared memory, and the
+    configurations are signalled and backtested in chunks across a process pool.
+    Workers see the data with a positional index, so signals are bar positions.
+    Returns the results ranked by profit, also written as CSV to output_path.
+    """
+    with shared_market_data(data) as shared, ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        components = sorted({split_config(config)[0] for config in configs})
+        fits = pool.map(_fit_states, [shared.spec] * len(components), components,
+                        [random_state] * len(components))
+        states = {}
+        for n_components, hidden_states, seconds in fits:
+            logger.info("Fitted %d-state HMM in %.2fs", n_components, seconds)
+            states[f'states_{n_components}'] = hidden_states
+
+        with SharedArrays(states) as shared_states:
+            spec = {**shared.spec, **shared_states.spec}
+            chunks = [configs[i:i + chunksize] for i in range(0, len(configs), chunksize)]
+            results = [row for rows in pool.map(_run_chunk, [spec] * len(chunks), chunks) for row in rows]
+
+    table = pd.DataFrame(results).sort_values('profit', ascending=False).reset_index(drop=True)
+    if output_path is not None:
+        table.to_csv(output_path, index=False)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parameter sweep for the HMM trading bot')
+    parser.add_argument('--ticker', default='ES=F')
+    parser.add_argument('--days', type=int, default=45, help='History length in days')
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--cache-dir', help='Directory of the local bar cache')
+    parser.add_argument('--samples', type=int, help='Random search with this many samples instead of the full grid')
+    parser.add_argument('--n-jobs', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='sweep_results.csv')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    cache = None
+    if args.cache_dir:
+        from bar_cache import BarCache
+        cache = BarCache(args.cache_dir)
+    end_date = pd.Timestamp.now()
+    start_date = end_date - pd.Timedelta(days=args.days)
+    data = bot.add_features(bot.get_stock_data(args.ticker, start_date, end_date, args.timeframe, cache=cache))
+
+    if args.samples:
+        configs = random_search(DEFAULT_SPACE, args.samples, random_state=args.seed)
+    else:
+        configs = grid_search(DEFAULT_SPACE)
+    print(f"Running {len(configs)} configurations")
+    table = run_sweep(data, configs, n_jobs=args.n_jobs, random_state=args.seed, output_path=args.output)
+    print(table.head(10).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,28 +3,26 @@ import pandas as pd
 from hmmlearn.hmm import GaussianHMM
 import yfinance as yf
 import matplotlib.pyplot as plt
+import indicators
 
 def get_stock_data(ticker, start_date, end_date):
     data = yf.download(ticker, start=start_date, end=end_date)
     return data
 
 def add_features(data):
-    data['Close_pct_change'] = data['Close'].pct_change()
-    data['Volume_pct_change'] = data['Volume'].pct_change()
-    data['Rolling_mean_5'] = data['Close'].rolling(window=5).mean()
-    data['Rolling_mean_10'] = data['Close'].rolling(window=10).mean()
-    data['MACD'] = data['Close'].ewm(span=12, adjust=False).mean() - data['Close'].ewm(span=26, adjust=False).mean()
-    data['RSI'] = calculate_rsi(data['Close'])
+    close = data['Close']
+    data['Close_pct_change'] = indicators.to_pandas(indicators.pct_change(close.values), close)
+    data['Volume_pct_change'] = indicators.to_pandas(indicators.pct_change(data['Volume'].values), data['Volume'])
+    data['Rolling_mean_5'] = indicators.to_pandas(indicators.rolling_mean(close.values, 5), close)
+    data['Rolling_mean_10'] = indicators.to_pandas(indicators.rolling_mean(close.values, 10), close)
+    data['MACD'] = indicators.to_pandas(indicators.macd(close.values, 12, 26), close)
+    data['RSI'] = calculate_rsi(close)
     data.dropna(inplace=True)
     return data
 
 def calculate_rsi(series, period=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    # Zero average loss gives RSI 100 here (see indicators.rsi)
+    return indicators.to_pandas(indicators.rsi(series.values, period), series)
 
 def train_hmm(data):
     features = np.column_stack([data['Close_pct_change'],
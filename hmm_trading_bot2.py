@@ -1,33 +1,57 @@
 import numpy as np
 import pandas as pd
-from hmmlearn.hmm import GaussianHMM
-import yfinance as yf
-import matplotlib.pyplot as plt
 import time
 import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from bar_cache import BarCache, yfinance_source
+import hmm_inference
+import indicators
+import metrics
+import plotting
 
-def get_stock_data(ticker, start_date, end_date, timeframe='5m'):
+logger = logging.getLogger(__name__)
+
+# hmmlearn, yfinance and matplotlib are imported where they are used, so
+# subcommands that don't fit, download or plot start without loading them
+
+def get_stock_data(ticker, start_date, end_date, timeframe='5m', cache=None, source=None):
     """
     Get stock data with configurable timeframe
     timeframe options: '1m', '5m', '15m', '30m', '1h', '1d', '1wk'
+    cache: optional BarCache, only bars missing from it are downloaded
+    source: optional callable used instead of Yahoo Finance (e.g. a replay_feed.ReplayFeed);
+        with a cache, it fills the cache instead of the cache's own source
     """
-    data = yf.download(ticker, start=start_date, end=end_date, interval=timeframe)
+    if cache is not None:
+        return cache.get(ticker, start_date, end_date, timeframe, source=source)
+    if source is None:
+        source = yfinance_source
+    data = source(ticker, start=start_date, end=end_date, interval=timeframe)
     return data
 
-def get_realtime_data(ticker):
-    data = yf.download(ticker, period='1d', interval='1m')
+def get_realtime_data(ticker, cache=None, source=None):
+    if cache is not None:
+        return cache.get_recent(ticker, period='1d', interval='1m', source=source)
+    if source is None:
+        source = yfinance_source
+    data = source(ticker, period='1d', interval='1m')
     return data
 
 def add_features(data):
+    close = data['Close']
     # Handle potential division by zero and inf values
-    data['Close_pct_change'] = data['Close'].pct_change().replace([np.inf, -np.inf], np.nan)
-    data['Volume_pct_change'] = data['Volume'].pct_change().replace([np.inf, -np.inf], np.nan)
-    data['Rolling_mean_5'] = data['Close'].rolling(window=5).mean()
-    data['Rolling_mean_10'] = data['Close'].rolling(window=10).mean()
-    data['MACD'] = data['Close'].ewm(span=12, adjust=False).mean() - data['Close'].ewm(span=26, adjust=False).mean()
-    data['RSI'] = calculate_rsi(data['Close'])
-    data['Bollinger_Upper'], data['Bollinger_Lower'] = calculate_bollinger_bands(data['Close'])
-    data['ATR'] = calculate_atr(data)
+    data['Close_pct_change'] = _finite(indicators.to_pandas(indicators.pct_change(close.values), close))
+    data['Volume_pct_change'] = _finite(indicators.to_pandas(indicators.pct_change(data['Volume'].values), data['Volume']))
+    data['Rolling_mean_5'] = indicators.to_pandas(indicators.rolling_mean(close.values, 5), close)
+    data['Rolling_mean_10'] = indicators.to_pandas(indicators.rolling_mean(close.values, 10), close)
+    data['MACD'] = indicators.to_pandas(indicators.macd(close.values, 12, 26), close)
+    data['RSI'] = calculate_rsi(close)
+    data['Bollinger_Upper'], data['Bollinger_Lower'] = calculate_bollinger_bands(close)
     
     # Replace deprecated fillna method with ffill() and bfill()
     data = data.ffill().bfill()
@@ -35,48 +59,28 @@ def add_features(data):
     # Remove any remaining NaN or inf values
     data = data.replace([np.inf, -np.inf], np.nan).dropna()
     
+    # ATR is computed once, on the cleaned data (see feature_engine.FeatureEngine for per-bar updates)
     data['ATR'] = calculate_atr(data)
     return data
 
+def _finite(values):
+    return values.replace([np.inf, -np.inf], np.nan)
+
 def calculate_rsi(series, period=14): # RSI = Relative Strength Index
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    
-    # Avoid division by zero
-    loss = loss.replace(0, np.nan)
-    rs = gain / loss
-    rs = rs.replace([np.inf, -np.inf], np.nan).fillna(0)
-    
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    # Zero average loss counts as RS = 0 here (see indicators.rsi)
+    return indicators.to_pandas(indicators.rsi(series.values, period, fill_undefined=True), series)
 
 def calculate_bollinger_bands(series, window=20, num_std_dev=2.0):  # increased from 1.5
-    rolling_mean = series.rolling(window).mean()
-    rolling_std = series.rolling(window).std()
-    upper_band = rolling_mean + (rolling_std * num_std_dev)
-    lower_band = rolling_mean - (rolling_std * num_std_dev)
-    return upper_band, lower_band
+    upper_band, lower_band = indicators.bollinger_bands(series.values, window, num_std_dev)
+    return indicators.to_pandas(upper_band, series), indicators.to_pandas(lower_band, series)
 
 def calculate_atr(data, period=14):
     high = data['High'].values.squeeze()
     low = data['Low'].values.squeeze()
     close = data['Close'].values.squeeze()
     
-    # Calculate True Range
-    tr1 = high - low
-    tr2 = np.abs(high - np.roll(close, 1))
-    tr3 = np.abs(low - np.roll(close, 1))
-    
-    # Calculate maximum of the three true ranges
-    true_range = np.maximum.reduce([tr1, tr2, tr3])
-    
     # Convert to Series with the original index
-    true_range = pd.Series(true_range, index=data.index)
-    
-    # Calculate ATR
-    atr = true_range.rolling(window=period).mean()
-    return atr
+    return pd.Series(indicators.atr(high, low, close, period), index=data.index)
 
 def calculate_stop_loss(entry_price, atr, multiplier=2):
     """
@@ -88,18 +92,80 @@ def calculate_stop_loss(entry_price, atr, multiplier=2):
     stop_loss = entry_price - stop_distance  # For long positions
     return stop_loss
 
-def train_hmm(data, n_components=6):
+# Feature columns the HMM is trained on, in order
+FEATURE_COLUMNS = [
+    'Close_pct_change',
+    'Volume_pct_change',
+    'Rolling_mean_5',
+    'Rolling_mean_10',
+    'MACD',
+    'RSI',
+    'Bollinger_Upper',
+    'Bollinger_Lower'
+]
+
+def feature_matrix(data):
+    """Stack FEATURE_COLUMNS of a frame (or dict of feature values) into a 2-D array"""
+    return np.column_stack([np.asarray(data[name], dtype=np.float64).reshape(-1) for name in FEATURE_COLUMNS])
+
+# When train_or_update_hmm does a full refit instead of warm-starting the saved model
+REFIT_POLICY = {
+    'warm_n_iter': 10,          # EM iterations for a warm start
+    'max_new_fraction': 0.2,    # Full refit once more than 20% of the rows are new
+    'max_warm_fits': 50,        # Full refit after this many warm starts in a row
+    'fingerprint_rows': 50      # Trailing training rows that must be unchanged in the new data
+}
+
+def _gaussian_hmm(**params):
+    from hmmlearn.hmm import GaussianHMM
+    return GaussianHMM(**params)
+
+def _fit_restart(features, n_components, n_iter, tol, seed):
+    """Fit one randomly initialised model (runs in a worker process for multi-restart training)"""
+    start = time.perf_counter()
+    model = _gaussian_hmm(
+        n_components=n_components,
+        covariance_type="diag",
+        n_iter=n_iter,
+        tol=tol,
+        random_state=seed
+    )
+    model.fit(features)
+    report = {
+        'seed': seed,
+        'log_likelihood': model.score(features),
+        'iterations': model.monitor_.iter,
+        'converged': _converged(model),
+        'seconds': time.perf_counter() - start
+    }
+    return model, report
+
+def _converged(model):
+    """Whether EM stopped on tol: hmmlearn's monitor also reports converged when it ran out of iterations"""
+    monitor = model.monitor_
+    return bool(monitor.iter < monitor.n_iter and monitor.converged)
+
+def _record_fit(model):
+    """EM iteration count and final log-likelihood of a fit, as metrics gauges"""
+    monitor = model.monitor_
+    metrics.set_gauge('hmm_em_iterations', monitor.iter)
+    metrics.set_gauge('hmm_converged', int(_converged(model)))
+    if monitor.history:
+        metrics.set_gauge('hmm_log_likelihood', monitor.history[-1])
+
+def train_hmm(data, n_components=6, warm_start=None, n_iter=2000, tol=0.001,
+              n_restarts=1, n_jobs=None, random_state=None):
+    """
+    warm_start: a fitted GaussianHMM whose parameters seed EM instead of a random init
+    n_iter: EM iterations (a warm start typically needs only a few)
+    n_restarts: independent random initialisations, fitted concurrently in a
+        process pool of n_jobs workers; the highest log-likelihood model is kept
+        and the per-restart reports are attached as model.restart_report_
+    random_state: base seed, each restart gets its own seed derived from it
+        (restarts use base seed 0 when it is None, so they are reproducible)
+    """
     # Ensure all features are finite
-    features = np.column_stack([
-        data['Close_pct_change'].values,
-        data['Volume_pct_change'].values,
-        data['Rolling_mean_5'].values,
-        data['Rolling_mean_10'].values,
-        data['MACD'].values,
-        data['RSI'].values,
-        data['Bollinger_Upper'].values,
-        data['Bollinger_Lower'].values
-    ])
+    features = feature_matrix(data)
     
     # Remove any rows with non-finite values
     features = features[np.isfinite(features).all(axis=1)]
@@ -107,115 +173,291 @@ def train_hmm(data, n_components=6):
     if len(features) == 0:
         raise ValueError("No valid data points after cleaning")
     
-    model = GaussianHMM(
-        n_components=n_components, 
-        covariance_type="diag", 
-        n_iter=2000,
-        tol=0.001
-    )
+    if warm_start is not None:
+        model = _gaussian_hmm(
+            n_components=warm_start.n_components,
+            covariance_type=warm_start.covariance_type,
+            n_iter=n_iter,
+            tol=tol,
+            init_params=''
+        )
+        model.startprob_ = warm_start.startprob_
+        model.transmat_ = warm_start.transmat_
+        model.means_ = warm_start.means_
+        model.covars_ = _covars_param(warm_start)
+    elif n_restarts > 1:
+        base = np.random.SeedSequence(0 if random_state is None else random_state)
+        seeds = [int(child.generate_state(1)[0]) for child in base.spawn(n_restarts)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_fit_restart, [features] * n_restarts, [n_components] * n_restarts,
+                                    [n_iter] * n_restarts, [tol] * n_restarts, seeds))
+        for i, (_, report) in enumerate(results):
+            logger.info("Restart %d: log-likelihood %.2f, %d iterations, converged=%s, %.2fs", i,
+                        report['log_likelihood'], report['iterations'], report['converged'], report['seconds'])
+        model = max(results, key=lambda result: result[1]['log_likelihood'])[0]
+        model.restart_report_ = [report for _, report in results]
+        _record_fit(model)
+        return model
+    else:
+        model = _gaussian_hmm(
+            n_components=n_components, 
+            covariance_type="diag", 
+            n_iter=n_iter,
+            tol=tol,
+            random_state=random_state
+        )
     model.fit(features)
+    _record_fit(model)
+    return model
+
+def _covars_param(model):
+    """covars_ in the shape the setter expects for the model's covariance_type"""
+    covars = model.covars_
+    if model.covariance_type == 'diag':
+        return np.diagonal(covars, axis1=1, axis2=2).copy()
+    if model.covariance_type == 'spherical':
+        return covars[:, 0, 0].copy()
+    if model.covariance_type == 'tied':
+        return covars[0].copy()
+    return covars
+
+def data_fingerprint(data):
+    """Content hash of the raw bars of a frame (features like MACD depend on where the window starts)"""
+    bars = np.column_stack([np.asarray(data[name], dtype=np.float64).reshape(len(data), -1)[:, 0]
+                            for name in ['High', 'Low', 'Close', 'Volume']])
+    return hashlib.sha1(np.ascontiguousarray(bars).tobytes()).hexdigest()
+
+def model_file(path):
+    """The file a model path refers to: np.savez always writes a .npz name"""
+    path = os.fspath(path)
+    return path if path.endswith('.npz') else path + '.npz'
+
+def save_hmm(model, path, data, info=None):
+    """
+    Save a fitted model together with the feature schema and a fingerprint of
+    the data it was trained on, so a later run can tell whether it only has
+    new bars appended (warm start) or needs a full refit.
+    """
+    n_tail = REFIT_POLICY['fingerprint_rows']
+    meta = {
+        'feature_columns': FEATURE_COLUMNS,
+        'n_components': int(model.n_components),
+        'covariance_type': model.covariance_type,
+        'n_rows': len(data),
+        'last_timestamp': str(data.index[-1]),
+        'tail_fingerprint': data_fingerprint(data.iloc[-n_tail:]),
+        'warm_fits': 0,
+        'trained_at': time.time()
+    }
+    meta.update(info or {})
+    np.savez(
+        model_file(path),
+        startprob=model.startprob_,
+        transmat=model.transmat_,
+        means=model.means_,
+        covars=_covars_param(model),
+        meta=json.dumps(meta)
+    )
+
+def load_hmm(path):
+    """Load a model saved by save_hmm, returns (model, meta)"""
+    with np.load(model_file(path), allow_pickle=False) as saved:
+        meta = json.loads(str(saved['meta']))
+        model = _gaussian_hmm(
+            n_components=meta['n_components'],
+            covariance_type=meta['covariance_type'],
+            init_params=''
+        )
+        model.n_features = saved['means'].shape[1]
+        model.startprob_ = saved['startprob']
+        model.transmat_ = saved['transmat']
+        model.means_ = saved['means']
+        model.covars_ = saved['covars']
+    return model, meta
+
+def new_rows_since(meta, data):
+    """
+    Number of rows in `data` after the saved model's last training bar, or None
+    when the saved model's history is not a prefix-compatible match (missing
+    timestamp, revised bars, different schema) and a full refit is required.
+    """
+    if meta['feature_columns'] != FEATURE_COLUMNS:
+        return None
+    matches = np.flatnonzero(data.index.astype(str) == meta['last_timestamp'])
+    if len(matches) == 0:
+        return None
+    last = matches[-1]
+    n_tail = REFIT_POLICY['fingerprint_rows']
+    if last + 1 < min(n_tail, meta['n_rows']):
+        return None
+    tail = data.iloc[max(last + 1 - n_tail, 0):last + 1]
+    if data_fingerprint(tail) != meta['tail_fingerprint']:
+        return None
+    return len(data) - last - 1
+
+def train_or_update_hmm(data, path, n_components=6, policy=None):
+    """
+    Train with persistence: warm-start the model saved at `path` when only a
+    few bars were appended since it was fitted, otherwise do a full refit.
+    The resulting model is saved back to `path`.
+    """
+    policy = {**REFIT_POLICY, **(policy or {})}
+    previous, meta = load_hmm(path) if os.path.exists(model_file(path)) else (None, None)
+
+    new_rows = None
+    if previous is not None and meta['n_components'] == n_components:
+        new_rows = new_rows_since(meta, data)
+
+    full_refit = (
+        new_rows is None or
+        new_rows > policy['max_new_fraction'] * meta['n_rows'] or
+        meta['warm_fits'] >= policy['max_warm_fits']
+    )
+    if full_refit:
+        model = train_hmm(data, n_components=n_components)
+        save_hmm(model, path, data)
+    elif new_rows == 0:
+        model = previous
+    else:
+        model = train_hmm(data, warm_start=previous, n_iter=policy['warm_n_iter'])
+        save_hmm(model, path, data, info={'warm_fits': meta['warm_fits'] + 1})
     return model
 
 def predict_hmm(model, data):
-    features = np.column_stack([data['Close_pct_change'],
-                                data['Volume_pct_change'],
-                                data['Rolling_mean_5'],
-                                data['Rolling_mean_10'],
-                                data['MACD'],
-                                data['RSI'],
-                                data['Bollinger_Upper'],
-                                data['Bollinger_Lower']])
+    features = feature_matrix(data)
     
     hidden_states = model.predict(features)
     
     return hidden_states
 
-def generate_signals(hidden_states, data, risk_level='moderate'):
-    signals = pd.Series(hidden_states, index=data.index).diff().fillna(0)
-    common_idx = signals.index.intersection(data.index)
-    signals = signals.loc[common_idx]
-    data = data.loc[common_idx]
-    
-    close_series = data["Close"].squeeze()
-    boll_lower = data["Bollinger_Lower"].squeeze()
-    boll_upper = data["Bollinger_Upper"].squeeze()
-    
-    # Add trend confirmation
-    macd = data["MACD"].squeeze()
-    rsi = data["RSI"].squeeze()
-    
-    # Modified risk parameters for balanced signals
-    risk_params = {
-        'conservative': {
-            'bollinger_margin': 1.002,  # 0.2% margin
-            'rsi_oversold': 35,         # Less extreme oversold
-            'rsi_overbought': 65,       # Less extreme overbought
-            'macd_threshold': 0.3,      # Reduced threshold
-            'volume_threshold': 1.05     # 5% above average volume
-        },
-        'moderate': {
-            'bollinger_margin': 1.003,  # 0.3% margin
-            'rsi_oversold': 40,         # Moderate oversold
-            'rsi_overbought': 60,       # Moderate overbought
-            'macd_threshold': 0.2,      # Lower threshold
-            'volume_threshold': 1.03     # 3% above average volume
-        },
-        'aggressive': {
-            'bollinger_margin': 1.005,  # 0.5% margin
-            'rsi_oversold': 45,         # Light oversold
-            'rsi_overbought': 55,       # Light overbought
-            'macd_threshold': 0.1,      # Minimal threshold
-            'volume_threshold': 1.01     # 1% above average volume
-        }
+def predict_hmm_batch(model, datasets, algorithm='viterbi'):
+    """
+    predict_hmm for many symbols scored with the same model in one vectorized call
+    datasets: {ticker: frame with the feature columns}, any lengths
+    Returns {ticker: hidden states}
+    """
+    X, lengths = hmm_inference.stack_sequences([feature_matrix(data) for data in datasets.values()])
+    states = hmm_inference.predict_batch(model, X, lengths, algorithm)
+    return {ticker: states[i, :n] for i, (ticker, n) in enumerate(zip(datasets, lengths))}
+
+def predict_hmm_online(regime_filter, new_data):
+    """
+    regime_filter: OnlineRegimeFilter wrapping the fitted model, carried between calls
+    new_data: only the rows that arrived since the last call
+    Returns the most likely current regime for each new row and their posteriors
+    """
+    posteriors = regime_filter.update_many(feature_matrix(new_data))
+    return posteriors.argmax(axis=1), posteriors
+
+# Modified risk parameters for balanced signals
+RISK_PARAMS = {
+    'conservative': {
+        'bollinger_margin': 1.002,  # 0.2% margin
+        'rsi_oversold': 35,         # Less extreme oversold
+        'rsi_overbought': 65,       # Less extreme overbought
+        'macd_threshold': 0.3,      # Reduced threshold
+        'volume_threshold': 1.05     # 5% above average volume
+    },
+    'moderate': {
+        'bollinger_margin': 1.003,  # 0.3% margin
+        'rsi_oversold': 40,         # Moderate oversold
+        'rsi_overbought': 60,       # Moderate overbought
+        'macd_threshold': 0.2,      # Lower threshold
+        'volume_threshold': 1.03     # 3% above average volume
+    },
+    'aggressive': {
+        'bollinger_margin': 1.005,  # 0.5% margin
+        'rsi_oversold': 45,         # Light oversold
+        'rsi_overbought': 55,       # Light overbought
+        'macd_threshold': 0.1,      # Minimal threshold
+        'volume_threshold': 1.01     # 1% above average volume
     }
-    
-    params = risk_params[risk_level]
-    
-    # Add volume confirmation
-    volume = data["Volume"].squeeze()
-    volume_ma = volume.rolling(window=20).mean()
-    volume_condition = volume > (volume_ma * params['volume_threshold'])
-    
-    # More balanced conditions for buy/sell signals
-    condition_buy = (
-        (close_series < boll_lower * (1 + params['bollinger_margin'])) &
-        (macd < 0) &  # MACD below zero line
-        (rsi < params['rsi_oversold']) &
-        volume_condition
-    )
-    
-    condition_sell = (
-        (close_series > boll_upper * (1 - params['bollinger_margin'])) &
-        (macd > 0) &  # MACD above zero line
-        (rsi > params['rsi_overbought']) &
-        volume_condition
-    )
-    
-    # Add ATR-based filters
-    atr = data['ATR'].squeeze()
-    avg_atr = atr.rolling(window=20).mean()
-    
-    # Only trade when volatility is favorable
-    volatility_condition = (
-        (atr > avg_atr * 0.8) &  # Enough volatility to trade
-        (atr < avg_atr * 2.0)    # Not too volatile
-    )
-    
-    condition_buy = (
-        condition_buy &
-        volatility_condition
+}
+
+# Per-profile thresholds, stacked by generate_signal_sets into one array per field
+SIGNAL_THRESHOLDS = ['bollinger_margin', 'rsi_oversold', 'rsi_overbought', 'volume_threshold']
+
+def signal_arrays(data):
+    """
+    The market-side inputs of the signal rules as NumPy arrays, computed once
+    per frame and shared by every threshold set (see generate_signal_sets)
+    """
+    def column(name):
+        return np.asarray(data[name], dtype=np.float64).reshape(-1)
+
+    volume = column('Volume')
+    atr = column('ATR')
+    avg_atr = indicators.rolling_mean(atr, 20)
+    return {
+        'close': column('Close'),
+        'boll_lower': column('Bollinger_Lower'),
+        'boll_upper': column('Bollinger_Upper'),
+        'macd': column('MACD'),
+        'rsi': column('RSI'),
+        'volume': volume,
+        'volume_ma': indicators.rolling_mean(volume, 20),
+        # Only trade when volatility is favorable: enough to trade, not too volatile
+        'volatility_ok': (atr > avg_atr * 0.8) & (atr < avg_atr * 2.0)
+    }
+
+def generate_signal_sets(hidden_states, data, param_sets=None, arrays=None):
+    """
+    Buy and sell signals for several threshold sets in one pass.
+
+    param_sets: {name: params} with the keys of a RISK_PARAMS profile
+        (default: all RISK_PARAMS profiles), or a list of such dicts
+    arrays: signal_arrays(data), when the caller already has them
+    Returns {name (or list position): (buy positions, sell positions)} as
+    row positions into data.
+
+    Only bars where the regime changes, volatility is favorable and MACD has
+    the right sign can signal under any thresholds, so the threshold rules
+    are evaluated on those candidate bars only, for all sets at once.
+    """
+    if param_sets is None:
+        param_sets = RISK_PARAMS
+    names = list(param_sets) if isinstance(param_sets, dict) else list(range(len(param_sets)))
+    sets = [param_sets[name] for name in names]
+    if arrays is None:
+        arrays = signal_arrays(data)
+
+    states = np.asarray(hidden_states).reshape(-1)
+    changed = np.zeros(len(states), dtype=bool)
+    changed[1:] = states[1:] != states[:-1]
+    base = changed & arrays['volatility_ok']
+    buy_candidates = np.flatnonzero(base & (arrays['macd'] < 0))    # MACD below zero line
+    sell_candidates = np.flatnonzero(base & (arrays['macd'] > 0))   # MACD above zero line
+
+    # (n_sets, 1) threshold columns broadcast against the candidate bars
+    thresholds = {key: np.array([params[key] for params in sets], dtype=np.float64)[:, None]
+                  for key in SIGNAL_THRESHOLDS}
+
+    def volume_ok(rows):
+        return arrays['volume'][rows] > arrays['volume_ma'][rows] * thresholds['volume_threshold']
+
+    buy = (
+        (arrays['close'][buy_candidates] < arrays['boll_lower'][buy_candidates] * (1 + thresholds['bollinger_margin'])) &
+        (arrays['rsi'][buy_candidates] < thresholds['rsi_oversold']) &
+        volume_ok(buy_candidates)
     )
-    
-    condition_sell = (
-        condition_sell &
-        volatility_condition
+    sell = (
+        (arrays['close'][sell_candidates] > arrays['boll_upper'][sell_candidates] * (1 - thresholds['bollinger_margin'])) &
+        (arrays['rsi'][sell_candidates] > thresholds['rsi_overbought']) &
+        volume_ok(sell_candidates)
     )
-    
-    # Equal thresholds for buy and sell signals
-    buy_signals = signals[(signals != 0) & (condition_buy)].index
-    sell_signals = signals[(signals != 0) & (condition_sell)].index
+    return {name: (buy_candidates[buy[i]], sell_candidates[sell[i]]) for i, name in enumerate(names)}
 
-    return buy_signals, sell_signals
+def generate_signals(hidden_states, data, risk_level='moderate', params=None):
+    """
+    risk_level: one of the RISK_PARAMS profiles
+    params: explicit threshold dict (same keys as a RISK_PARAMS profile), overrides risk_level
+    Returns the index labels of the buy and sell bars (see generate_signal_sets
+    to compare several threshold sets at once)
+    """
+    if params is None:
+        params = RISK_PARAMS[risk_level]
+    buy_pos, sell_pos = generate_signal_sets(hidden_states, data, [params])[0]
+    return data.index[buy_pos], data.index[sell_pos]
 
 def calculate_position_size(balance, atr, risk_per_trade=0.02):
     """
@@ -227,120 +469,157 @@ def calculate_position_size(balance, atr, risk_per_trade=0.02):
     position_size = risk_amount / atr
     return position_size
 
-def backtest(data, buy_signals, sell_signals, strategy_config):
-    initial_balance = 1000.0
-    balance = initial_balance
-    position = 0.0
-    trades = []
-    daily_trades = 0
-    last_trade_date = None
+def backtest_arrays(close, atr, buy_pos, sell_pos, day, strategy_config, initial_balance=1000.0):
+    """
+    Array version of backtest: same trade pairing, daily trade cap and max-loss
+    stop, computed with vectorized operations instead of a per-trade loop.
 
-    for buy_ts, sell_ts in zip(buy_signals, sell_signals):
-        # Get prices first
-        buy_pos = data.index.get_loc(buy_ts)
-        sell_pos = data.index.get_loc(sell_ts)
-        
-        if buy_pos >= len(data) or sell_pos >= len(data):
-            break
+    close, atr: float arrays, one value per bar
+    buy_pos, sell_pos: integer bar positions of the buy and sell signals (buys ascending)
+    day: integer day id per bar, used for the per-day trade cap
 
-        buy_price = float(data['Close'].iloc[buy_pos].iloc[0])
-        sell_price = float(data['Close'].iloc[sell_pos].iloc[0])
+    Returns a dict with the final balance, profit and, for the executed trades,
+    their bar positions, prices, position sizes, stop/take-profit levels and
+    the equity after each trade.
+    """
+    n = min(len(buy_pos), len(sell_pos))
+    buy_pos = np.asarray(buy_pos[:n], dtype=np.int64)
+    sell_pos = np.asarray(sell_pos[:n], dtype=np.int64)
+    buy_price = close[buy_pos]
+    sell_price = close[sell_pos]
+    valid = ~np.isnan(buy_price) & ~np.isnan(sell_price)
 
-        # Check daily trade limit
-        if last_trade_date != buy_ts.date():
-            daily_trades = 0
-        if daily_trades >= strategy_config['max_trades_per_day']:
-            continue
-            
-        # Calculate position size based on risk
-        position_size = calculate_position_size(
-            balance=balance,
-            atr=data['ATR'].iloc[buy_pos],
-            risk_per_trade=strategy_config['stop_loss_pct']
-        )
-        stop_loss = buy_price * (1 - strategy_config['stop_loss_pct'])
-        take_profit = buy_price * (1 + strategy_config['take_profit_pct'])
-        
-        # Check maximum portfolio loss
-        if balance < initial_balance * (1 - strategy_config['max_loss_pct']):
-            break
-
-        if not np.isnan(buy_price) and not np.isnan(sell_price):
-            position = balance / buy_price
-            balance = 0
-            trades.append((data.index[buy_pos], 'Buy', buy_price))
-
-            balance = position * sell_price
-            position = 0
-            trades.append((data.index[sell_pos], 'Sell', sell_price))
-            
-            # Update trade tracking
-            last_trade_date = buy_ts.date()
-            daily_trades += 1
+    # Per-day cap: within each run of same-day buys, only the first max_trades_per_day valid trades execute
+    buy_day = day[buy_pos]
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = buy_day[1:] != buy_day[:-1]
+    run_id = np.cumsum(new_run) - 1
+    valid_before = np.cumsum(valid) - valid
+    rank = valid_before - valid_before[new_run][run_id]
+    under_cap = rank < strategy_config['max_trades_per_day']
+    executed = valid & under_cap
 
-    if not data.empty:
-        final_balance = float(balance + position * float(data['Close'].iloc[-1].iloc[0]))
-    else:
-        final_balance = float(balance)
+    # Balance before each trade, then stop everything from the first capped-in trade under the loss limit
+    ratio = np.where(executed, sell_price / np.where(valid, buy_price, 1.0), 1.0)
+    balance_after = initial_balance * np.cumprod(ratio)
+    balance_before = np.concatenate([[initial_balance], balance_after[:-1]])
+    stopped = under_cap & (balance_before < initial_balance * (1 - strategy_config['max_loss_pct']))
+    if stopped.any():
+        executed[np.argmax(stopped):] = False
+        balance_after = initial_balance * np.cumprod(np.where(executed, ratio, 1.0))
 
-    profit = final_balance - initial_balance
-    return final_balance, profit, trades
+    final_balance = float(balance_after[executed][-1]) if executed.any() else float(initial_balance)
+    entry = buy_price[executed]
+    return {
+        'final_balance': final_balance,
+        'profit': final_balance - initial_balance,
+        'buy_pos': buy_pos[executed],
+        'sell_pos': sell_pos[executed],
+        'buy_price': entry,
+        'sell_price': sell_price[executed],
+        'position_size': calculate_position_size(balance_before[executed], atr[buy_pos[executed]],
+                                                 risk_per_trade=strategy_config['stop_loss_pct']),
+        'stop_loss': entry * (1 - strategy_config['stop_loss_pct']),
+        'take_profit': entry * (1 + strategy_config['take_profit_pct']),
+        'equity': balance_after[executed]
+    }
 
-def plot_signals(data, buy_signals, sell_signals, label):
-    plt.plot(data['Close'], label=f'Close Price {label}')
+def backtest(data, buy_signals, sell_signals, strategy_config):
+    initial_balance = 1000.0
+    close = np.asarray(data['Close'], dtype=np.float64).reshape(-1)
+    atr = np.asarray(data['ATR'], dtype=np.float64).reshape(-1)
+    day = data.index.normalize().as_unit('ns').asi8
+
+    n = min(len(buy_signals), len(sell_signals))
+    buy_pos = data.index.get_indexer(buy_signals[:n])
+    sell_pos = data.index.get_indexer(sell_signals[:n])
+    for signals, pos in ((buy_signals, buy_pos), (sell_signals, sell_pos)):
+        if (pos < 0).any():
+            # get_indexer marks unknown timestamps with -1, which would trade the last bar
+            raise KeyError(signals[np.argmax(pos < 0)])
+    result = backtest_arrays(close, atr, buy_pos, sell_pos, day, strategy_config, initial_balance)
+
+    trades = []
+    for buy_pos, sell_pos, buy_price, sell_price in zip(result['buy_pos'], result['sell_pos'],
+                                                        result['buy_price'], result['sell_price']):
+        trades.append((data.index[buy_pos], 'Buy', float(buy_price)))
+        trades.append((data.index[sell_pos], 'Sell', float(sell_price)))
+
+    return result['final_balance'], result['profit'], trades
+
+def plot_signals(data, buy_signals, sell_signals, label, max_points=None):
+    """max_points: downsample the price line to this many points ('auto': the axes' pixel width)"""
+    import matplotlib.pyplot as plt
+    plotting.plot_line(plt.gca(), data.index, data['Close'], max_points, label=f'Close Price {label}')
     plt.scatter(data.loc[buy_signals].index, data.loc[buy_signals]['Close'], marker='^', color='g', label=f'Buy Signal {label}', alpha=1)
     plt.scatter(data.loc[sell_signals].index, data.loc[sell_signals]['Close'], marker='v', color='r', label=f'Sell Signal {label}', alpha=1)
 
-def plot_bollinger_debug(data):
+def plot_bollinger_debug(data, max_points=None):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10,5))
-    plt.plot(data.index, data['Close'], label='Close Price', color='black')
-    plt.plot(data.index, data['Bollinger_Lower'], label='Bollinger Lower', color='blue')
-    plt.plot(data.index, data['Bollinger_Upper'], label='Bollinger Upper', color='red')
+    ax = plt.gca()
+    plotting.plot_line(ax, data.index, data['Close'], max_points, label='Close Price', color='black')
+    plotting.plot_line(ax, data.index, data['Bollinger_Lower'], max_points, label='Bollinger Lower', color='blue')
+    plotting.plot_line(ax, data.index, data['Bollinger_Upper'], max_points, label='Bollinger Upper', color='red')
     plt.title('Close Price and Bollinger Bands')
     plt.xlabel('Date')
     plt.ylabel('Price')
     plt.legend()
     plt.show()
 
-def trade(strategy_config=None):
+DEFAULT_STRATEGY_CONFIG = {
+    'timeframe': '5m',          # Trading interval
+    'risk_level': 'moderate',   # Changed to moderate
+    'position_size': 1.0,       # Full position size
+    'stop_loss_pct': 0.02,      # 2% stop loss
+    'max_trades_per_day': 1000,    # Increased daily trades
+    'take_profit_pct': 0.03,    # 3% profit target
+    'max_loss_pct': 0.05        # 5% maximum loss
+}
+
+def trade(strategy_config=None, cache=None, model_path=None, ticker='ES=F', days=45):
     initial_balance = 1000.0
     if strategy_config is None:
-        strategy_config = {
-            'timeframe': '5m',          # Trading interval
-            'risk_level': 'moderate',   # Changed to moderate
-            'position_size': 1.0,       # Full position size
-            'stop_loss_pct': 0.02,      # 2% stop loss
-            'max_trades_per_day': 1000,    # Increased daily trades
-            'take_profit_pct': 0.03,    # 3% profit target
-            'max_loss_pct': 0.05        # 5% maximum loss
-        }
-    
-    ticker = 'ES=F'
+        strategy_config = dict(DEFAULT_STRATEGY_CONFIG)
     
     # Calculate dates within the 60-day limit for 5m data
     end_date = pd.Timestamp.now()
-    start_date = end_date - pd.Timedelta(days=45)  # Use 45 days to be safe
+    start_date = end_date - pd.Timedelta(days=days)  # Use 45 days to be safe
     
     try:
         # Get data with specified timeframe
-        data = get_stock_data(ticker, start_date, end_date, strategy_config['timeframe'])
+        with metrics.timer('fetch'):
+            data = get_stock_data(ticker, start_date, end_date, strategy_config['timeframe'], cache=cache)
         if data.empty:
             raise ValueError("No data received from Yahoo Finance")
+        metrics.inc('bars_total', len(data), ticker=ticker)
             
-        data = add_features(data)
-        model = train_hmm(data)
-        hidden_states = predict_hmm(model, data)
+        with metrics.timer('features'):
+            data = add_features(data)
+        with metrics.timer('fit'):
+            if model_path is not None:
+                model = train_or_update_hmm(data, model_path)
+            else:
+                model = train_hmm(data)
+        with metrics.timer('predict'):
+            hidden_states = predict_hmm(model, data)
 
         # Generate buy and sell signals
-        buy_signals, sell_signals = generate_signals(hidden_states, data, 
-                                                   risk_level=strategy_config['risk_level'])
+        with metrics.timer('signals'):
+            buy_signals, sell_signals = generate_signals(hidden_states, data, 
+                                                       risk_level=strategy_config['risk_level'])
+        metrics.inc('signals_total', len(buy_signals), ticker=ticker, side='buy')
+        metrics.inc('signals_total', len(sell_signals), ticker=ticker, side='sell')
         
         # Print diagnostics
         print(f"Data range: {data.index[0].strftime('%Y-%m-%d %H:%M')} to {data.index[-1].strftime('%Y-%m-%d %H:%M')}")
         print("Number of buy signals:", len(buy_signals))
         print("Number of sell signals:", len(sell_signals))
         
-        final_balance, profit, trades = backtest(data, buy_signals, sell_signals, strategy_config)
+        with metrics.timer('backtest'):
+            final_balance, profit, trades = backtest(data, buy_signals, sell_signals, strategy_config)
+        metrics.inc('trades_total', len(trades) // 2, ticker=ticker)
+        metrics.set_gauge('backtest_profit', profit, ticker=ticker)
         
         '''
         # Print trade history
@@ -366,31 +645,77 @@ def trade(strategy_config=None):
         print(f"Error fetching data: {str(e)}")
         raise
 
-def main():
-    parser = argparse.ArgumentParser(description='HMM Trading Bot')
-    args = parser.parse_args()
+def _fetch_data(args):
+    cache = BarCache(args.cache_dir, offline=args.offline) if args.cache_dir else None
+    end_date = pd.Timestamp.now()
+    start_date = end_date - pd.Timedelta(days=args.days)
+    with metrics.timer('fetch'):
+        data = get_stock_data(args.ticker, start_date, end_date, args.timeframe, cache=cache)
+    if data.empty:
+        raise ValueError("No data received from Yahoo Finance")
+    metrics.inc('bars_total', len(data), ticker=args.ticker)
+    return data
 
-    data, buy_signals, sell_signals = trade()
+def _strategy_config(args):
+    return {**DEFAULT_STRATEGY_CONFIG, 'timeframe': args.timeframe, 'risk_level': args.risk_level}
+
+def _cmd_fetch(args):
+    data = _fetch_data(args)
+    print(f"{args.ticker}: {len(data)} bars from {data.index[0]} to {data.index[-1]}")
+    if args.output:
+        data.to_csv(args.output)
+
+def _cmd_train(args):
+    data = _fetch_data(args)
+    with metrics.timer('features'):
+        data = add_features(data)
+    with metrics.timer('fit'):
+        if args.model_path:
+            model = train_or_update_hmm(data, args.model_path, n_components=args.n_components)
+        else:
+            model = train_hmm(data, n_components=args.n_components)
+    print(f"Trained {model.n_components}-state HMM on {len(data)} bars, "
+          f"log-likelihood {model.score(feature_matrix(data)):.2f}")
+
+def _cmd_signal(args):
+    model, meta = load_hmm(args.model_path)
+    data = _fetch_data(args)
+    with metrics.timer('features'):
+        data = add_features(data)
+    with metrics.timer('predict'):
+        hidden_states = predict_hmm(model, data)
+    with metrics.timer('signals'):
+        buy_signals, sell_signals = generate_signals(hidden_states, data, risk_level=args.risk_level)
+    last_bar = data.index[-1]
+    signal = 'buy' if last_bar in buy_signals else 'sell' if last_bar in sell_signals else 'none'
+    print(f"{args.ticker} {last_bar}: regime {hidden_states[-1]}, signal {signal}")
+
+def _cmd_backtest(args):
+    cache = BarCache(args.cache_dir, offline=args.offline) if args.cache_dir else None
+    return trade(_strategy_config(args), cache=cache, model_path=args.model_path, ticker=args.ticker, days=args.days)
+
+def plot_report(data, buy_signals, sell_signals, title='Price with Buy and Sell Signals', max_points=None):
+    """Signals and Bollinger Bands side by side; returns the figure"""
+    import matplotlib.pyplot as plt
 
-'''
     # Create a figure with two subplots side by side
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 7))
     
     # First subplot: Trading signals
-    ax1.plot(data['Close'], label='Close Price')
+    plotting.plot_line(ax1, data.index, data['Close'], max_points, label='Close Price')
     ax1.scatter(data.loc[buy_signals].index, data.loc[buy_signals]['Close'], 
                 marker='^', color='g', label='Buy Signal', alpha=1)
     ax1.scatter(data.loc[sell_signals].index, data.loc[sell_signals]['Close'], 
                 marker='v', color='r', label='Sell Signal', alpha=1)
-    ax1.set_title('E-mini S&P 500 Futures Price with Buy and Sell Signals')
+    ax1.set_title(title)
     ax1.set_xlabel('Date')
     ax1.set_ylabel('Price')
     ax1.legend()
 
     # Second subplot: Bollinger Bands
-    ax2.plot(data.index, data['Close'], label='Close Price', color='black')
-    ax2.plot(data.index, data['Bollinger_Lower'], label='Bollinger Lower', color='blue')
-    ax2.plot(data.index, data['Bollinger_Upper'], label='Bollinger Upper', color='red')
+    plotting.plot_line(ax2, data.index, data['Close'], max_points, label='Close Price', color='black')
+    plotting.plot_line(ax2, data.index, data['Bollinger_Lower'], max_points, label='Bollinger Lower', color='blue')
+    plotting.plot_line(ax2, data.index, data['Bollinger_Upper'], max_points, label='Bollinger Upper', color='red')
     ax2.set_title('Close Price with Bollinger Bands')
     ax2.set_xlabel('Date')
     ax2.set_ylabel('Price')
@@ -398,7 +723,94 @@ def main():
 
     # Adjust layout to prevent overlap
     plt.tight_layout()
-    plt.show()
-'''
+    return fig
+
+def _cmd_report(args):
+    if args.output:
+        plotting.use_agg()
+    import matplotlib.pyplot as plt
+
+    data, buy_signals, sell_signals = _cmd_backtest(args)
+    fig = plot_report(data, buy_signals, sell_signals, f'{args.ticker} Price with Buy and Sell Signals',
+                      max_points=args.max_points)
+    if args.output:
+        plotting.save_figure(fig, args.output)
+    else:
+        plt.show()
+
+def _max_points(value):
+    return value if value == 'auto' else int(value)
+
+def _cmd_check_imports(args):
+    from import_budget import report_import_budget
+    return report_import_budget(os.path.abspath(__file__), args.budget)
+
+def main(argv=None):
+    """
+    Subcommands: fetch, train, signal, backtest (the default) and report,
+    plus check-imports. Each one imports only the libraries it needs.
+    """
+    parser = argparse.ArgumentParser(description='HMM Trading Bot')
+    parser.add_argument('--cache-dir', help='Directory of the local bar cache (disabled if omitted)')
+    parser.add_argument('--offline', action='store_true', help='Serve bars from the cache only, never download')
+    parser.add_argument('--model-path', help='Saved HMM (.npz) to warm-start from and update')
+    parser.add_argument('--metrics-file',
+                        help='Write per-stage timings and counters here (.jsonl: JSON lines, else Prometheus text)')
+    parser.add_argument('--profile-stage', choices=['fetch', 'features', 'fit', 'predict', 'signals', 'backtest'],
+                        help='Profile this one stage')
+    parser.add_argument('--profiler', choices=['cprofile', 'tracemalloc'], default='cprofile')
+    parser.add_argument('--profile-output', help='Dump the cProfile stats of --profile-stage to this file')
+    commands = parser.add_subparsers(dest='command')
+
+    data_args = argparse.ArgumentParser(add_help=False)
+    data_args.add_argument('--ticker', default='ES=F')
+    data_args.add_argument('--days', type=int, default=45, help='History length in days')
+    data_args.add_argument('--timeframe', default=DEFAULT_STRATEGY_CONFIG['timeframe'])
+    signal_args = argparse.ArgumentParser(add_help=False)
+    signal_args.add_argument('--risk-level', choices=list(RISK_PARAMS), default=DEFAULT_STRATEGY_CONFIG['risk_level'])
+
+    fetch = commands.add_parser('fetch', parents=[data_args], help='Download bars (into the cache if one is set)')
+    fetch.add_argument('--output', help='Also write the bars to this CSV file')
+    fetch.set_defaults(func=_cmd_fetch)
+
+    train = commands.add_parser('train', parents=[data_args], help='Fit the HMM (saved to --model-path if given)')
+    train.add_argument('--n-components', type=int, default=6)
+    train.set_defaults(func=_cmd_train)
+
+    signal = commands.add_parser('signal', parents=[data_args, signal_args],
+                                 help='Signal for the latest bar from the model saved at --model-path')
+    signal.set_defaults(func=_cmd_signal)
+
+    backtest_cmd = commands.add_parser('backtest', parents=[data_args, signal_args],
+                                       help='Fit, signal and backtest (the default)')
+    backtest_cmd.set_defaults(func=_cmd_backtest)
+
+    report = commands.add_parser('report', parents=[data_args, signal_args],
+                                 help='Backtest and plot signals and Bollinger Bands')
+    report.add_argument('--output', help='Save the figure to this file instead of showing it')
+    report.add_argument('--max-points', type=_max_points, default='auto',
+                        help="Downsample lines to this many points ('auto': the plot's pixel width)")
+    report.set_defaults(func=_cmd_report)
+
+    check = commands.add_parser('check-imports', help='Check the import time of this script against a budget')
+    check.add_argument('--budget', type=float, default=1.0, help='Seconds')
+    check.set_defaults(func=_cmd_check_imports)
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(argv + ['backtest'])
+    if args.command == 'signal' and not args.model_path:
+        parser.error('signal needs --model-path')
+
+    if args.metrics_file or args.profile_stage:
+        metrics.enable(args.profile_stage, args.profiler, args.profile_output)
+    try:
+        status = args.func(args)
+    finally:
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+    return status if isinstance(status, int) else 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
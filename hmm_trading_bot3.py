@@ -5,6 +5,7 @@ import yfinance as yf
 import matplotlib.pyplot as plt
 import time
 import argparse
+import indicators
 
 def get_stock_data(ticker, start_date, end_date, timeframe='5m'):
     """
@@ -20,13 +21,14 @@ def get_realtime_data(ticker):
 
 def add_features(data):
     # Handle potential division by zero and inf values
-    data['Close_pct_change'] = data['Close'].pct_change().replace([np.inf, -np.inf], np.nan)
-    data['Volume_pct_change'] = data['Volume'].pct_change().replace([np.inf, -np.inf], np.nan)
-    data['Rolling_mean_5'] = data['Close'].rolling(window=5).mean()
-    data['Rolling_mean_10'] = data['Close'].rolling(window=10).mean()
-    data['MACD'] = data['Close'].ewm(span=12, adjust=False).mean() - data['Close'].ewm(span=26, adjust=False).mean()
-    data['RSI'] = calculate_rsi(data['Close'])
-    data['Bollinger_Upper'], data['Bollinger_Lower'] = calculate_bollinger_bands(data['Close'])
+    close = data['Close']
+    data['Close_pct_change'] = indicators.to_pandas(indicators.pct_change(close.values), close).replace([np.inf, -np.inf], np.nan)
+    data['Volume_pct_change'] = indicators.to_pandas(indicators.pct_change(data['Volume'].values), data['Volume']).replace([np.inf, -np.inf], np.nan)
+    data['Rolling_mean_5'] = indicators.to_pandas(indicators.rolling_mean(close.values, 5), close)
+    data['Rolling_mean_10'] = indicators.to_pandas(indicators.rolling_mean(close.values, 10), close)
+    data['MACD'] = indicators.to_pandas(indicators.macd(close.values, 12, 26), close)
+    data['RSI'] = calculate_rsi(close)
+    data['Bollinger_Upper'], data['Bollinger_Lower'] = calculate_bollinger_bands(close)
     data['ATR'] = calculate_atr(data)
     
     # Replace deprecated fillna method with ffill() and bfill()
@@ -39,44 +41,20 @@ def add_features(data):
     return data
 
 def calculate_rsi(series, period=14): # RSI = Relative Strength Index
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    
-    # Avoid division by zero
-    loss = loss.replace(0, np.nan)
-    rs = gain / loss
-    rs = rs.replace([np.inf, -np.inf], np.nan).fillna(0)
-    
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    # Zero average loss counts as RS = 0 here (see indicators.rsi)
+    return indicators.to_pandas(indicators.rsi(series.values, period, fill_undefined=True), series)
 
 def calculate_bollinger_bands(series, window=20, num_std_dev=2.0):  # increased from 1.5
-    rolling_mean = series.rolling(window).mean()
-    rolling_std = series.rolling(window).std()
-    upper_band = rolling_mean + (rolling_std * num_std_dev)
-    lower_band = rolling_mean - (rolling_std * num_std_dev)
-    return upper_band, lower_band
+    upper_band, lower_band = indicators.bollinger_bands(series.values, window, num_std_dev)
+    return indicators.to_pandas(upper_band, series), indicators.to_pandas(lower_band, series)
 
 def calculate_atr(data, period=14):
     high = data['High'].values.squeeze()
     low = data['Low'].values.squeeze()
     close = data['Close'].values.squeeze()
     
-    # Calculate True Range
-    tr1 = high - low
-    tr2 = np.abs(high - np.roll(close, 1))
-    tr3 = np.abs(low - np.roll(close, 1))
-    
-    # Calculate maximum of the three true ranges
-    true_range = np.maximum.reduce([tr1, tr2, tr3])
-    
     # Convert to Series with the original index
-    true_range = pd.Series(true_range, index=data.index)
-    
-    # Calculate ATR
-    atr = true_range.rolling(window=period).mean()
-    return atr
+    return pd.Series(indicators.atr(high, low, close, period), index=data.index)
 
 def calculate_stop_loss(entry_price, atr, multiplier=2):
     """
@@ -0,0 +1,188 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import hmm_trading_bot2 as bot
+from hmm_sweep import SHARED_COLUMNS, SharedArrays, shared_market_data
+
+# Bars before each test window used only to warm the 20-bar volume/ATR averages in generate_signals
+SIGNAL_LOOKBACK = 20
+
+
+def walk_forward_folds(n_rows, train_size, test_size, step=None, expanding=False):
+    """
+    Row ranges (train_start, train_end, test_start, test_end) of rolling
+    (or, with expanding=True, anchored) train/test windows. step defaults to test_size.
+    """
+    step = step or test_size
+    folds = []
+    train_end = train_size
+    while train_end + test_size <= n_rows:
+        train_start = 0 if expanding else train_end - train_size
+        folds.append((train_start, train_end, train_end, train_end + test_size))
+        train_end += step
+    return folds
+
+
+def _slice(arrays, start, end):
+    return {name: arrays[name][start:end] for name in arrays}
+
+
+def _usable_warm_start(model):
+    """
+    Whether a fitted model can seed EM: a fold whose fit collapsed (a state
+    with no weight, NaN parameters) would make the next fold's fit fail
+    """
+    if model is None:
+        return False
+    params = [model.startprob_, model.transmat_, model.means_, model.covars_]
+    if not all(np.isfinite(param).all() for param in params):
+        return False
+    return (np.allclose(model.startprob_.sum(), 1.0) and np.allclose(model.transmat_.sum(axis=1), 1.0)
+            and (np.linalg.eigvalsh(model.covars_) > 0).all())
+
+
+def _fit(arrays, fold, n_components, random_state, warm_start=None):
+    train_start, train_end = fold[:2]
+    start = time.perf_counter()
+    if not _usable_warm_start(warm_start):
+        model = bot.train_hmm(_slice(arrays, train_start, train_end), n_components=n_components,
+                              random_state=random_state)
+    else:
+        model = bot.train_hmm(_slice(arrays, train_start, train_end), warm_start=warm_start,
+                              n_iter=bot.REFIT_POLICY['warm_n_iter'])
+    return model, time.perf_counter() - start
+
+
+def _evaluate_fold(spec, fold, strategy_config, n_components, random_state, model=None, fit_seconds=0.0):
+    """Worker: fit the fold's model unless one was passed in, then backtest the test window"""
+    arrays, blocks = SharedArrays.attach(spec)
+    try:
+        if model is None:
+            model, fit_seconds = _fit(arrays, fold, n_components, random_state)
+        _, _, test_start, test_end = fold
+        context_start = max(test_start - SIGNAL_LOOKBACK, 0)
+        window = _slice(arrays, context_start, test_end)
+        data = pd.DataFrame({name: window[name] for name in SHARED_COLUMNS}, copy=False)
+
+        hidden_states = bot.predict_hmm(model, window)
+        buy_signals, sell_signals = bot.generate_signals(
+            hidden_states, data, risk_level=strategy_config['risk_level'])
+        offset = test_start - context_start
+        buy_pos = buy_signals.to_numpy()
+        sell_pos = sell_signals.to_numpy()
+        result = bot.backtest_arrays(
+            window['Close'], window['ATR'],
+            buy_pos[buy_pos >= offset], sell_pos[sell_pos >= offset],
+            window['day'], strategy_config
+        )
+
+        equity = np.concatenate([[1000.0], result['equity']])
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+        wins = result['sell_price'] > result['buy_price']
+        return {
+            'fit_seconds': fit_seconds,
+            'fit_iterations': model.monitor_.iter if hasattr(model, 'monitor_') else 0,
+            'test_log_likelihood': model.score(bot.feature_matrix(_slice(arrays, test_start, test_end))),
+            'final_balance': result['final_balance'],
+            'return_pct': result['profit'] / 1000.0 * 100,
+            'n_trades': len(result['buy_pos']),
+            'win_rate': wins.mean() if len(wins) else np.nan,
+            'max_drawdown_pct': drawdown.max() * 100
+        }
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def run_walk_forward(data, train_size, test_size, step=None, expanding=False, n_components=6,
+                     strategy_config=None, warm_start=False, n_jobs=None, random_state=0):
+    """
+    Walk-forward evaluation of the HMM strategy over one add_features frame.
+
+    Features are computed once by the caller and shared with the workers
+    through shared memory; each fold only slices them. Without warm_start every
+    fold fits its own model in parallel. With warm_start the models are fitted
+    in order in this process, each seeded from the previous fold's model when
+    the two training windows overlap (otherwise a fresh fit), and each fold is
+    handed to the pool for evaluation as soon as its model is ready.
+
+    Returns one row of metrics per fold.
+    """
+    strategy_config = strategy_config or dict(bot.DEFAULT_STRATEGY_CONFIG)
+    folds = walk_forward_folds(len(data), train_size, test_size, step, expanding)
+    if not folds:
+        raise ValueError("Not enough rows for a single train/test fold")
+
+    with shared_market_data(data) as shared, ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = []
+        if warm_start:
+            arrays, blocks = SharedArrays.attach(shared.spec)
+            try:
+                previous, previous_fold = None, None
+                for fold in folds:
+                    overlaps = previous_fold is not None and fold[0] < previous_fold[1]
+                    model, seconds = _fit(arrays, fold, n_components, random_state,
+                                          warm_start=previous if overlaps else None)
+                    futures.append(pool.submit(_evaluate_fold, shared.spec, fold, strategy_config,
+                                               n_components, random_state, model, seconds))
+                    previous, previous_fold = model, fold
+            finally:
+                del arrays
+                for block in blocks:
+                    block.close()
+        else:
+            futures = [pool.submit(_evaluate_fold, shared.spec, fold, strategy_config,
+                                   n_components, random_state) for fold in folds]
+        metrics = [future.result() for future in futures]
+
+    rows = []
+    for i, (fold, fold_metrics) in enumerate(zip(folds, metrics)):
+        train_start, train_end, test_start, test_end = fold
+        rows.append({
+            'fold': i,
+            'train_start': data.index[train_start],
+            'train_end': data.index[train_end - 1],
+            'test_start': data.index[test_start],
+            'test_end': data.index[test_end - 1],
+            **fold_metrics
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward evaluation of the HMM trading bot')
+    parser.add_argument('--ticker', default='ES=F')
+    parser.add_argument('--days', type=int, default=45, help='History length in days')
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--cache-dir', help='Directory of the local bar cache')
+    parser.add_argument('--train-size', type=int, default=2000, help='Training window in bars')
+    parser.add_argument('--test-size', type=int, default=500, help='Test window in bars')
+    parser.add_argument('--expanding', action='store_true', help='Anchor every training window at the first bar')
+    parser.add_argument('--warm-start', action='store_true', help="Seed each fold's EM from the previous fold")
+    parser.add_argument('--n-components', type=int, default=6)
+    parser.add_argument('--n-jobs', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--output', help='Write the per-fold metrics to this CSV file')
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache_dir:
+        from bar_cache import BarCache
+        cache = BarCache(args.cache_dir)
+    end_date = pd.Timestamp.now()
+    start_date = end_date - pd.Timedelta(days=args.days)
+    data = bot.add_features(bot.get_stock_data(args.ticker, start_date, end_date, args.timeframe, cache=cache))
+
+    folds = run_walk_forward(data, args.train_size, args.test_size, expanding=args.expanding,
+                             n_components=args.n_components, warm_start=args.warm_start,
+                             n_jobs=args.n_jobs)
+    print(folds.to_string())
+    if args.output:
+        folds.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Import-time budget check for the command-line entry points.
+
+Short cron jobs pay for every library a script imports at load time, so
+the entry points keep plotting, modelling and download libraries out of
+module scope. check_import_budget imports a script in a fresh interpreter
+and reports how long that took and which heavy modules it pulled in.
+"""
+import json
+import os
+import subprocess
+import sys
+
+# Libraries only specific subcommands need
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'scipy', 'statsmodels', 'hmmlearn', 'yfinance', 'sklearn']
+
+# Default budget for importing an entry point, in seconds
+DEFAULT_BUDGET_S = 1.0
+
+_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('_budget_probe', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+seconds = time.perf_counter() - start
+loaded = sorted({name.split('.')[0] for name in sys.modules})
+print(json.dumps({'seconds': seconds, 'loaded': loaded}))
+"""
+
+
+def check_import_budget(path, budget_s=DEFAULT_BUDGET_S, forbidden=None):
+    """
+    Import the script at `path` in a new interpreter (its own directory on
+    sys.path) and return {'seconds', 'heavy_loaded', 'ok'}; ok is False when
+    the import took longer than budget_s or loaded any forbidden module.
+    """
+    forbidden = HEAVY_MODULES if forbidden is None else forbidden
+    directory = os.path.dirname(os.path.abspath(path))
+    output = subprocess.run(
+        [sys.executable, '-c', f'import sys; sys.path.insert(0, {directory!r})\n' + _PROBE, path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    probe = json.loads(output.strip().splitlines()[-1])
+    heavy_loaded = [name for name in forbidden if name in probe['loaded']]
+    return {
+        'seconds': probe['seconds'],
+        'heavy_loaded': heavy_loaded,
+        'ok': probe['seconds'] <= budget_s and not heavy_loaded
+    }
+
+
+def report_import_budget(path, budget_s=DEFAULT_BUDGET_S, forbidden=None):
+    """Print the check_import_budget result for a CLI and return the exit status"""
+    result = check_import_budget(path, budget_s, forbidden)
+    print(f"Import of {path}: {result['seconds']:.3f}s (budget {budget_s:.3f}s)")
+    if result['heavy_loaded']:
+        print(f"Heavy modules imported at load time: {', '.join(result['heavy_loaded'])}")
+    print('OK' if result['ok'] else 'FAILED')
+    return 0 if result['ok'] else 1
@@ -0,0 +1,325 @@
+"""
+Vectorized technical indicators shared by the HMM trading bots and the
+market trend analyzers.
+
+Every kernel takes a 1-D array (one series) or a 2-D array laid out as
+time x symbols and computes all columns in one pass. float32 input stays
+float32 (or pass dtype=...), and `out` lets callers reuse preallocated
+result arrays across calls. Warm-up rows are NaN, matching pandas
+rolling(window) with the default min_periods.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Upper bound on elements materialised per block by the windowed reductions
+_BLOCK_ELEMENTS = 8_000_000
+
+
+def _prepare(x, dtype=None):
+    """Return (2-D array, was_1d, dtype) for a 1-D or time x symbols input"""
+    x = np.asarray(x)
+    if dtype is None:
+        dtype = x.dtype if x.dtype in (np.float32, np.float64) else np.float64
+    x = x.astype(dtype, copy=False)
+    if x.ndim == 1:
+        return x[:, None], True, dtype
+    return x, False, dtype
+
+
+def _output(out, shape, dtype):
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    out = out.reshape(shape) if out.ndim == 1 else out
+    if out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}")
+    return out
+
+
+def _finish(result, was_1d):
+    return result[:, 0] if was_1d else result
+
+
+def to_pandas(values, like):
+    """Wrap a kernel result in the Series/DataFrame shape of `like`"""
+    if isinstance(like, pd.DataFrame):
+        return pd.DataFrame(np.asarray(values).reshape(len(like), -1), index=like.index, columns=like.columns)
+    return pd.Series(np.asarray(values).reshape(-1), index=like.index, name=getattr(like, 'name', None))
+
+
+def _rolling(x, window, reduce, out):
+    """Apply reduce(windows, out_block) over row blocks of sliding windows"""
+    n_rows, n_cols = x.shape
+    out[:min(window - 1, n_rows)] = np.nan
+    if n_rows < window:
+        return out
+    block_rows = max(1, _BLOCK_ELEMENTS // (n_cols * window))
+    for start in range(window - 1, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        windows = sliding_window_view(x[start - window + 1:stop], window, axis=0)
+        reduce(windows, out[start:stop])
+    return out
+
+
+def rolling_mean(x, window, out=None, dtype=None):
+    """Rolling mean over `window` rows"""
+    x, was_1d, dtype = _prepare(x, dtype)
+    out = _output(out, x.shape, dtype)
+    _rolling(x, window, lambda w, o: np.mean(w, axis=-1, out=o), out)
+    return _finish(out, was_1d)
+
+
+def rolling_std(x, window, ddof=1, out=None, dtype=None):
+    """Rolling standard deviation over `window` rows (sample std, like pandas)"""
+    x, was_1d, dtype = _prepare(x, dtype)
+    out = _output(out, x.shape, dtype)
+    _rolling(x, window, lambda w, o: np.std(w, axis=-1, ddof=ddof, out=o), out)
+    return _finish(out, was_1d)
+
+
+def pct_change(x, periods=1, out=None, dtype=None):
+    """x[t] / x[t - periods] - 1"""
+    x, was_1d, dtype = _prepare(x, dtype)
+    out = _output(out, x.shape, dtype)
+    out[:periods] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(x[periods:], x[:-periods], out=out[periods:])
+    out[periods:] -= 1
+    return _finish(out, was_1d)
+
+
+def roc(x, periods=20, out=None, dtype=None):
+    """Rate of change in percent over `periods` rows"""
+    result = pct_change(x, periods, out=out, dtype=dtype)
+    result *= 100
+    return result
+
+
+def _ema_with_gaps(series, alpha, out):
+    """
+    ema of one column containing NaNs, following pandas ewm(adjust=False,
+    ignore_na=False): NaN rows repeat the previous average and a value after
+    a gap of g rows is mixed in with the old average weighted (1 - alpha) ** (g + 1).
+    Each run of valid values is filtered in one lfilter call.
+    """
+    from scipy.signal import lfilter
+
+    valid = ~np.isnan(series)
+    out[:] = np.nan
+    if not valid.any():
+        return out
+    # Runs of consecutive valid rows as [start, stop)
+    edges = np.diff(np.concatenate([[False], valid, [False]]).astype(np.int8))
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    previous = None
+    for start, stop in zip(starts, stops):
+        if previous is None:
+            value = series[start]
+        else:
+            old_weight = (1 - alpha) ** (start - previous)
+            value = (old_weight * out[previous] + alpha * series[start]) / (old_weight + alpha)
+        out[start] = value
+        if stop - start > 1:
+            out[start + 1:stop] = lfilter([alpha], [1.0, alpha - 1.0], series[start + 1:stop],
+                                          zi=[(1 - alpha) * value])[0]
+        # Carry the average through the following NaN rows
+        out[stop:] = out[stop - 1]
+        previous = stop - 1
+    return out
+
+
+def ema(x, span, out=None, dtype=None):
+    """
+    Exponential moving average, same as pandas ewm(span=span, adjust=False).mean()
+    (including its handling of NaN inputs)
+    """
+    from scipy.signal import lfilter
+
+    x, was_1d, dtype = _prepare(x, dtype)
+    out = _output(out, x.shape, dtype)
+    alpha = 2.0 / (span + 1.0)
+
+    valid = ~np.isnan(x)
+    if len(x) and valid.all():
+        out[:] = lfilter([alpha], [1.0, alpha - 1.0], x, axis=0, zi=((1 - alpha) * x[:1]))[0]
+    else:
+        # Leading NaNs, or gaps that lfilter would carry forward for good
+        for col in range(x.shape[1]):
+            _ema_with_gaps(x[:, col], alpha, out[:, col])
+    return _finish(out, was_1d)
+
+
+def macd(x, fast=12, slow=26, out=None, dtype=None):
+    """EMA(fast) - EMA(slow)"""
+    result = ema(x, fast, out=out, dtype=dtype)
+    result -= ema(x, slow, dtype=dtype)
+    return result
+
+
+def rsi(x, period=14, fill_undefined=False, out=None, dtype=None):
+    """
+    Relative Strength Index from simple rolling means of gains and losses.
+
+    fill_undefined=False: loss of 0 gives RSI 100 (and 0/0 gives NaN), as in
+        the trend analyzers.
+    fill_undefined=True: an undefined RS (warm-up rows or zero average loss)
+        counts as 0, giving RSI 0, as in the HMM bots.
+    """
+    x, was_1d, dtype = _prepare(x, dtype)
+    delta = np.zeros_like(x)
+    delta[1:] = x[1:] - x[:-1]
+    delta[np.isnan(delta)] = 0   # pandas where() treats the NaN first diff as neither gain nor loss
+    gain = rolling_mean(np.maximum(delta, 0), period)
+    loss = rolling_mean(np.maximum(-delta, 0), period)
+
+    out = _output(out, x.shape, dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if fill_undefined:
+            rs = np.where(loss == 0, np.nan, gain / loss)
+            rs[~np.isfinite(rs)] = 0
+        else:
+            rs = gain / loss
+        np.subtract(100, 100 / (1 + rs), out=out)
+    return _finish(out, was_1d)
+
+
+def bollinger_bands(x, window=20, num_std_dev=2.0, dtype=None):
+    """(upper, lower) bands: rolling mean +/- num_std_dev rolling standard deviations"""
+    mean = rolling_mean(x, window, dtype=dtype)
+    std = rolling_std(x, window, dtype=dtype)
+    std *= num_std_dev
+    return mean + std, mean - std
+
+
+def true_range(high, low, close, dtype=None):
+    """
+    max(high - low, |high - previous close|, |low - previous close|).
+    As in the bots' calculate_atr the previous close is np.roll'ed, so the
+    first row compares against the last close of the series.
+    """
+    high, was_1d, dtype = _prepare(high, dtype)
+    low, _, _ = _prepare(low, dtype)
+    close, _, _ = _prepare(close, dtype)
+    prev_close = np.roll(close, 1, axis=0)
+    tr = high - low
+    np.maximum(tr, np.abs(high - prev_close), out=tr)
+    np.maximum(tr, np.abs(low - prev_close), out=tr)
+    return _finish(tr, was_1d)
+
+
+def atr(high, low, close, period=14, out=None, dtype=None):
+    """Average True Range: rolling mean of the true range"""
+    return rolling_mean(true_range(high, low, close, dtype=dtype), period, out=out, dtype=dtype)
+
+
+def compute_indicators(close, high=None, low=None, dtype=None, out=None):
+    """
+    Every indicator for a time x symbols price matrix in one call.
+    `out` may be a dict returned by a previous call with the same shape, its
+    arrays are then overwritten instead of allocating new ones.
+    """
+    out = out or {}
+    result = {
+        'MA20': rolling_mean(close, 20, out=out.get('MA20'), dtype=dtype),
+        'MA50': rolling_mean(close, 50, out=out.get('MA50'), dtype=dtype),
+        'ROC': roc(close, 20, out=out.get('ROC'), dtype=dtype),
+        'RSI': rsi(close, 14, out=out.get('RSI'), dtype=dtype),
+        'Volatility': rolling_std(close, 20, out=out.get('Volatility'), dtype=dtype),
+        'MACD': macd(close, out=out.get('MACD'), dtype=dtype)
+    }
+    result['Bollinger_Upper'], result['Bollinger_Lower'] = bollinger_bands(close, dtype=dtype)
+    if high is not None and low is not None:
+        result['ATR'] = atr(high, low, close, out=out.get('ATR'), dtype=dtype)
+    return result
+
+
+def window_sums(values, window):
+    """
+    Trailing-window sums of `values` and of `values` weighted by the position
+    inside the window (0 .. window-1), for every window end >= window - 1.
+
+    Built from per-block prefix sums with blocks of `window` rows, so each
+    window is the tail of one block plus the head of the next. The partial
+    sums never grow beyond one block, which keeps long series accurate
+    where a single cumulative sum of t * y would lose all precision.
+    """
+    n_rows, n_cols = values.shape
+    n_blocks = -(-n_rows // window)
+    padded = np.zeros((n_blocks * window, n_cols))
+    padded[:n_rows] = values
+    blocks = padded.reshape(n_blocks, window, n_cols)
+    position = np.arange(window, dtype=np.float64)[None, :, None]
+
+    zeros = np.zeros((n_blocks, 1, n_cols))
+    prefix = np.concatenate([zeros, np.cumsum(blocks, axis=1)], axis=1)
+    weighted = np.concatenate([zeros, np.cumsum(blocks * position, axis=1)], axis=1)
+
+    starts = np.arange(n_rows - window + 1)
+    block, offset = np.divmod(starts, window)
+    next_block = np.minimum(block + 1, n_blocks - 1)   # only clipped when offset == 0
+    offset_col = offset[:, None]
+
+    head_sum = prefix[block, window] - prefix[block, offset]
+    head_weighted = weighted[block, window] - weighted[block, offset] - offset_col * head_sum
+    tail_sum = prefix[next_block, offset]
+    tail_weighted = weighted[next_block, offset] + (window - offset_col) * tail_sum
+    return head_sum + tail_sum, head_weighted + tail_weighted
+
+
+def rolling_trend(x, window=None, dtype=None):
+    """
+    Least-squares linear trend of each series against time over a trailing
+    window (or, with window=None, over everything up to each row), computed
+    for all rows and symbols at once from running sums in O(n).
+
+    Returns a dict of arrays shaped like x: slope (per row), intercept (value
+    of the fit at the first row of the window), r_squared and p_value (two
+    sided t-test on the slope, as scipy.stats.linregress). Rows before the
+    first full window, and windows containing NaN, are NaN.
+    """
+    from scipy.special import stdtr
+
+    x, was_1d, dtype = _prepare(x, dtype)
+    n_rows, n_cols = x.shape
+    # Centring each series leaves slope and R^2 unchanged and keeps the sums small
+    with np.errstate(invalid='ignore'):
+        center = np.nanmean(x, axis=0) if n_rows else np.zeros(n_cols)
+    y = x.astype(np.float64) - center
+    missing = np.isnan(y)
+    y[missing] = 0.0
+
+    result = {name: np.full(x.shape, np.nan) for name in ('slope', 'intercept', 'r_squared', 'p_value')}
+    if window is None:
+        n = np.arange(1, n_rows + 1, dtype=np.float64)[:, None]
+        positions = np.arange(n_rows, dtype=np.float64)[:, None]
+        sum_y = np.cumsum(y, axis=0)
+        sum_xy = np.cumsum(positions * y, axis=0)
+        sum_yy = np.cumsum(y * y, axis=0)
+        n_missing = np.cumsum(missing, axis=0)
+        rows = slice(0, n_rows)
+    else:
+        if n_rows < window:
+            return {name: _finish(values.astype(dtype), was_1d) for name, values in result.items()}
+        n = np.float64(window)
+        sum_y, sum_xy = window_sums(y, window)
+        sum_yy, _ = window_sums(y * y, window)
+        n_missing, _ = window_sums(missing.astype(np.float64), window)
+        rows = slice(window - 1, n_rows)
+
+    mean_x = (n - 1) / 2
+    s_xx = n * (n * n - 1) / 12
+    s_xy = sum_xy - mean_x * sum_y
+    s_yy = sum_yy - sum_y * sum_y / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = s_xy / s_xx
+        r = np.clip(s_xy / np.sqrt(s_xx * s_yy), -1.0, 1.0)
+        dof = n - 2
+        t_stat = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p_value = 2 * stdtr(dof, -np.abs(t_stat))
+
+    invalid = (n_missing > 0) | (n < 3)
+    result['slope'][rows] = np.where(invalid, np.nan, slope)
+    result['intercept'][rows] = np.where(invalid, np.nan, sum_y / n - slope * mean_x + center)
+    result['r_squared'][rows] = np.where(invalid, np.nan, r * r)
+    result['p_value'][rows] = np.where(invalid, np.nan, p_value)
+    return {name: _finish(values.astype(dtype, copy=False), was_1d) for name, values in result.items()}
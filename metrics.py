@@ -0,0 +1,245 @@
+"""
+Lightweight per-stage instrumentation: timers, counters, gauges and histograms.
+
+Everything is off until enable() is called; while disabled every call
+returns after one attribute check and timer() hands back a shared no-op
+context manager, so instrumented code pays next to nothing.
+
+    import metrics
+    metrics.enable()
+    with metrics.timer('fit'):
+        model.fit(features)
+    metrics.inc('bars_total', len(data), stage='fetch')
+    metrics.write_prometheus('bot.prom')    # or metrics.write_jsonl('bot.jsonl')
+
+timer(stage) observes the elapsed seconds in the stage_seconds histogram
+with a stage label. enable(profile_stage='fit') additionally wraps that one
+stage in cProfile (stats dumped to profile_path, top entries printed) or,
+with profile='tracemalloc', records its peak allocation in the
+stage_peak_bytes gauge and prints the top allocation sites.
+"""
+import contextlib
+import functools
+import json
+import os
+import time
+
+# Histogram bucket upper bounds (seconds for stage timings)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Entries printed from a cProfile or tracemalloc capture
+PROFILE_TOP = 20
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total, cumulative = 0, []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+
+class Registry:
+    """A set of metrics; the module-level functions use the default one"""
+
+    def __init__(self):
+        self.enabled = False
+        self.profile_stage = None
+        self.profile = 'cprofile'
+        self.profile_path = None
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def enable(self, profile_stage=None, profile='cprofile', profile_path=None):
+        """
+        Start collecting. profile_stage: name of one timer() stage to capture
+        with profile ('cprofile' or 'tracemalloc'); profile_path: where to
+        dump the cProfile stats (readable with pstats / snakeviz)
+        """
+        if profile not in ('cprofile', 'tracemalloc'):
+            raise ValueError(f"Unknown profiler: {profile}")
+        self.enabled = True
+        self.profile_stage = profile_stage
+        self.profile = profile
+        self.profile_path = profile_path
+
+    def disable(self):
+        self.enabled = False
+        self.profile_stage = None
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = _Histogram(buckets)
+        self.histograms[key].observe(value)
+
+    def timer(self, stage):
+        """Context manager timing a stage into stage_seconds{stage=...}"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(stage)
+
+    @contextlib.contextmanager
+    def _timer(self, stage):
+        capture = self._capture(stage) if stage == self.profile_stage else _NULL_TIMER
+        start = time.perf_counter()
+        try:
+            with capture:
+                yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def timed(self, stage=None):
+        """Decorator timing every call of a function (stage defaults to the function name)"""
+        def decorate(func):
+            name = stage or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @contextlib.contextmanager
+    def _capture(self, stage):
+        if self.profile == 'cprofile':
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                if self.profile_path:
+                    profiler.dump_stats(self.profile_path)
+                print(f"Profile of stage {stage}:")
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        else:
+            import tracemalloc
+            tracemalloc.start()
+            try:
+                yield
+            finally:
+                peak = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                self.set_gauge('stage_peak_bytes', peak, stage=stage)
+                print(f"Peak allocation of stage {stage}: {peak / 2**20:,.1f} MB; top allocation sites:")
+                for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+                    print(f"  {stat}")
+
+    def samples(self):
+        """Every series as a dict: name, type, labels and value (histograms: count, sum, buckets)"""
+        for (name, labels), value in self.counters.items():
+            yield {'name': name, 'type': 'counter', 'labels': dict(labels), 'value': value}
+        for (name, labels), value in self.gauges.items():
+            yield {'name': name, 'type': 'gauge', 'labels': dict(labels), 'value': value}
+        for (name, labels), hist in self.histograms.items():
+            yield {'name': name, 'type': 'histogram', 'labels': dict(labels), 'count': hist.count,
+                   'sum': hist.sum, 'buckets': dict(zip(map(str, hist.buckets), hist.cumulative()))}
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format"""
+        lines, typed = [], set()
+        for sample in self.samples():
+            name, labels = sample['name'], sorted(sample['labels'].items())
+            if name not in typed:
+                lines.append(f"# TYPE {name} {sample['type']}")
+                typed.add(name)
+            if sample['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {sample['value']}")
+                continue
+            for bound, count in sample['buckets'].items():
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {sample['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {sample['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Replace `path` with the current metrics (atomically, for a node_exporter textfile collector)"""
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+        return path
+
+    def write_jsonl(self, path):
+        """Append one JSON line per series, all stamped with the current time"""
+        timestamp = time.time()
+        with open(path, 'a') as f:
+            for sample in self.samples():
+                f.write(json.dumps({'timestamp': timestamp, **sample}) + '\n')
+        return path
+
+    def write(self, path):
+        """write_jsonl for .jsonl / .json paths, write_prometheus otherwise"""
+        if path.endswith(('.jsonl', '.json')):
+            return self.write_jsonl(path)
+        return self.write_prometheus(path)
+
+
+REGISTRY = Registry()
+
+enable = REGISTRY.enable
+disable = REGISTRY.disable
+reset = REGISTRY.reset
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+samples = REGISTRY.samples
+to_prometheus = REGISTRY.to_prometheus
+write_prometheus = REGISTRY.write_prometheus
+write_jsonl = REGISTRY.write_jsonl
+write = REGISTRY.write
@@ -0,0 +1,151 @@
+"""
+Fast, headless chart rendering for the trading bots and trend analyzers.
+
+A line with more points than the axes has pixels only costs time and
+memory to draw. The downsamplers here keep a few points per pixel column
+while preserving what the eye sees: minmax keeps the extremes of every
+bucket (spikes survive), lttb (Largest-Triangle-Three-Buckets) keeps the
+visually most significant point per bucket. Both return row positions,
+so they work with any x (dates, bar numbers) and any number of series.
+
+render_parallel writes many figures to image files with the Agg backend
+in a pool of worker processes.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def minmax_indices(y, n_out):
+    """
+    Positions of the first and last point and of the minimum and maximum of
+    each of n_out // 2 equal buckets, in order (at most n_out + 2 points).
+    """
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+    width = -(-n // n_buckets)
+    padded = np.full(n_buckets * width, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, width)
+    # All-NaN buckets fall back to their first row
+    empty = np.isnan(buckets).all(axis=1)
+    buckets[empty, 0] = 0.0
+    offsets = np.arange(n_buckets) * width
+    lows = offsets + np.nanargmin(buckets, axis=1)
+    highs = offsets + np.nanargmax(buckets, axis=1)
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return keep[keep < n]
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: the first and last point plus, for each
+    of n_out - 2 buckets, the point forming the largest triangle with the
+    point kept from the previous bucket and the mean of the next one.
+    NaN values are never selected unless a whole bucket is NaN.
+    """
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(np.float64).reshape(-1)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    y_filled = np.where(np.isnan(y), np.nanmean(y), y)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for b in range(n_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        next_stop = edges[b + 2] if b + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y_filled[stop:next_stop].mean()
+        area = np.abs((x[previous] - next_x) * (y_filled[start:stop] - y_filled[previous])
+                      - (x[previous] - x[start:stop]) * (next_y - y_filled[previous]))
+        area[np.isnan(y[start:stop])] = -1.0
+        previous = start + int(np.argmax(area))
+        keep[b + 1] = previous
+    return keep
+
+
+def downsample_indices(y, max_points, x=None, method='minmax'):
+    """Positions to keep so that at most about max_points points are drawn (all of them when max_points is None)"""
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    if method == 'minmax':
+        return minmax_indices(y, max_points)
+    if method == 'lttb':
+        return lttb_indices(np.arange(n) if x is None else x, y, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+
+def axes_max_points(ax, points_per_pixel=2):
+    """A max_points matching the pixel width of a matplotlib Axes"""
+    return int(ax.get_window_extent().width * points_per_pixel)
+
+
+def plot_line(ax, x, y, max_points=None, method='minmax', **kwargs):
+    """
+    ax.plot(x, y, **kwargs) with at most max_points points; 'auto' uses the
+    pixel width of ax (see axes_max_points)
+    """
+    if max_points == 'auto':
+        max_points = axes_max_points(ax)
+    keep = downsample_indices(np.asarray(y, dtype=np.float64).reshape(-1), max_points, x=x, method=method)
+    if len(keep) == len(y):
+        return ax.plot(x, y, **kwargs)
+    return ax.plot(np.asarray(x)[keep], np.asarray(y).reshape(-1)[keep], **kwargs)
+
+
+def use_agg():
+    """Switch matplotlib to the non-interactive Agg backend (for writing image files)"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def save_figure(fig, path, dpi=100):
+    """Write a figure to an image file and free it"""
+    import matplotlib.pyplot as plt
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return path
+
+
+def _render_one(render, name, data, path, kwargs):
+    """Worker: render one chart to `path` with the Agg backend"""
+    use_agg()
+    start = time.perf_counter()
+    render(data, path, **kwargs)
+    return {'name': name, 'path': path, 'seconds': time.perf_counter() - start}
+
+
+def render_parallel(render, datasets, output_dir, n_jobs=None, suffix='.png', **kwargs):
+    """
+    Call render(data, path, **kwargs) for every {name: data} in datasets in a
+    process pool, writing <output_dir>/<name><suffix>. `render` must be a
+    module-level function that saves its figure to `path`. Returns one
+    {'name', 'path', 'seconds'} dict per chart (an 'error' entry when it failed).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = {
+            pool.submit(_render_one, render, name, data,
+                        os.path.join(output_dir, f'{name}{suffix}'), kwargs): name
+            for name, data in datasets.items()
+        }
+        for future, name in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'name': name, 'path': None, 'error': str(e)})
+    return results
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BarCache, _period_to_timedelta, _to_utc
+from feature_engine import OHLCV_COLUMNS, _column
+
+
+class ReplayFeed:
+    """
+    Replays stored OHLCV bars, all symbols merged in timestamp order.
+
+    speed=None replays as fast as the consumer takes bars, speed=1.0 at the
+    pace the bars were recorded, speed=60 sixty times faster. The feed is
+    an in-process object with three faces:
+
+    - replay() / iteration: (ticker, timestamp, bar dict) with blocking pacing
+    - bars(): the same as an async iterator, the feed interface of hmm_live.LiveRunner
+    - calling it like yf.download (ticker, start, end, interval, period):
+      returns the stored frame, so it can be the `source` of get_stock_data,
+      get_realtime_data or a BarCache. Period requests ('1d') are answered up
+      to the replay clock, i.e. the last bar replayed so far.
+    """
+
+    def __init__(self, frames, speed=None):
+        self.frames = {ticker: frame.sort_index() for ticker, frame in frames.items()}
+        self.tickers = list(self.frames)
+        self.speed = speed
+        self.emitted = 0
+        self.clock = None
+        self._elapsed = 0.0
+
+        # Merge order: by timestamp, then by ticker position for bars sharing one
+        stamps, owners, rows = [], [], []
+        for i, frame in enumerate(self.frames.values()):
+            index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+            stamps.append(index.tz_convert('UTC').as_unit('ns').asi8)
+            owners.append(np.full(len(frame), i))
+            rows.append(np.arange(len(frame)))
+        stamps = np.concatenate(stamps) if stamps else np.empty(0, dtype=np.int64)
+        owners = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        order = np.lexsort((owners, stamps))
+        self._stamps, self._owners, self._rows = stamps[order], owners[order], rows[order]
+        self._columns = [{name: _column(frame, name) for name in OHLCV_COLUMNS if name in frame}
+                         for frame in self.frames.values()]
+
+    @classmethod
+    def from_cache(cls, root, tickers, start, end, interval='1m', speed=None):
+        """Replay what a BarCache directory holds for `tickers` in [start, end), without downloading"""
+        cache = BarCache(root, offline=True)
+        return cls({ticker: cache.get(ticker, start, end, interval) for ticker in tickers}, speed=speed)
+
+    def __len__(self):
+        return len(self._stamps)
+
+    def _bar(self, i):
+        owner, row = self._owners[i], self._rows[i]
+        frame = self.frames[self.tickers[owner]]
+        bar = {name: float(values[row]) for name, values in self._columns[owner].items()}
+        return self.tickers[owner], frame.index[row], bar
+
+    def _delay(self, i, started):
+        """Seconds to wait before bar i is due (0 when replaying as fast as possible)"""
+        if self.speed is None:
+            return 0.0
+        due = (self._stamps[i] - self._stamps[0]) / 1e9 / self.speed
+        return due - (time.perf_counter() - started)
+
+    def replay(self):
+        started = time.perf_counter()
+        for i in range(len(self._stamps)):
+            delay = self._delay(i, started)
+            if delay > 0:
+                time.sleep(delay)
+            ticker, timestamp, bar = self._bar(i)
+            self.clock = timestamp
+            self.emitted += 1
+            yield ticker, timestamp, bar
+        self._elapsed = time.perf_counter() - started
+
+    __iter__ = replay
+
+    async def bars(self):
+        started = time.perf_counter()
+        for i in range(len(self._stamps)):
+            delay = self._delay(i, started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif i % 100 == 0:
+                await asyncio.sleep(0)    # let consumers run between bursts
+            ticker, timestamp, bar = self._bar(i)
+            self.clock = timestamp
+            self.emitted += 1
+            yield ticker, timestamp, bar
+        self._elapsed = time.perf_counter() - started
+
+    def bars_per_second(self):
+        """Replay throughput of the last complete pass"""
+        return self.emitted / self._elapsed if self._elapsed else np.nan
+
+    def __call__(self, ticker, start=None, end=None, interval=None, period=None):
+        frame = self.frames.get(ticker)
+        if frame is None:
+            return pd.DataFrame()
+        index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+        if period is not None:
+            end = self.clock if self.clock is not None else index[-1]
+            end = _to_utc(end)
+            mask = (index > end - _period_to_timedelta(period)) & (index <= end)
+            return frame[mask]
+        mask = np.ones(len(frame), dtype=bool)
+        if start is not None:
+            mask &= index >= _to_utc(start)
+        if end is not None:
+            mask &= index < _to_utc(end)
+        return frame[mask]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay cached bars and measure the live pipeline throughput')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--cache-dir', required=True, help='BarCache directory holding the bars')
+    parser.add_argument('--model-path', required=True, help='HMM saved by save_hmm / the train subcommand')
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--start', required=True, help='First bar to replay (UTC)')
+    parser.add_argument('--end', help='Replay up to this time (UTC, default: now)')
+    parser.add_argument('--speed', type=float, help='Replay speed factor (default: as fast as possible)')
+    parser.add_argument('--budget-ms', type=float, default=250.0, help='Per-bar latency budget')
+    args = parser.parse_args()
+
+    import hmm_trading_bot2 as bot
+    from hmm_live import LiveRunner
+
+    end = args.end or pd.Timestamp.now(tz='UTC')
+    feed = ReplayFeed.from_cache(args.cache_dir, args.tickers, args.start, end, args.interval, speed=args.speed)
+    model, _ = bot.load_hmm(args.model_path)
+    runner = LiveRunner(model, feed, latency_budget_s=args.budget_ms / 1000)
+    started = time.perf_counter()
+    summary = asyncio.run(runner.run())
+    seconds = time.perf_counter() - started
+    print(pd.DataFrame(summary).T.to_string())
+    print(f"{feed.emitted} bars in {seconds:.2f}s: {feed.emitted / seconds:,.0f} bars/s end to end")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Augmented Dickey-Fuller testing for the market trend analyzers.
+
+statsmodels' adfuller with automatic lag selection refits the test
+regression once per candidate lag, which makes it the most expensive call
+in a trend report. This module keeps it off the hot path:
+
+- adf_test caches results by a hash of the series contents, so repeated
+  reports on unchanged data are free;
+- with a fixed lag (autolag=None) the test regression is solved directly
+  in NumPy instead of going through the lag search;
+- rolling_adf builds the regression design once for the whole series and
+  gets every window's fit from windowed cross-product sums.
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+import indicators
+
+# Number of adf_test results kept by the cache (least recently used are dropped)
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def series_key(x):
+    """Content hash of a series, used as the cache key"""
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    return hashlib.sha1(x.tobytes()).hexdigest()
+
+
+def default_maxlag(n_obs, regression='c'):
+    """adfuller's default maximum lag, 12 * (nobs / 100) ** (1 / 4), capped as statsmodels does"""
+    n_trend = len(regression) if regression != 'n' else 0
+    maxlag = int(np.ceil(12.0 * np.power(n_obs / 100.0, 1 / 4.0)))
+    return max(min(n_obs // 2 - n_trend - 1, maxlag), 0)
+
+
+def _clean(x):
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    return x[~np.isnan(x)]
+
+
+def _design(x, lag, regression):
+    """
+    ADF regression for one series: y = diff(x) against the lagged level,
+    `lag` lagged differences and the deterministic terms, laid out as
+    adfuller does (level first).
+    """
+    dx = np.diff(x)
+    n_obs = len(dx) - lag
+    columns = [x[lag:lag + n_obs]]
+    columns += [dx[lag - i:lag - i + n_obs] for i in range(1, lag + 1)]
+    if regression != 'n':
+        columns.append(np.ones(n_obs))
+    if regression in ('ct', 'ctt'):
+        t = np.arange(1, n_obs + 1, dtype=np.float64)
+        columns.append(t)
+        if regression == 'ctt':
+            columns.append(t * t)
+    return dx[lag:], np.column_stack(columns)
+
+
+def _p_value(statistic, regression):
+    from statsmodels.tsa.adfvalues import mackinnonp
+
+    return float(mackinnonp(statistic, regression=regression, N=1))
+
+
+def adf_fixed_lag(x, lag, regression='c'):
+    """
+    ADF statistic and MacKinnon p-value with a fixed number of lagged
+    differences; the same numbers as adfuller(x, maxlag=lag, autolag=None).
+    Returns (test_statistic, p_value, n_obs).
+    """
+    x = _clean(x)
+    if regression != 'n':
+        # With a constant in the regression, shifting the level (and the time
+        # trend) leaves the level coefficient and its standard error unchanged;
+        # raw price levels would make the design badly conditioned
+        x = x - x.mean()
+    y, X = _design(x, lag, regression)
+    if len(y) <= X.shape[1]:
+        raise ValueError(f"Series of {len(x)} values is too short for an ADF test with lag {lag}")
+    if regression in ('ct', 'ctt'):
+        t = (np.arange(len(y), dtype=np.float64) - (len(y) - 1) / 2) / len(y)
+        X[:, lag + 2] = t
+        if regression == 'ctt':
+            X[:, lag + 3] = t * t
+    # Unit column norms, then QR: the standard error comes from R^-1 without forming X'X
+    scale = np.sqrt((X ** 2).sum(axis=0))
+    scale[scale == 0] = 1.0
+    q, r = np.linalg.qr(X / scale)
+    coef = np.linalg.solve(r, q.T @ y)
+    resid = y - (X / scale) @ coef
+    sigma2 = resid @ resid / (len(y) - X.shape[1])
+    r_inv = np.linalg.solve(r, np.eye(len(r)))
+    statistic = float(coef[0] / np.sqrt(sigma2 * (r_inv[0] @ r_inv[0])))
+    return statistic, _p_value(statistic, regression), len(y)
+
+
+def adf_test(x, maxlag=None, autolag='AIC', regression='c', use_cache=True):
+    """
+    Augmented Dickey-Fuller test on a series (NaNs are dropped).
+
+    With autolag set the lag is chosen by statsmodels' adfuller; with
+    autolag=None the fast fixed-lag path is used (maxlag lags, or adfuller's
+    default maximum). Results are cached by series content and arguments.
+    Returns test_statistic, p_value, is_stationary, used_lag and n_obs.
+    """
+    x = _clean(x)
+    key = (series_key(x), maxlag, autolag, regression)
+    if use_cache and key in _cache:
+        _cache.move_to_end(key)
+        return dict(_cache[key])
+
+    if autolag is None:
+        lag = default_maxlag(len(x), regression) if maxlag is None else maxlag
+        statistic, p_value, n_obs = adf_fixed_lag(x, lag, regression)
+    else:
+        from statsmodels.tsa.stattools import adfuller
+
+        statistic, p_value, lag, n_obs = adfuller(x, maxlag=maxlag, regression=regression, autolag=autolag)[:4]
+    result = {
+        'test_statistic': statistic,
+        'p_value': p_value,
+        'is_stationary': p_value < 0.05,
+        'used_lag': lag,
+        'n_obs': n_obs
+    }
+
+    if use_cache:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(result)
+
+
+def rolling_adf(x, window, lag=1, regression='c', p_values=True):
+    """
+    Fixed-lag ADF test over every trailing window of `window` values.
+
+    The regression rows (level, lagged differences, deterministic terms)
+    are built once for the whole series; each window's X'X and X'y come from
+    windowed sums of their cross products, so all windows are solved
+    together instead of refitting one regression per window.
+
+    Returns a dict of test_statistic and p_value arrays aligned with x,
+    NaN before the first full window and for windows containing NaN.
+    MacKinnon p-values are evaluated one window at a time; pass
+    p_values=False when only the statistics are needed on long series.
+    """
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    n_rows = len(x)
+    n_fit = window - 1 - lag
+    result = {'test_statistic': np.full(n_rows, np.nan), 'p_value': np.full(n_rows, np.nan)}
+
+    # Shifting the level by a constant leaves the statistic unchanged when the
+    # regression has a constant, and keeps the cross-product sums small
+    center = np.nanmean(x) if regression != 'n' and n_rows else 0.0
+    y, X = _design(x - center, lag, regression)
+    if regression in ('ct', 'ctt'):
+        # Global instead of per-window time index: same span once the constant is in
+        t = (np.arange(len(y), dtype=np.float64) - len(y) / 2) / window
+        X[:, lag + 2] = t
+        if regression == 'ctt':
+            X[:, lag + 3] = t * t
+    n_params = X.shape[1]
+    if n_fit <= n_params or len(y) < n_fit:
+        return result
+
+    Z = np.column_stack([X, y])
+    missing = np.isnan(Z).any(axis=1)
+    Z[missing] = 0.0
+    upper_i, upper_j = np.triu_indices(n_params + 1)
+    moments, _ = indicators.window_sums(Z[:, upper_i] * Z[:, upper_j], n_fit)
+    n_missing, _ = indicators.window_sums(missing[:, None].astype(np.float64), n_fit)
+
+    S = np.empty((len(moments), n_params + 1, n_params + 1))
+    S[:, upper_i, upper_j] = moments
+    S[:, upper_j, upper_i] = moments
+    xtx, xty, yty = S[:, :n_params, :n_params], S[:, :n_params, n_params], S[:, n_params, n_params]
+
+    valid = n_missing[:, 0] == 0
+    statistic = np.full(len(moments), np.nan)
+    if valid.any():
+        try:
+            xtx_inv = np.linalg.inv(xtx[valid])
+        except np.linalg.LinAlgError:
+            # A flat window somewhere: pinv is much slower but copes with it
+            xtx_inv = np.linalg.pinv(xtx[valid], hermitian=True)
+        coef = np.einsum('wij,wj->wi', xtx_inv, xty[valid])
+        ssr = np.maximum(yty[valid] - np.einsum('wi,wi->w', coef, xty[valid]), 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            statistic[valid] = coef[:, 0] / np.sqrt(ssr / (n_fit - n_params) * xtx_inv[:, 0, 0])
+
+    # The window of rows ending at regression row j covers values up to x[j + lag + 1]
+    rows = slice(window - 1, n_rows)
+    result['test_statistic'][rows] = statistic
+    if p_values:
+        from statsmodels.tsa.adfvalues import mackinnonp
+
+        p = np.frompyfunc(lambda s: mackinnonp(s, regression=regression, N=1), 1, 1)
+        finite = np.isfinite(statistic)
+        p_value = np.full(len(statistic), np.nan)
+        p_value[finite] = p(statistic[finite]).astype(np.float64)
+        result['p_value'][rows] = p_value
+    return result
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_script(filename, name):
+    """
+    Import one of the top-level scripts whose file names have spaces. It is
+    registered under `name` so its functions pickle into process pools.
+    """
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def rng():
+    import numpy as np
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def bars():
+    """600 5-minute OHLCV bars in the get_stock_data layout"""
+    from benchmarks import synthetic_bars
+    return synthetic_bars(600, seed=3)
+
+
+@pytest.fixture
+def features(bars):
+    """The bars fixture through add_features"""
+    import hmm_trading_bot2 as bot
+    return bot.add_features(bars)
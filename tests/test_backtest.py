@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import hmm_trading_bot2 as bot
+
+
+def _baseline_backtest(data, buy_signals, sell_signals, strategy_config):
+    """The per-trade loop backtest_arrays replaced"""
+    initial_balance = 1000.0
+    balance = initial_balance
+    position = 0.0
+    trades = []
+    daily_trades = 0
+    last_trade_date = None
+    close = np.asarray(data['Close'], dtype=np.float64).reshape(-1)
+
+    for buy_ts, sell_ts in zip(buy_signals, sell_signals):
+        buy_pos = data.index.get_loc(buy_ts)
+        sell_pos = data.index.get_loc(sell_ts)
+        buy_price = float(close[buy_pos])
+        sell_price = float(close[sell_pos])
+
+        if last_trade_date != buy_ts.date():
+            daily_trades = 0
+        if daily_trades >= strategy_config['max_trades_per_day']:
+            continue
+        if balance < initial_balance * (1 - strategy_config['max_loss_pct']):
+            break
+
+        if not np.isnan(buy_price) and not np.isnan(sell_price):
+            position = balance / buy_price
+            balance = 0
+            trades.append((data.index[buy_pos], 'Buy', buy_price))
+            balance = position * sell_price
+            position = 0
+            trades.append((data.index[sell_pos], 'Sell', sell_price))
+            last_trade_date = buy_ts.date()
+            daily_trades += 1
+
+    final_balance = float(balance + position * float(close[-1])) if len(data) else float(balance)
+    return final_balance, final_balance - initial_balance, trades
+
+
+@pytest.fixture
+def features():
+    # Five-minute bars over several days, with a few missing closes
+    from benchmarks import synthetic_bars
+    data = bot.add_features(synthetic_bars(5000, seed=3).iloc[::5].copy())
+    data.loc[data.index[[5, 40, 41]], 'Close'] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('max_trades_per_day', [1, 2, 1000])
+@pytest.mark.parametrize('max_loss_pct', [0.05, 0.0005])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_backtest_matches_the_per_trade_loop(features, max_trades_per_day, max_loss_pct, seed):
+    rng = np.random.default_rng(seed)
+    buy = features.index[np.sort(rng.choice(len(features), 150, replace=False))]
+    sell = features.index[np.sort(rng.choice(len(features), 120, replace=False))]
+    config = dict(bot.DEFAULT_STRATEGY_CONFIG, max_trades_per_day=max_trades_per_day, max_loss_pct=max_loss_pct)
+
+    expected = _baseline_backtest(features, buy, sell, config)
+    final_balance, profit, trades = bot.backtest(features, buy, sell, config)
+    assert final_balance == pytest.approx(expected[0], rel=1e-12)
+    assert profit == pytest.approx(expected[1], rel=1e-12, abs=1e-9)
+    assert [t[:2] for t in trades] == [t[:2] for t in expected[2]]
+    np.testing.assert_allclose([t[2] for t in trades], [t[2] for t in expected[2]], rtol=1e-12)
+
+
+def test_backtest_on_generated_signals_matches_the_per_trade_loop(features):
+    model = bot.train_hmm(features.dropna(), n_components=3, n_iter=10, random_state=0)
+    states = bot.predict_hmm(model, features.fillna(0.0))
+    buy, sell = bot.generate_signals(states, features, risk_level='aggressive')
+    config = dict(bot.DEFAULT_STRATEGY_CONFIG)
+    expected = _baseline_backtest(features, buy, sell, config)
+    assert bot.backtest(features, buy, sell, config)[0] == pytest.approx(expected[0], rel=1e-12)
+
+
+def test_unknown_signal_timestamp_raises(features):
+    buy = features.index[[10, 20]]
+    sell = features.index[[15]].append(features.index[[25]] + pd.Timedelta('1s'))
+    with pytest.raises(KeyError):
+        _baseline_backtest(features, buy, sell, bot.DEFAULT_STRATEGY_CONFIG)
+    with pytest.raises(KeyError):
+        bot.backtest(features, buy, sell, bot.DEFAULT_STRATEGY_CONFIG)
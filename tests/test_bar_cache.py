@@ -0,0 +1,136 @@
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_cache
+
+
+def test_yfinance_source_fetches_concurrently_in_download_layout(monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        def history(self, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            index = pd.date_range('2024-01-02 09:30', periods=3, freq='5min', tz='America/New_York',
+                                  name='Datetime')
+            return pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 10,
+                                 'Dividends': 0.0, 'Stock Splits': 0.0}, index=index)
+
+    monkeypatch.setitem(sys.modules, 'yfinance', types.SimpleNamespace(Ticker=Ticker))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        frames = list(pool.map(lambda ticker: bar_cache.yfinance_source(f'T{ticker}', period='1d'), range(8)))
+    assert peak[0] > 1
+    frame = frames[3]
+    assert list(frame.columns) == [(name, 'T3') for name in ['Close', 'High', 'Low', 'Open', 'Volume']]
+    assert frame.columns.names == ['Price', 'Ticker']
+    assert str(frame.index.tz) == 'UTC' and frame.index[0] == pd.Timestamp('2024-01-02 14:30', tz='UTC')
+
+
+def _bars(start, n, volume):
+    index = pd.date_range(start, periods=n, freq='5min', tz='UTC', name='Datetime').as_unit('ns')
+    return pd.DataFrame({'Close': np.linspace(100.0, 101.0, n), 'Volume': volume}, index=index)
+
+
+def test_missing_volume_keeps_integer_column_as_float(tmp_path):
+    first = _bars('2024-01-02 14:00', 4, np.array([10, 20, 30, 40], dtype=np.int64))
+    second = _bars('2024-01-02 14:20', 2, np.array([50.0, np.nan]))
+    frames = iter([first, second])
+    cache = bar_cache.BarCache(str(tmp_path), source=lambda ticker, **kwargs: next(frames))
+
+    bars = cache.get('ES=F', '2024-01-02 14:00', '2024-01-02 14:20')
+    assert bars['Volume'].dtype == np.int64
+    bars = cache.get('ES=F', '2024-01-02 14:00', '2024-01-02 14:30')
+    assert bars['Volume'].dtype == np.float64
+    np.testing.assert_array_equal(bars['Volume'].to_numpy(), [10, 20, 30, 40, 50, np.nan])
+
+
+class CountingSource:
+    """Serves slices of one bar frame and records every request"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.calls = []
+
+    def __call__(self, ticker, start=None, end=None, interval=None):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        return self.frame[(self.frame.index >= start) & (self.frame.index < end)]
+
+
+@pytest.fixture
+def source():
+    from benchmarks import synthetic_bars
+    bars = synthetic_bars(3 * 288, seed=5)
+    bars.index = pd.date_range('2024-01-02', periods=len(bars), freq='5min', tz='UTC', name='Datetime').as_unit('ns')
+    return CountingSource(bars)
+
+
+def test_only_the_missing_tail_is_fetched(tmp_path, source):
+    cache = bar_cache.BarCache(str(tmp_path), source=source)
+    first = cache.get('ES=F', '2024-01-02', '2024-01-03')
+    assert len(source.calls) == 1
+    pd.testing.assert_frame_equal(first, source.frame.loc[:'2024-01-02 23:55'], check_freq=False)
+
+    cache.get('ES=F', '2024-01-02 06:00', '2024-01-02 12:00')
+    assert len(source.calls) == 1
+
+    both = cache.get('ES=F', '2024-01-02', '2024-01-04')
+    assert len(source.calls) == 2
+    # The tail request starts at the last cached bar, so it is fetched again
+    assert source.calls[1] == (pd.Timestamp('2024-01-02 23:55', tz='UTC'), pd.Timestamp('2024-01-04', tz='UTC'))
+    pd.testing.assert_frame_equal(both, source.frame.loc[:'2024-01-03 23:55'], check_freq=False)
+
+
+def test_partial_last_bar_is_replaced(tmp_path, source):
+    full = source.frame.copy()
+    partial = full.copy()
+    last = full.index.get_loc(pd.Timestamp('2024-01-02 23:55', tz='UTC'))
+    partial.iloc[last, partial.columns.get_loc(('Volume', 'ES=F'))] = 1.0
+    source.frame = partial
+    cache = bar_cache.BarCache(str(tmp_path), source=source)
+    cache.get('ES=F', '2024-01-02', '2024-01-03')
+
+    source.frame = full
+    bars = cache.get('ES=F', '2024-01-02', '2024-01-03 12:00')
+    assert bars[('Volume', 'ES=F')].iloc[last] == full[('Volume', 'ES=F')].iloc[last]
+    assert bars.index.is_unique
+
+
+def test_offline_reads_never_fetch(tmp_path, source):
+    bar_cache.BarCache(str(tmp_path), source=source).get('ES=F', '2024-01-02', '2024-01-03')
+
+    def refuse(*args, **kwargs):
+        raise AssertionError('offline cache fetched')
+    offline = bar_cache.BarCache(str(tmp_path), source=refuse, offline=True)
+    bars = offline.get('ES=F', '2024-01-02 12:00', '2024-01-05')
+    pd.testing.assert_frame_equal(bars, source.frame.loc['2024-01-02 12:00':'2024-01-02 23:55'], check_freq=False)
+
+
+def test_get_stock_data_fills_the_cache_from_the_given_source(tmp_path, source):
+    import hmm_trading_bot2 as bot
+
+    def refuse(*args, **kwargs):
+        raise AssertionError("the cache's own source was used")
+    cache = bar_cache.BarCache(str(tmp_path), source=refuse)
+    bars = bot.get_stock_data('ES=F', '2024-01-02', '2024-01-03', '5m', cache=cache, source=source)
+    assert len(source.calls) == 1 and len(bars) == 288
+
+
+@pytest.mark.parametrize('period, days', [('1d', 1), ('5d', 5), ('2wk', 14), ('3mo', 90), ('1y', 365)])
+def test_period_to_timedelta(period, days, recwarn):
+    assert bar_cache._period_to_timedelta(period) == pd.Timedelta(days=days)
+    assert not recwarn.list
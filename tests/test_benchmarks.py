@@ -0,0 +1,30 @@
+import benchmarks
+
+
+def _run(*results):
+    return {'results': [dict(zip(('stage', 'n_bars', 'seconds', 'peak_mb'), result)) for result in results]}
+
+
+def test_compare_flags_regressions_over_the_threshold():
+    baseline = _run(('fit', 10_000, 1.0, 100.0), ('predict', 10_000, 0.5, 10.0), ('new', 1, 1.0, 1.0))
+    current = _run(('fit', 10_000, 1.3, 100.0), ('predict', 10_000, 0.55, 20.0), ('other', 1, 9.0, 9.0))
+    regressions = benchmarks.compare(current, baseline, threshold=0.25)
+    assert {(r['stage'], r['metric']) for r in regressions} == {('fit', 'seconds'), ('predict', 'peak_mb')}
+    fit = next(r for r in regressions if r['stage'] == 'fit')
+    assert abs(fit['change'] - 0.3) < 1e-12
+
+    assert benchmarks.compare(current, baseline, threshold=1.5) == []
+
+
+def test_compare_ignores_stages_under_min_seconds():
+    fast = benchmarks.MIN_SECONDS / 10
+    baseline = _run(('signals', 10_000, fast, None))
+    current = _run(('signals', 10_000, 3 * fast, None))
+    assert benchmarks.compare(current, baseline) == []
+    assert benchmarks.compare(current, baseline, min_seconds=0) != []
+
+
+def test_compare_skips_failed_stages():
+    baseline = _run(('fit', 10_000, 1.0, 100.0))
+    current = {'results': [{'stage': 'fit', 'n_bars': 10_000, 'error': 'MemoryError()'}]}
+    assert benchmarks.compare(current, baseline) == []
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from benchmarks import random_walk, synthetic_prices
+from conftest import load_script
+from decomposition import IncrementalDecomposition
+
+seasonal_decompose = pytest.importorskip('statsmodels.tsa.seasonal').seasonal_decompose
+
+
+@pytest.fixture(scope='module')
+def analysis():
+    return load_script('Market Trend Analysis.py', 'market_trend_analysis')
+
+
+def _assert_matches(decomposer, x, period):
+    expected = seasonal_decompose(x, period=period)
+    components = decomposer.components(period)
+    np.testing.assert_allclose(components['trend'], expected.trend, rtol=1e-10)
+    np.testing.assert_allclose(components['seasonal'], expected.seasonal, rtol=1e-8, atol=1e-8)
+    np.testing.assert_allclose(components['residual'], expected.resid, rtol=1e-8, atol=1e-8)
+
+
+@pytest.mark.parametrize('period', [7, 30])
+def test_one_fit_matches_seasonal_decompose(period):
+    x = random_walk(500)
+    decomposer = IncrementalDecomposition(periods=period).update(x)
+    _assert_matches(decomposer, x, period)
+
+
+def test_append_and_update_match_seasonal_decompose():
+    x = random_walk(700)
+    decomposer = IncrementalDecomposition(periods=(30, 7), capacity=64)
+    decomposer.update(x[:100])
+    for end in (101, 250, 400):
+        decomposer.append(x[decomposer.n:end])
+        _assert_matches(decomposer, x[:end], 30)
+    decomposer.update(x)
+    for period in (30, 7):
+        _assert_matches(decomposer, x, period)
+
+    # A changed past restarts from scratch
+    changed = x.copy()
+    changed[10] += 1.0
+    _assert_matches(decomposer.update(changed), changed, 30)
+
+
+def test_short_series_raises_like_seasonal_decompose():
+    decomposer = IncrementalDecomposition(periods=30).update(random_walk(40))
+    with pytest.raises(ValueError, match='2 complete cycles'):
+        decomposer.components()
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_analysis_skips_decomposition_of_short_series_with_a_decomposer(analysis, compact):
+    decomposer = IncrementalDecomposition(periods=30)
+    result = analysis.analyze_market_trends(synthetic_prices(40), compact=compact, decomposition=True,
+                                            decomposer=decomposer)
+    if compact:
+        assert result.seasonal_amplitude is None
+    else:
+        assert 'seasonal_decomposition' not in result['trend_analysis']
+
+
+def test_analysis_returns_only_periods_with_two_cycles(analysis):
+    decomposer = IncrementalDecomposition(periods=(7, 30))
+    trend = analysis.analyze_market_trends(synthetic_prices(40), decomposer=decomposer)['trend_analysis']
+    assert 'seasonal_decomposition' in trend and 'seasonal_decompositions' not in trend
+    trend = analysis.analyze_market_trends(synthetic_prices(80), decomposer=decomposer)['trend_analysis']
+    assert set(trend['seasonal_decompositions']) == {7, 30}
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+import hmm_trading_bot2 as bot
+from feature_engine import FeatureEngine, iter_bars
+
+COLUMNS = bot.FEATURE_COLUMNS + ['ATR']
+
+# Rows the streaming engine leaves NaN (the batch path back-fills them): the longest window, Bollinger's 20
+WARMUP = 19
+
+
+def _assert_matches(rows, batch):
+    for name in COLUMNS:
+        np.testing.assert_allclose(np.asarray(rows[name], dtype=np.float64),
+                                   np.asarray(batch[name], dtype=np.float64).reshape(-1),
+                                   rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_bar_by_bar_matches_add_features(bars):
+    batch = bot.add_features(bars.copy())
+    engine = FeatureEngine()
+    rows = [engine.update(bar) for _, bar in iter_bars(bars)]
+    assert engine.n_bars == len(bars)
+    _assert_matches({name: [row[name] for row in rows[WARMUP:]] for name in COLUMNS}, batch.iloc[WARMUP:])
+
+
+@pytest.mark.parametrize('split', [30, 400])
+def test_from_frame_continues_the_batch_path(bars, split):
+    batch = bot.add_features(bars.copy())
+    engine = FeatureEngine.from_frame(bot.add_features(bars.iloc[:split].copy()))
+    rows = engine.update_frame(bars.iloc[split:])
+    _assert_matches(rows, batch.iloc[split:])
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import hmm_trading_bot2 as bot
+
+
+def _baseline_rsi(series, period=14):
+    delta = series.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    loss = loss.replace(0, np.nan)
+    rs = (gain / loss).replace([np.inf, -np.inf], np.nan).fillna(0)
+    return 100 - (100 / (1 + rs))
+
+
+def _baseline_atr(data, period=14):
+    high, low, close = (data[name].values.squeeze() for name in ('High', 'Low', 'Close'))
+    true_range = np.maximum.reduce([high - low, np.abs(high - np.roll(close, 1)), np.abs(low - np.roll(close, 1))])
+    return pd.Series(true_range, index=data.index).rolling(window=period).mean()
+
+
+def _baseline_add_features(data):
+    """The pandas add_features the second and third bot started from"""
+    close = data['Close']
+    data['Close_pct_change'] = close.pct_change().replace([np.inf, -np.inf], np.nan)
+    data['Volume_pct_change'] = data['Volume'].pct_change().replace([np.inf, -np.inf], np.nan)
+    data['Rolling_mean_5'] = close.rolling(window=5).mean()
+    data['Rolling_mean_10'] = close.rolling(window=10).mean()
+    data['MACD'] = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    data['RSI'] = _baseline_rsi(close)
+    rolling_mean, rolling_std = close.rolling(20).mean(), close.rolling(20).std()
+    data['Bollinger_Upper'] = rolling_mean + rolling_std * 2.0
+    data['Bollinger_Lower'] = rolling_mean - rolling_std * 2.0
+    data['ATR'] = _baseline_atr(data)
+    data = data.ffill().bfill()
+    data = data.replace([np.inf, -np.inf], np.nan).dropna()
+    data['ATR'] = _baseline_atr(data)
+    return data
+
+
+def _assert_same_frame(result, expected):
+    assert list(result.columns) == list(expected.columns)
+    assert result.index.equals(expected.index)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('missing_close', [False, True])
+def test_add_features_matches_baseline(bars, missing_close):
+    if missing_close:
+        bars.iloc[100, 0] = np.nan
+    _assert_same_frame(bot.add_features(bars.copy()), _baseline_add_features(bars.copy()))
+
+
+def test_third_bot_add_features_matches_baseline(bars):
+    pytest.importorskip('yfinance')
+    pytest.importorskip('hmmlearn')
+    import hmm_trading_bot3
+    _assert_same_frame(hmm_trading_bot3.add_features(bars.copy()), _baseline_add_features(bars.copy()))
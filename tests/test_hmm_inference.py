@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import hmm_trading_bot2 as bot
+import hmm_inference
+
+pytest.importorskip('hmmlearn')
+
+
+@pytest.fixture(params=['diag', 'full'])
+def model(request, features):
+    model = bot._gaussian_hmm(n_components=4, covariance_type=request.param, n_iter=30, random_state=0)
+    model.fit(bot.feature_matrix(features))
+    return model
+
+
+def test_log_emission_matches_hmmlearn(model, features):
+    X = bot.feature_matrix(features)
+    np.testing.assert_allclose(hmm_inference.log_emission(model, X), model._compute_log_likelihood(X),
+                               rtol=1e-10, atol=1e-6)
+
+
+def test_online_filter_log_likelihood_matches_score(model, features):
+    X = bot.feature_matrix(features)
+    regime_filter = hmm_inference.OnlineRegimeFilter(model)
+    posteriors = regime_filter.update_many(X)
+    assert regime_filter.log_likelihood == pytest.approx(model.score(X), rel=1e-9)
+    np.testing.assert_allclose(posteriors.sum(axis=1), 1.0)
+
+
+def test_online_filter_accepts_no_rows(model, features):
+    regime_filter = hmm_inference.OnlineRegimeFilter(model)
+    assert regime_filter.update_many(np.empty((0, 7))).shape == (0, model.n_components)
+    states, posteriors = bot.predict_hmm_online(regime_filter, features.iloc[:0])
+    assert states.shape == (0,) and posteriors.shape == (0, model.n_components)
+    assert regime_filter.n_seen == 0
+
+
+@pytest.fixture
+def sequences(features):
+    """Ragged per-symbol feature matrices: the fixture bars and other seeds, cut to different lengths"""
+    from benchmarks import synthetic_bars
+    frames = [features.iloc[:500], bot.add_features(synthetic_bars(600, seed=7)).iloc[:320],
+              bot.add_features(synthetic_bars(600, seed=11)).iloc[:1], features.iloc[200:]]
+    return [bot.feature_matrix(frame) for frame in frames]
+
+
+def test_viterbi_batch_matches_decode_per_sequence(model, sequences):
+    X, lengths = hmm_inference.stack_sequences(sequences)
+    log_prob, states = hmm_inference.viterbi_batch(model, X, lengths)
+    for i, x in enumerate(sequences):
+        expected_log_prob, expected_states = model.decode(x, algorithm='viterbi')
+        np.testing.assert_array_equal(states[i, :len(x)], expected_states)
+        assert (states[i, len(x):] == -1).all()
+        assert log_prob[i] == pytest.approx(expected_log_prob, rel=1e-9)
+
+
+def test_forward_batch_matches_the_online_filter(model, sequences):
+    X, lengths = hmm_inference.stack_sequences(sequences)
+    log_likelihood, posteriors = hmm_inference.forward_batch(model, X, lengths)
+    for i, x in enumerate(sequences):
+        regime_filter = hmm_inference.OnlineRegimeFilter(model)
+        np.testing.assert_allclose(posteriors[i, :len(x)], regime_filter.update_many(x), atol=1e-10)
+        assert np.isnan(posteriors[i, len(x):]).all()
+        assert log_likelihood[i] == pytest.approx(model.score(x), rel=1e-9)
+
+
+def test_predict_hmm_batch_matches_predict_hmm(model, features):
+    datasets = {'A': features.iloc[:400], 'B': features.iloc[100:], 'C': features.iloc[50:60]}
+    batched = bot.predict_hmm_batch(model, datasets)
+    for ticker, data in datasets.items():
+        np.testing.assert_array_equal(batched[ticker], bot.predict_hmm(model, data))
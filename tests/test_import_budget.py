@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import ROOT
+from import_budget import DEFAULT_BUDGET_S, check_import_budget
+
+ENTRY_POINTS = ['hmm_trading_bot2.py', 'Market Trend Analysis2.py', 'hmm_live.py', 'hmm_scanner.py',
+                'hmm_sweep.py', 'hmm_walk_forward.py', 'replay_feed.py', 'benchmarks.py']
+
+
+@pytest.mark.parametrize('script', ENTRY_POINTS)
+def test_entry_point_imports_within_budget(script):
+    result = check_import_budget(f'{ROOT}/{script}', DEFAULT_BUDGET_S)
+    assert not result['heavy_loaded'], f"{script} imports {result['heavy_loaded']} at load time"
+    assert result['seconds'] <= DEFAULT_BUDGET_S, f"{script} took {result['seconds']:.3f}s to import"
+    assert result['ok']
+
+
+def test_check_fails_on_heavy_imports_and_slow_loads(tmp_path):
+    script = tmp_path / 'heavy.py'
+    script.write_text('import scipy.stats\n')
+    pytest.importorskip('scipy')
+    result = check_import_budget(str(script))
+    assert result['heavy_loaded'] == ['scipy'] and not result['ok']
+
+    assert not check_import_budget(f'{ROOT}/hmm_trading_bot2.py', budget_s=0.0)['ok']
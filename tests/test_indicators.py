@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+def _prices(rng, n=500, nan_rows=()):
+    x = 100 + np.cumsum(rng.normal(size=n))
+    x[list(nan_rows)] = np.nan
+    return x
+
+
+@pytest.mark.parametrize('nan_rows', [(), (0, 1), (10, 150, 151, 152, 300), (499,)])
+@pytest.mark.parametrize('span', [12, 26])
+def test_ema_matches_pandas_ewm(rng, nan_rows, span):
+    x = _prices(rng, nan_rows=nan_rows)
+    expected = pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(indicators.ema(x, span), expected, rtol=1e-12, equal_nan=True)
+
+
+def test_ema_matches_pandas_per_column(rng):
+    X = np.column_stack([_prices(rng, nan_rows=(5, 6)), _prices(rng), _prices(rng, nan_rows=(0, 200))])
+    expected = pd.DataFrame(X).ewm(span=12, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(indicators.ema(X, 12), expected, rtol=1e-12, equal_nan=True)
+
+
+def test_macd_recovers_after_a_missing_close(rng):
+    x = _prices(rng, nan_rows=(100,))
+    close = pd.Series(x)
+    expected = (close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()).to_numpy()
+    result = indicators.macd(x)
+    np.testing.assert_allclose(result, expected, rtol=1e-10, equal_nan=True)
+    assert np.isfinite(result[101:]).all()
+
+
+@pytest.mark.parametrize('window', [5, 20])
+def test_rolling_mean_and_std_match_pandas(rng, window):
+    x = _prices(rng, nan_rows=(50,))
+    series = pd.Series(x)
+    np.testing.assert_allclose(indicators.rolling_mean(x, window), series.rolling(window).mean(),
+                               rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(indicators.rolling_std(x, window), series.rolling(window).std(),
+                               rtol=1e-8, equal_nan=True)
+
+
+def test_rsi_matches_both_baseline_variants(rng):
+    x = _prices(rng)
+    x[200:230] = x[199]    # flat stretch: zero average loss
+    series = pd.Series(x)
+    delta = series.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+
+    # Trend analyzers / first bot: plain RS
+    expected = 100 - 100 / (1 + gain / loss)
+    np.testing.assert_allclose(indicators.rsi(x, 14), expected, rtol=1e-10, equal_nan=True)
+
+    # Second and third bot: undefined RS counts as 0
+    rs = (gain / loss.replace(0, np.nan)).replace([np.inf, -np.inf], np.nan).fillna(0)
+    np.testing.assert_allclose(indicators.rsi(x, 14, fill_undefined=True), 100 - 100 / (1 + rs), rtol=1e-10)
+
+
+def test_atr_matches_the_bots_true_range(rng):
+    close = _prices(rng)
+    high = close + rng.uniform(0, 1, len(close))
+    low = close - rng.uniform(0, 1, len(close))
+    true_range = np.maximum.reduce([high - low, np.abs(high - np.roll(close, 1)), np.abs(low - np.roll(close, 1))])
+    expected = pd.Series(true_range).rolling(window=14).mean()
+    np.testing.assert_allclose(indicators.atr(high, low, close, 14), expected, rtol=1e-10, equal_nan=True)
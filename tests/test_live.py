@@ -0,0 +1,81 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hmm_trading_bot2 as bot
+from feature_engine import iter_bars
+
+pytest.importorskip('hmmlearn')
+from hmm_live import LiveRunner, PollingFeed  # noqa: E402
+
+
+class ListFeed:
+    def __init__(self, items):
+        self.items = items
+
+    async def bars(self):
+        for item in self.items:
+            yield item
+            await asyncio.sleep(0)
+
+
+@pytest.fixture
+def model(bars):
+    return bot.train_hmm(bot.add_features(bars.copy()), n_components=3, n_iter=10, random_state=0)
+
+
+def test_consumer_failure_is_raised_instead_of_hanging(bars, model):
+    items = [('ES=F', timestamp, {k: v for k, v in bar.items() if k != 'Volume'})
+             for timestamp, bar in iter_bars(bars)]
+    runner = LiveRunner(model, ListFeed(items), queue_size=2)
+
+    async def run():
+        return await asyncio.wait_for(runner.run(), timeout=30)
+
+    with pytest.raises(KeyError, match='Volume'):
+        asyncio.run(run())
+
+
+def test_warmup_history_is_not_replayed(bars, model):
+    history, live = bars.iloc[:500], bars.iloc[500:520]
+    now = pd.Timestamp.now(tz='UTC').floor('min')
+    frame = pd.concat([history, live])
+    frame.index = pd.date_range(end=now, periods=len(frame), freq='min', tz='UTC', name='Datetime')
+
+    feed = PollingFeed(['ES=F'], interval_s=0.0, fetch=lambda ticker: frame)
+    runner = LiveRunner(model, feed)
+    runner.warmup('ES=F', frame.iloc[:500])
+    events = []
+    runner.on_event = events.append
+    asyncio.run(runner.run(max_bars=19))
+    # The 20th live bar is still forming and is held back
+    assert [event['timestamp'] for event in events] == list(frame.index[500:519])
+
+
+def test_polling_feed_holds_back_the_forming_bar_and_reports_errors():
+    now = pd.Timestamp.now(tz='UTC').floor('min')
+    index = pd.date_range(end=now, periods=3, freq='min', tz='UTC')
+    frame = pd.DataFrame({name: np.arange(3.0) + 1 for name in ['Open', 'High', 'Low', 'Close', 'Volume']},
+                         index=index)
+    errors = []
+
+    def fetch(ticker):
+        if ticker == 'BAD':
+            raise ConnectionError('down')
+        return frame
+
+    feed = PollingFeed(['BAD', 'ES=F'], interval_s=0.0, fetch=fetch, on_error=lambda t, e: errors.append((t, e)))
+
+    async def first(n):
+        received = []
+        async for item in feed.bars():
+            received.append(item)
+            if len(received) == n:
+                return received
+
+    received = asyncio.run(first(2))
+    assert [timestamp for _, timestamp, _ in received] == list(index[:2])
+    assert errors and errors[0][0] == 'BAD'
+    assert feed.last_seen['ES=F'] == index[1]
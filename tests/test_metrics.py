@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.Registry()
+    registry.enable()
+    return registry
+
+
+def test_disabled_registry_records_nothing():
+    registry = metrics.Registry()
+    registry.inc('bars_total', 5)
+    with registry.timer('fit'):
+        pass
+    assert list(registry.samples()) == []
+
+
+def test_prometheus_histogram_lines(registry):
+    for value in (0.002, 0.02, 0.02, 3.0, 100.0):
+        registry.observe('stage_seconds', value, buckets=(0.01, 0.1, 1.0), stage='fit')
+    lines = registry.to_prometheus().splitlines()
+    assert lines[0] == '# TYPE stage_seconds histogram'
+    assert lines[1:] == [
+        'stage_seconds_bucket{stage="fit",le="0.01"} 1',
+        'stage_seconds_bucket{stage="fit",le="0.1"} 3',
+        'stage_seconds_bucket{stage="fit",le="1.0"} 3',
+        'stage_seconds_bucket{stage="fit",le="+Inf"} 5',
+        f'stage_seconds_sum{{stage="fit"}} {0.002 + 0.02 + 0.02 + 3.0 + 100.0}',
+        'stage_seconds_count{stage="fit"} 5',
+    ]
+
+
+def test_counters_gauges_and_timers(registry, tmp_path):
+    registry.inc('bars_total', 10, stage='fetch')
+    registry.inc('bars_total', 5, stage='fetch')
+    registry.set_gauge('hmm_converged', 1)
+    with registry.timer('fit'):
+        pass
+    text = registry.to_prometheus()
+    assert '# TYPE bars_total counter\nbars_total{stage="fetch"} 15\n' in text
+    assert '# TYPE hmm_converged gauge\nhmm_converged 1\n' in text
+    assert 'stage_seconds_count{stage="fit"} 1' in text
+
+    path = str(tmp_path / 'metrics.jsonl')
+    registry.write(path)
+    rows = [json.loads(line) for line in open(path)]
+    assert {row['name'] for row in rows} == {'bars_total', 'hmm_converged', 'stage_seconds'}
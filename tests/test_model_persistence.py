@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import hmm_trading_bot2 as bot
+
+pytest.importorskip('hmmlearn')
+
+
+@pytest.mark.parametrize('name', ['model', 'model.npz'])
+def test_save_and_load_round_trip(tmp_path, features, name):
+    model = bot.train_hmm(features, n_components=3, n_iter=20, random_state=0)
+    bot.save_hmm(model, tmp_path / name, features)
+    assert (tmp_path / 'model.npz').exists()
+    loaded, meta = bot.load_hmm(tmp_path / name)
+    assert meta['n_rows'] == len(features)
+    np.testing.assert_array_equal(loaded.transmat_, model.transmat_)
+    np.testing.assert_array_equal(bot.predict_hmm(loaded, features), bot.predict_hmm(model, features))
+
+
+def test_second_train_or_update_warm_starts(tmp_path, features, monkeypatch):
+    path = str(tmp_path / 'model')
+    bot.train_or_update_hmm(features.iloc[:-10], path, n_components=3)
+    _, meta = bot.load_hmm(path)
+    assert meta['warm_fits'] == 0
+
+    fits = []
+    train_hmm = bot.train_hmm
+    monkeypatch.setattr(bot, 'train_hmm', lambda *args, **kwargs: fits.append(kwargs) or train_hmm(*args, **kwargs))
+    bot.train_or_update_hmm(features, path, n_components=3)
+    assert len(fits) == 1 and fits[0].get('warm_start') is not None
+    _, meta = bot.load_hmm(path)
+    assert meta['warm_fits'] == 1 and meta['n_rows'] == len(features)
+
+    # Nothing new: the saved model is reused without fitting
+    bot.train_or_update_hmm(features, path, n_components=3)
+    assert len(fits) == 1
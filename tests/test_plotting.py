@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import plotting
+
+
+@pytest.fixture
+def walk(rng):
+    y = np.cumsum(rng.normal(size=10_000))
+    y[1234], y[8765] = y.max() + 50.0, y.min() - 50.0
+    return y
+
+
+def test_minmax_keeps_the_ends_and_every_bucket_extreme(walk):
+    keep = plotting.minmax_indices(walk, 200)
+    assert len(keep) <= 202 and (np.diff(keep) > 0).all()
+    assert keep[0] == 0 and keep[-1] == len(walk) - 1
+    assert {int(np.argmax(walk)), int(np.argmin(walk))} <= set(keep)
+    # Downsampling keeps the visual range of every bucket
+    assert walk[keep].max() == walk.max() and walk[keep].min() == walk.min()
+
+
+def test_lttb_keeps_the_ends_and_the_spikes(walk):
+    x = np.arange(len(walk))
+    keep = plotting.lttb_indices(x, walk, 300)
+    assert len(keep) == 300 and (np.diff(keep) > 0).all()
+    assert keep[0] == 0 and keep[-1] == len(walk) - 1
+    assert {1234, 8765} <= set(keep)
+
+
+def test_nan_points_are_not_selected(walk):
+    walk[::7] = np.nan
+    for keep in (plotting.minmax_indices(walk, 100), plotting.lttb_indices(np.arange(len(walk)), walk, 100)):
+        assert not np.isnan(walk[keep[1:-1]]).any()
+
+
+def test_short_series_are_kept_whole():
+    y = np.arange(50.0)
+    np.testing.assert_array_equal(plotting.minmax_indices(y, 100), np.arange(50))
+    np.testing.assert_array_equal(plotting.lttb_indices(y, y, 100), np.arange(50))
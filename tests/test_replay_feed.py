@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import hmm_trading_bot2 as bot
+from benchmarks import synthetic_bars
+from replay_feed import ReplayFeed
+
+
+def test_empty_replay_feed_is_still_used_as_source(monkeypatch):
+    def download(*args, **kwargs):
+        raise AssertionError('fell back to Yahoo Finance')
+
+    monkeypatch.setattr(bot, 'yfinance_source', download)
+    feed = ReplayFeed({})
+    assert len(feed) == 0
+    assert bot.get_stock_data('ES=F', '2020-01-01', '2020-01-02', source=feed).empty
+    assert bot.get_realtime_data('ES=F', source=feed).empty
+
+
+def test_bars_are_interleaved_in_timestamp_order():
+    a = synthetic_bars(50, seed=1, ticker='A')
+    b = synthetic_bars(30, seed=2, ticker='B').iloc[::2]
+    feed = ReplayFeed({'A': a, 'B': b})
+    replayed = list(feed.replay())
+    assert len(replayed) == len(a) + len(b)
+    timestamps = [timestamp for _, timestamp, _ in replayed]
+    assert timestamps == sorted(timestamps)
+    first_b = next(bar for ticker, _, bar in replayed if ticker == 'B')
+    assert first_b['Close'] == pytest.approx(float(np.asarray(b['Close'])[0, 0]))
+
+
+def test_period_requests_follow_the_replay_clock():
+    bars = synthetic_bars(100, seed=1)
+    feed = ReplayFeed({'ES=F': bars})
+    replay = feed.replay()
+    for _ in range(40):
+        next(replay)
+    recent = bot.get_realtime_data('ES=F', source=feed)
+    assert recent.index[-1] == bars.index[39] and len(recent) == 40
@@ -0,0 +1,62 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import hmm_scanner
+from benchmarks import synthetic_bars
+
+pytest.importorskip('hmmlearn')
+
+
+class CountingSource:
+    """Fake source: synthetic bars per ticker, 'BAD' raises, 'SLOW' waits until released"""
+
+    def __init__(self):
+        self.started = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker, start=None, end=None, interval=None):
+        with self._lock:
+            self.started += 1
+        if ticker == 'BAD':
+            raise ConnectionError('feed down')
+        if ticker == 'EMPTY':
+            return pd.DataFrame()
+        if ticker == 'SLOW':
+            assert self.release.wait(30)
+        return synthetic_bars(300, seed=sum(map(ord, ticker)), ticker=ticker)
+
+
+def _scan(tickers, source, **kwargs):
+    return hmm_scanner.scan_universe(tickers, '2020-01-01', '2020-01-02', n_components=2, source=source,
+                                     fetch_workers=4, fit_workers=1, **kwargs)
+
+
+def test_results_stream_in_completion_order_and_failures_are_reported():
+    source = CountingSource()
+    results = []
+    for result in _scan(['SLOW', 'A', 'BAD', 'B', 'EMPTY'], source):
+        results.append(result)
+        if len(results) == 4:
+            # Everything else is done while SLOW is still fetching
+            source.release.set()
+    assert results[-1]['ticker'] == 'SLOW'
+    by_ticker = {result['ticker']: result for result in results}
+    assert set(by_ticker) == {'SLOW', 'A', 'BAD', 'B', 'EMPTY'}
+    assert 'feed down' in by_ticker['BAD']['error']
+    assert by_ticker['EMPTY']['error'] == 'No data received'
+    for ticker in ('SLOW', 'A', 'B'):
+        assert 'error' not in by_ticker[ticker] and by_ticker[ticker]['bars'] > 0
+
+
+def test_in_flight_symbols_are_bounded():
+    source = CountingSource()
+    source.release.set()
+    tickers = [f'T{i}' for i in range(8)]
+    received = 0
+    for _ in _scan(tickers, source, max_in_flight=2):
+        assert source.started - received <= 2
+        received += 1
+    assert received == len(tickers) and source.started == len(tickers)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import stationarity
+from conftest import load_script
+
+adfuller = pytest.importorskip('statsmodels.tsa.stattools').adfuller
+
+
+@pytest.mark.filterwarnings('ignore::FutureWarning')
+@pytest.mark.parametrize('regression, n', [('c', 20000), ('ct', 200000), ('ctt', 3000), ('n', 2000)])
+@pytest.mark.parametrize('lag', [1, 6])
+def test_fixed_lag_matches_adfuller_at_price_levels(rng, regression, n, lag):
+    x = 5e4 + np.cumsum(rng.normal(size=n))
+    statistic, p_value, n_obs = stationarity.adf_fixed_lag(x, lag, regression)
+    expected = adfuller(x, maxlag=lag, autolag=None, regression=regression)
+    assert statistic == pytest.approx(expected[0], rel=1e-7)
+    assert p_value == pytest.approx(expected[1], rel=1e-6, abs=1e-9)
+    assert n_obs == expected[3]
+
+
+@pytest.mark.filterwarnings('ignore::FutureWarning')
+@pytest.mark.parametrize('regression', ['c', 'ct'])
+def test_rolling_adf_matches_per_window_adfuller(rng, regression):
+    x = 5e4 + np.cumsum(rng.normal(size=300))
+    window, lag = 120, 2
+    result = stationarity.rolling_adf(x, window, lag, regression)
+    assert np.isnan(result['test_statistic'][:window - 1]).all()
+    for end in (window, 200, 300):
+        expected = adfuller(x[end - window:end], maxlag=lag, autolag=None, regression=regression)
+        assert result['test_statistic'][end - 1] == pytest.approx(expected[0], rel=1e-6)
+
+
+@pytest.mark.filterwarnings('ignore::FutureWarning')
+def test_analyzer_stays_non_stationary_after_update(rng):
+    analysis = load_script('Market Trend Analysis2.py', 'market_trend_analysis2')
+    stationarity.clear_cache()
+    dates = pd.date_range('2020-01-01', periods=5000, freq='min')
+    prices = 5e4 + np.cumsum(rng.normal(size=len(dates)))
+    analyzer = analysis.MarketTrendAnalyzer(pd.DataFrame({'date': dates, 'price': prices}))
+    before = analyzer.analyze_trends()['stationarity']
+    analyzer.update({'date': dates[-1] + pd.Timedelta(minutes=1), 'price': prices[-1] + 0.5})
+    after = analyzer.analyze_trends()['stationarity']
+    assert not before['is_stationary'] and not after['is_stationary']
+    assert after['test_statistic'] == pytest.approx(before['test_statistic'], abs=0.1)
@@ -0,0 +1,53 @@
+import logging
+from multiprocessing import shared_memory
+
+import pytest
+
+import hmm_sweep
+import hmm_trading_bot2 as bot
+
+pytest.importorskip('hmmlearn')
+
+SPACE = {'n_components': [2, 3], 'risk_level': ['moderate', 'aggressive'], 'max_trades_per_day': [1, 1000]}
+
+
+def test_search_spaces_and_split_config():
+    grid = hmm_sweep.grid_search(SPACE)
+    assert len(grid) == 8 and len({tuple(config.items()) for config in grid}) == 8
+    assert hmm_sweep.random_search(SPACE, 5, random_state=1) == hmm_sweep.random_search(SPACE, 5, random_state=1)
+
+    n_components, strategy_config, params = hmm_sweep.split_config(
+        {'n_components': 3, 'risk_level': 'aggressive', 'max_trades_per_day': 2, 'rsi_oversold': 33})
+    assert n_components == 3
+    assert strategy_config['risk_level'] == 'aggressive' and strategy_config['max_trades_per_day'] == 2
+    assert params['rsi_oversold'] == 33
+    assert params['rsi_overbought'] == bot.RISK_PARAMS['aggressive']['rsi_overbought']
+
+
+def test_sweep_ranks_every_config_and_releases_shared_memory(features, monkeypatch, caplog, tmp_path):
+    blocks = []
+    init = hmm_sweep.SharedArrays.__init__
+
+    def recording_init(self, arrays):
+        init(self, arrays)
+        blocks.extend(name for name, _, _ in self.spec.values())
+    monkeypatch.setattr(hmm_sweep.SharedArrays, '__init__', recording_init)
+
+    configs = hmm_sweep.grid_search(SPACE)
+    with caplog.at_level(logging.INFO, logger=hmm_sweep.__name__):
+        table = hmm_sweep.run_sweep(features, configs, n_jobs=1, chunksize=3, output_path=tmp_path / 'sweep.csv')
+
+    assert len(table) == len(configs)
+    assert table['profit'].is_monotonic_decreasing
+    assert set(SPACE) <= set(table.columns)
+    assert (tmp_path / 'sweep.csv').exists()
+    assert sorted(record.message.split('-')[0] for record in caplog.records) == ['Fitted 2', 'Fitted 3']
+
+    # Configurations differing only in the daily cap share their signals
+    for _, group in table.groupby(['n_components', 'risk_level']):
+        assert group['n_buy_signals'].nunique() == 1
+
+    assert blocks
+    for name in blocks:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,34 @@
+import logging
+
+import pytest
+
+import hmm_trading_bot2 as bot
+import metrics
+
+pytest.importorskip('hmmlearn')
+
+
+def test_running_out_of_iterations_is_not_convergence(features):
+    metrics.reset()
+    metrics.enable()
+    try:
+        model = bot.train_hmm(features, n_components=3, n_iter=2, tol=1e-12, random_state=0)
+        gauges = {name: value for (name, _), value in metrics.REGISTRY.gauges.items()}
+    finally:
+        metrics.disable()
+        metrics.reset()
+    assert model.monitor_.iter == 2
+    assert not bot._converged(model)
+    assert gauges['hmm_converged'] == 0
+
+
+def test_restarts_are_reproducible_and_logged(features, capsys, caplog):
+    with caplog.at_level(logging.INFO, logger=bot.__name__):
+        first = bot.train_hmm(features, n_components=3, n_iter=2, tol=1e-12, n_restarts=2, n_jobs=1)
+    second = bot.train_hmm(features, n_components=3, n_iter=2, tol=1e-12, n_restarts=2, n_jobs=1)
+
+    assert [r['seed'] for r in first.restart_report_] == [r['seed'] for r in second.restart_report_]
+    assert [r['log_likelihood'] for r in first.restart_report_] == [r['log_likelihood'] for r in second.restart_report_]
+    assert not any(r['converged'] for r in first.restart_report_)
+    assert capsys.readouterr().out == ''
+    assert len([record for record in caplog.records if record.message.startswith('Restart')]) == 2
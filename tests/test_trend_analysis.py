@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic_prices
+from conftest import load_script
+
+pytest.importorskip('statsmodels')
+
+
+@pytest.fixture(scope='module')
+def analysis():
+    return load_script('Market Trend Analysis.py', 'market_trend_analysis')
+
+
+def test_compact_decomposition_follows_the_flag(analysis):
+    prices = synthetic_prices(200)
+    skipped = analysis.analyze_market_trends(prices, compact=True, decomposition=False)
+    assert skipped.seasonal_amplitude is None and 'seasonal' not in skipped.arrays
+
+    summary_only = analysis.analyze_market_trends(prices, compact=True)
+    assert summary_only.seasonal_amplitude is not None and 'seasonal' not in summary_only.arrays
+
+    full = analysis.analyze_market_trends(prices, compact=True, decomposition=True)
+    assert full.seasonal_amplitude == summary_only.seasonal_amplitude and 'seasonal' in full.arrays
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_series_shorter_than_two_periods_skip_the_decomposition(analysis, compact):
+    prices = synthetic_prices(2 * analysis.DECOMPOSE_PERIOD - 1)
+    result = analysis.analyze_market_trends(prices, compact=compact, decomposition=True)
+    if compact:
+        assert result.seasonal_amplitude is None and 'seasonal' not in result.arrays
+    else:
+        assert 'seasonal_decomposition' not in result['trend_analysis']
+
+
+def test_spill_directory_is_created_lazily_and_cleaned_up(analysis, tmp_path):
+    small = analysis.analyze_market_trends(synthetic_prices(100), compact=True, spill_dir=tmp_path)
+    assert small.spill_path is None and os.listdir(tmp_path) == []
+
+    result = analysis.analyze_market_trends(synthetic_prices(1000), compact=True)
+    expected = np.array(result['price'])
+    result.spill(tmp_path, min_bytes=0)
+    assert isinstance(result['price'], np.memmap) and os.path.isdir(result.spill_path)
+
+    result.cleanup()
+    assert result.spill_path is None and os.listdir(tmp_path) == []
+    np.testing.assert_array_equal(result['price'], expected)
+
+
+def test_batch_summarizes_every_symbol(analysis):
+    frames = {'A': synthetic_prices(200, seed=1), 'B': synthetic_prices(80, seed=2),
+              'BAD': synthetic_prices(3, seed=3)}
+    result = analysis.analyze_market_trends_batch(frames, n_jobs=1, chunksize=2)
+    assert result.index.name == 'symbol' and set(result.index) == {'A', 'B', 'BAD'}
+    expected = analysis.summarize_market_trends(frames['A'])
+    assert result.loc['A', 'slope'] == pytest.approx(expected['slope'])
+    assert result.loc['A', 'seasonal_amplitude'] == pytest.approx(expected['seasonal_amplitude'])
+    assert isinstance(result.loc['BAD', 'error'], str)
+
+    long = pd.concat([frame.assign(symbol=symbol) for symbol, frame in frames.items() if symbol != 'BAD'])
+    from_long = analysis.analyze_market_trends_batch(long, n_jobs=1)
+    assert from_long.loc['B', 'n_obs'] == 80
+
+
+@pytest.mark.parametrize('data', [{}, 'frame'])
+def test_batch_of_nothing_is_an_empty_frame(analysis, data):
+    if data == 'frame':
+        data = pd.DataFrame({'symbol': [], 'date': [], 'price': []})
+    result = analysis.analyze_market_trends_batch(data, n_jobs=1)
+    assert result.empty and result.index.name == 'symbol'
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import stationarity
+from benchmarks import synthetic_prices
+from conftest import load_script
+
+pytest.importorskip('statsmodels')
+pytest.importorskip('scipy')
+
+
+@pytest.fixture(scope='module')
+def analysis():
+    return load_script('Market Trend Analysis2.py', 'market_trend_analysis2')
+
+
+@pytest.fixture
+def prices():
+    return synthetic_prices(600, seed=4)
+
+
+def _assert_same_analysis(analyzer, fresh):
+    pd.testing.assert_frame_equal(analyzer.technical_indicators, fresh.technical_indicators,
+                                  rtol=1e-9, atol=1e-9)
+    result, expected = analyzer.analyze_trends(), fresh.analyze_trends()
+    for section in ('basic_stats', 'trend_analysis'):
+        for name, value in expected[section].items():
+            if isinstance(value, str):
+                assert result[section][name] == value
+            else:
+                assert result[section][name] == pytest.approx(value, rel=1e-9, nan_ok=True)
+
+
+def test_appends_match_a_fresh_analyzer(analysis, prices):
+    analyzer = analysis.MarketTrendAnalyzer(prices.iloc[:300])
+    analyzer.technical_indicators
+    analyzer.append(prices.iloc[300:450])
+    for i in range(450, 460):
+        analyzer.update({'date': prices['date'].iloc[i], 'price': prices['price'].iloc[i]})
+        analyzer.analyze_trends()
+    analyzer.append(prices.iloc[460:])
+    _assert_same_analysis(analyzer, analysis.MarketTrendAnalyzer(prices))
+
+
+def test_out_of_order_and_duplicate_timestamps(analysis, prices):
+    late = prices.iloc[[100, 50, 50]].assign(price=[1.0, 2.0, 3.0])
+    analyzer = analysis.MarketTrendAnalyzer(prices)
+    analyzer.technical_indicators
+    analyzer.append(late)
+    fresh = analysis.MarketTrendAnalyzer(pd.concat([prices, late]))
+    assert analyzer.df.index.is_monotonic_increasing and len(analyzer.df) == len(prices) + 3
+    np.testing.assert_array_equal(analyzer.df['price'].to_numpy(), fresh.df['price'].to_numpy())
+    _assert_same_analysis(analyzer, fresh)
+
+
+def test_indicators_are_extended_from_the_lookback_tail(analysis, prices, monkeypatch):
+    analyzer = analysis.MarketTrendAnalyzer(prices.iloc[:500])
+    analyzer.technical_indicators
+    lengths = []
+    compute = analyzer._compute_indicators
+    monkeypatch.setattr(analyzer, '_compute_indicators', lambda values: lengths.append(len(values)) or compute(values))
+
+    analyzer.append(prices.iloc[500:520])
+    analyzer.technical_indicators
+    analyzer.technical_indicators
+    assert lengths == [analyzer.INDICATOR_LOOKBACK + 20]
+    _assert_same_analysis(analyzer, analysis.MarketTrendAnalyzer(prices.iloc[:520]))
+
+
+def test_adf_lag_is_reused_below_the_relag_fraction(analysis, prices, monkeypatch):
+    stationarity.clear_cache()
+    calls = []
+    adf_test = stationarity.adf_test
+    monkeypatch.setattr(stationarity, 'adf_test',
+                        lambda x, **kwargs: calls.append(kwargs) or adf_test(x, **kwargs))
+
+    analyzer = analysis.MarketTrendAnalyzer(prices.iloc[:500])
+    analyzer.analyze_trends()
+    lag = analyzer._adf_lag
+    assert calls[-1] == {}
+
+    analyzer.append(prices.iloc[500:540])     # 8% more rows: the searched lag is reused
+    result = analyzer.analyze_trends()['stationarity']
+    assert calls[-1] == {'maxlag': lag, 'autolag': None}
+    expected = adf_test(prices['price'].to_numpy()[:540], maxlag=lag, autolag=None)
+    assert result['test_statistic'] == pytest.approx(expected['test_statistic'], rel=1e-12)
+
+    analyzer.append(prices.iloc[540:])        # 20% more: search again
+    analyzer.analyze_trends()
+    assert calls[-1] == {} and analyzer._adf_lag_rows == len(prices)
+
+
+def test_prepare_data_and_df_assignment_stay_compatible(analysis, prices):
+    analyzer = analysis.MarketTrendAnalyzer(prices.iloc[::-1])
+    analyzer.prepare_data()
+    assert analyzer.df.index.is_monotonic_increasing
+
+    analyzer.df = prices.set_index('date').iloc[:200]
+    _assert_same_analysis(analyzer, analysis.MarketTrendAnalyzer(prices.iloc[:200]))
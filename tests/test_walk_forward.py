@@ -0,0 +1,54 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import hmm_trading_bot2 as bot
+import hmm_walk_forward as wf
+from hmm_sweep import SHARED_COLUMNS
+
+pytest.importorskip('hmmlearn')
+
+
+@pytest.fixture
+def arrays(features):
+    return {name: np.asarray(features[name], dtype=np.float64) for name in SHARED_COLUMNS}
+
+
+def test_degenerate_previous_model_falls_back_to_a_fresh_fit(arrays):
+    previous = bot.train_hmm(arrays, n_components=3, n_iter=10, random_state=0)
+    previous.startprob_ = np.full(3, np.nan)
+    assert not wf._usable_warm_start(previous)
+
+    model, _ = wf._fit(arrays, (0, 400, 400, 500), 3, 0, warm_start=previous)
+    assert np.isfinite(model.startprob_).all()
+    assert model.n_iter != bot.REFIT_POLICY['warm_n_iter']
+
+
+def test_fitted_previous_model_is_warm_started(arrays):
+    previous = bot.train_hmm(arrays, n_components=3, n_iter=10, random_state=0)
+    assert wf._usable_warm_start(previous)
+    model, _ = wf._fit(arrays, (100, 500, 500, 600), 3, 0, warm_start=previous)
+    assert model.n_iter == bot.REFIT_POLICY['warm_n_iter']
+
+
+def test_shared_memory_is_released_when_a_fold_fails(features, monkeypatch):
+    created, attached = [], []
+    shared_market_data = wf.shared_market_data
+    monkeypatch.setattr(wf, 'shared_market_data', lambda data: created.append(shared_market_data(data)) or created[-1])
+    attach = wf.SharedArrays.attach
+    monkeypatch.setattr(wf.SharedArrays, 'attach', lambda spec: attached.append(attach(spec)) or attached[-1])
+
+    def failing_fit(*args, **kwargs):
+        raise RuntimeError('fit failed')
+    monkeypatch.setattr(wf, '_fit', failing_fit)
+
+    with pytest.raises(RuntimeError, match='fit failed'):
+        wf.run_walk_forward(features, 300, 100, warm_start=True, n_components=3, n_jobs=1)
+    # The parent's own views are closed and every block is unlinked
+    assert attached and all(block.buf is None for block in attached[0][1])
+    names = [spec[0] for spec in created[0].spec.values()]
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)